@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from .executor import ExecutorBusy
+from .model_loader import classify_frames
+from .log import get_logger
+
+log = get_logger("MicroBatcher")
+
+# MICROBATCH_MAX_WAIT_MS=0 disables batching (every /frame is classified on its own)
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_QUEUE = int(os.getenv("MICROBATCH_MAX_QUEUE", "1024"))
+
+
+def classify_batch(model, features):
+    """Executor job: one predict_proba over the stacked (N, F) feature matrix."""
+    return classify_frames(model, features)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-frame requests into one vectorized model call.
+
+    Each request parks a future; a background task collects frames until
+    `max_batch` are waiting or the oldest has waited `max_wait_ms`, classifies the
+    stacked matrix through the executor and resolves every future with its own row.
+    At most `max_queue` frames may wait; beyond that classify() raises ExecutorBusy.
+    """
+
+    def __init__(self, executor, max_batch=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+                 max_queue=MICROBATCH_MAX_QUEUE):
+        self.executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.enabled = max_wait_ms > 0
+        self._queue = deque()
+        self._wake = None
+        self._runner = None
+        self.batches = 0
+        self.frames = 0
+        self.max_seen_batch = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    async def classify(self, features):
+        """Queue one (1, F) feature vector and wait for its result dict."""
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusy(f"{len(self._queue)} frames waiting for a batch")
+        loop = asyncio.get_running_loop()
+        if self._runner is None or self._runner.done():
+            self._wake = asyncio.Event()
+            self._runner = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.append((features, future, time.perf_counter()))
+        self._wake.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            if not self._queue:
+                continue
+
+            # Hold the batch open until it is full or the oldest frame hits max_wait
+            deadline = loop.time() + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._wake.clear()
+
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            if self._queue:
+                self._wake.set()
+            # Dispatch without waiting so several batches can use several executor workers
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        now = time.perf_counter()
+        self.batches += 1
+        self.frames += len(batch)
+        self.max_seen_batch = max(self.max_seen_batch, len(batch))
+        self.total_wait += sum(now - queued_at for _, _, queued_at in batch)
+        try:
+            features = np.vstack([f for f, _, _ in batch])
+            results = await self.executor.submit(classify_batch, features)
+        except ExecutorBusy as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except Exception as e:
+            # One bad row (or a vector built for a model swapped out mid-batch) must not
+            # fail its neighbours: classify every frame on its own instead
+            log.warning(f"⚠️ Batch of {len(batch)} failed ({e}); classifying frames one by one")
+            await asyncio.gather(*(self._dispatch_one(f, future) for f, future, _ in batch))
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _dispatch_one(self, features, future):
+        try:
+            result = await self.executor.submit(classify_batch, features)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result[0])
+
+    def depth(self):
+        """Frames waiting for a batch."""
+        return len(self._queue)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_queue": self.max_queue,
+            "queue_depth": self.depth(),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_seen_batch,
+            "avg_wait_ms": self.total_wait / self.frames * 1000.0 if self.frames else 0.0,
+            "rejected": self.rejected,
+        }
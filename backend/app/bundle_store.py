@@ -0,0 +1,153 @@
+"""
+Model bundle storage shared across uvicorn workers: uncompressed joblib pickles whose
+arrays are memory-mapped on load, so N workers share one page-cache copy. Only plain
+arrays stay mapped: sklearn trees copy their node arrays when unpickled, which is why
+cache_manager.install_bundle() stores a forest as its flattened CompiledModel arrays.
+
+    python -m app.bundle_store footprint /app/backend/data/cache/bigboy.joblib --workers 4
+    python -m app.bundle_store convert old.joblib bigboy.joblib
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import tempfile
+
+import joblib
+import numpy as np
+
+PICKLE_MAGIC = b"\x80"  # uncompressed joblib files are plain pickles
+
+
+def is_mmap_compatible(path):
+    """True when the file is an uncompressed joblib pickle (compressed files cannot be mapped)."""
+    with open(path, "rb") as f:
+        return f.read(1) == PICKLE_MAGIC
+
+
+def save_bundle(bundle, path):
+    """Write a bundle uncompressed and atomically (temp file + rename)."""
+    target_dir = os.path.dirname(path) or "."
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix=".incoming-", suffix=".joblib")
+    os.close(fd)
+    try:
+        joblib.dump(bundle, tmp_path, compress=0)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_bundle(path, mmap=True):
+    """
+    Load a bundle, memory-mapping its arrays when the file allows it.
+    Replacing the file with os.replace() is safe: existing mappings keep the old inode.
+    """
+    if mmap and is_mmap_compatible(path):
+        return joblib.load(path, mmap_mode="r")
+    return joblib.load(path)
+
+
+# --- FOOTPRINT REPORT ---
+def _memory_kb():
+    """(rss, pss) in kB for this process, from /proc (Linux only)."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1]] = int(parts[1])
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def _touch(bundle):
+    """Warm-up prediction so the model's pages are actually resident."""
+    model = bundle.get("model") if isinstance(bundle, dict) else bundle
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features:
+        probe = np.zeros((1, n_features))
+        (model.predict_proba if hasattr(model, "predict_proba") else model.predict)(probe)
+
+
+def _footprint_worker(path, mmap, modules, barrier, results):
+    for name in modules:
+        importlib.import_module(name)  # library code is not part of the bundle's footprint
+    base_rss, base_pss = _memory_kb()
+    bundle = load_bundle(path, mmap=mmap)
+    _touch(bundle)
+    barrier.wait()  # every worker has the bundle mapped before PSS is sampled
+    rss, pss = _memory_kb()
+    results.put((rss - base_rss, pss - base_pss))
+    barrier.wait()
+
+
+def _measure(ctx, path, mmap, modules, workers):
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_footprint_worker, args=(path, mmap, modules, barrier, results))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return {
+        "rss_delta_kb": sum(s[0] for s in samples) / workers,
+        "pss_delta_kb": sum(s[1] for s in samples) / workers,
+    }
+
+
+def footprint(path, workers=4):
+    """
+    Load the bundle in `workers` processes, heap vs mmap, and return per-worker memory.
+    For a model that compile_model() supports, the compiled bundle install_bundle() would
+    write is measured too ("compiled", mapped): unpickling sklearn trees copies their node
+    arrays into every process, so only the flattened arrays are actually shared.
+    """
+    from .compiled_model import CompiledModel, compile_bundle
+
+    bundle = joblib.load(path)
+    model = bundle.get("model") if isinstance(bundle, dict) else bundle
+    modules = [type(model).__module__, CompiledModel.__module__]
+
+    ctx = multiprocessing.get_context("spawn")
+    report = {mode: _measure(ctx, path, mmap, modules, workers) for mode, mmap in (("heap", False), ("mmap", True))}
+    if not isinstance(model, CompiledModel):
+        compiled = compile_bundle(bundle)
+        if compiled is not None:
+            with tempfile.TemporaryDirectory() as tmp:
+                compiled_path = os.path.join(tmp, "compiled.joblib")
+                save_bundle(compiled, compiled_path)
+                report["compiled"] = _measure(ctx, compiled_path, True, modules, workers)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared, memory-mapped model bundle tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fp = sub.add_parser("footprint", help="RSS/PSS per worker with heap vs memory-mapped loading")
+    fp.add_argument("path")
+    fp.add_argument("--workers", type=int, default=4)
+    cv = sub.add_parser("convert", help="Rewrite a bundle in the uncompressed, mappable format")
+    cv.add_argument("src")
+    cv.add_argument("dst")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        save_bundle(joblib.load(args.src), args.dst)
+        print(f"[BundleStore] ✅ Wrote mappable bundle to {args.dst}")
+        return
+
+    if not is_mmap_compatible(args.path):
+        print("[BundleStore] ⚠️ Bundle is compressed; run `convert` first to share it across workers.")
+    report = footprint(args.path, args.workers)
+    print(f"[BundleStore] Footprint of {args.path} with {args.workers} workers (per worker):")
+    for mode, row in report.items():
+        print(f"   {mode:<8} RSS +{row['rss_delta_kb'] / 1024:8.1f} MiB   PSS +{row['pss_delta_kb'] / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
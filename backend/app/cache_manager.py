@@ -1,16 +1,64 @@
 import shutil
 import os
+import tempfile
 
+import joblib
+
+from .model_loader import MODEL_PATH
+from .bundle_store import is_mmap_compatible, save_bundle
+from .compiled_model import COMPILE_MODELS, CompiledModel, compile_bundle
+from .log import get_logger
+
+log = get_logger("CacheManager")
+
+
+CACHE_DIR = os.path.dirname(MODEL_PATH)
+
+
+def atomic_copy(src_path, target_path):
+    """Copy to a temp file next to the target, fsync, then rename over it."""
+    target_dir = os.path.dirname(target_path) or "."
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix=".incoming-", suffix=".joblib")
+    try:
+        with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def install_bundle(src_path, target_path):
+    """
+    Atomically install a bundle in the memory-mappable format. With COMPILE_MODELS on, the
+    model is compiled and verified once, here, and the installed bundle holds the
+    CompiledModel: flat NumPy arrays every worker maps from the page cache. sklearn trees
+    would be copied into each process on unpickling. Models that do not compile are
+    installed unchanged.
+    """
+    bundle = joblib.load(src_path)
+    model = bundle.get("model") if isinstance(bundle, dict) else bundle
+    compiled = compile_bundle(bundle) if COMPILE_MODELS and not isinstance(model, CompiledModel) else None
+    if compiled is not None:
+        save_bundle(compiled, target_path)
+        log.info(f"Installed {compiled['model']!r}")
+    elif is_mmap_compatible(src_path):
+        atomic_copy(src_path, target_path)
+    else:
+        save_bundle(bundle, target_path)
 
-CACHE_DIR = os.path.join(os.path.dirname(__file__), '../data/cache')
 
 def update_cache(new_model_path):
-    target_path = os.path.join(CACHE_DIR, 'model.pkl')
-    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Written where model_loader / ModelRegistry read from; the backend hot-reloads it
+    target_path = MODEL_PATH
     try:
-        shutil.copy(new_model_path, target_path)
-        print('[CacheManager] Cache updated successfully')
+        install_bundle(new_model_path, target_path)
+        log.info('Cache updated successfully')
         return True
     except Exception as e:
-        print('[CacheManager] Cache update failed:', e)
-        return False
\ No newline at end of file
+        log.error(f'Cache update failed: {e}')
+        return False
@@ -0,0 +1,281 @@
+"""
+NumPy-only inference for bundled estimators.
+
+compile_model() turns a fitted scikit-learn classifier into a CompiledModel: linear
+models become a coefficient matrix, tree ensembles flattened node arrays traversed for
+all rows and trees at once. The result is checked against sklearn before it is used.
+
+    python -m app.compiled_model export bigboy.joblib bigboy.compiled.joblib
+"""
+import argparse
+import os
+import warnings
+
+import numpy as np
+
+from .log import get_logger
+
+log = get_logger("CompiledModel")
+
+# Serve a verified NumPy-only copy of supported sklearn models (0 serves the original)
+COMPILE_MODELS = os.getenv("COMPILE_MODELS", "1") != "0"
+COMPILE_PROBES = 512
+
+
+class CompiledModel:
+    """
+    Stand-in for a fitted classifier exposing classes_, n_features_in_, predict_proba()
+    and predict(). Probabilities are computed once per call and the label is their
+    argmax. Holds only NumPy arrays, so unpickling it never imports scikit-learn.
+    """
+
+    def __init__(self, kind, classes, n_features, arrays, shift=None, scale=None, allow_nan=False, source=None):
+        self.kind = kind
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.arrays = arrays
+        self.shift = shift
+        self.scale = scale
+        self.allow_nan = allow_nan
+        self.source = source
+
+    def __repr__(self):
+        return f"CompiledModel(kind={self.kind!r}, source={self.source!r}, n_features={self.n_features_in_})"
+
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model is expecting {self.n_features_in_} features as input.")
+        if not self.allow_nan and np.isnan(X).any():
+            raise ValueError("Input X contains NaN.")
+        if self.shift is not None:
+            X = (X - self.shift) / self.scale
+        return X
+
+    def decision_function(self, X):
+        a = self.arrays
+        return self._prepare(X) @ a["coef"].T + a["intercept"]
+
+    @property
+    def predict_proba(self):
+        # Property so hasattr(model, "predict_proba") stays False for decision-only models
+        if self.kind == "linear-decision":
+            raise AttributeError("predict_proba is not available for this model")
+        return self._predict_proba
+
+    def _predict_proba(self, X):
+        if self.kind == "forest":
+            return self._forest_proba(self._prepare(X))
+
+        d = self.decision_function(X)
+        if self.kind == "linear-softmax" and d.shape[1] > 1:
+            d = d - d.max(axis=1, keepdims=True)
+            np.exp(d, out=d)
+            return d / d.sum(axis=1, keepdims=True)
+        with np.errstate(over="ignore"):
+            p = 1.0 / (1.0 + np.exp(-d))
+        if p.shape[1] == 1:
+            return np.hstack([1.0 - p, p])
+        total = p.sum(axis=1, keepdims=True)  # OvR normalization
+        zero = total[:, 0] == 0
+        p[zero] = 1.0
+        total[zero] = p.shape[1]
+        return p / total
+
+    def predict(self, X):
+        if self.kind != "forest":
+            d = self.decision_function(X)
+            best = (d[:, 0] > 0).astype(int) if d.shape[1] == 1 else np.argmax(d, axis=1)
+        else:
+            best = np.argmax(self.predict_proba(X), axis=1)
+        return self.classes_[best]
+
+    def _forest_proba(self, X):
+        a = self.arrays
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        node = np.repeat(a["roots"][None, :], len(X), axis=0)
+        rows = np.arange(len(X))[:, None]
+        for _ in range(int(a["max_depth"])):
+            x = X[rows, a["feature"][node]]
+            go_left = x <= a["threshold"][node]
+            if self.allow_nan:
+                go_left = np.where(np.isnan(x), a["missing_left"][node], go_left)
+            node = np.where(go_left, a["left"][node], a["right"][node])
+        return a["value"][node].mean(axis=1)
+
+
+# --- EXPORT ---
+def _split_pipeline(model):
+    """Fold leading StandardScaler steps into (shift, scale); returns the final estimator."""
+    shift = scale = None
+    steps = [s for _, s in model.steps] if hasattr(model, "steps") else [model]
+    for step in steps[:-1]:
+        if type(step).__name__ != "StandardScaler":
+            raise TypeError(f"unsupported pipeline step {type(step).__name__}")
+        n = step.n_features_in_
+        mean = step.mean_ if step.mean_ is not None else np.zeros(n)
+        std = step.scale_ if step.scale_ is not None else np.ones(n)
+        if shift is None:
+            shift, scale = mean.astype(np.float64), std.astype(np.float64)
+        else:
+            shift, scale = shift + scale * mean, scale * std
+    return steps[-1], shift, scale
+
+
+def _flatten_forest(estimator):
+    trees = getattr(estimator, "estimators_", [estimator])
+    n_classes = len(estimator.classes_)
+    parts = {k: [] for k in ("feature", "threshold", "left", "right", "value", "missing_left")}
+    roots, offset, max_depth = [], 0, 0
+    for tree in trees:
+        t = tree.tree_
+        if t.n_outputs != 1:
+            raise TypeError("multi-output trees are not supported")
+        n = t.node_count
+        leaf = t.children_left == -1
+        idx = np.arange(offset, offset + n, dtype=np.int64)
+        parts["feature"].append(np.where(leaf, 0, t.feature))
+        parts["threshold"].append(np.where(leaf, np.inf, t.threshold))
+        parts["left"].append(np.where(leaf, idx, t.children_left + offset))
+        parts["right"].append(np.where(leaf, idx, t.children_right + offset))
+        value = t.value[:, 0, :n_classes].astype(np.float64)
+        total = value.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+        parts["value"].append(value / total)
+        missing = getattr(t, "missing_go_to_left", None)
+        parts["missing_left"].append(np.asarray(missing, dtype=bool) if missing is not None else np.ones(n, dtype=bool))
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, t.max_depth)
+
+    arrays = {k: np.concatenate(v) for k, v in parts.items()}
+    arrays["feature"] = arrays["feature"].astype(np.int64)
+    arrays["roots"] = np.asarray(roots, dtype=np.int64)
+    arrays["max_depth"] = np.int64(max_depth)
+    return arrays
+
+
+def _probes(compiled, n, rng):
+    """Inputs that exercise every split (tree thresholds ± jitter) or span the linear range."""
+    F = compiled.n_features_in_
+    Z = rng.normal(0.0, 3.0, (n, F))
+    if compiled.kind == "forest":
+        a = compiled.arrays
+        internal = a["left"] != np.arange(len(a["left"]))
+        for f in range(F):
+            # Missing-vs-present splits (trees fitted on NaN) have an infinite threshold
+            t = a["threshold"][internal & (a["feature"] == f) & np.isfinite(a["threshold"])]
+            if len(t):
+                pick = rng.choice(t, n)
+                Z[:, f] = pick + rng.choice([-1.0, 1.0], n) * (np.abs(pick) * 1e-4 + 1e-4)
+    if compiled.shift is not None:
+        Z = Z * compiled.scale + compiled.shift
+    return Z
+
+
+def compile_model(model, verify=True, n_probes=COMPILE_PROBES, seed=0):
+    """
+    Compile a fitted classifier, or return None if it is unsupported or fails verification.
+    Supported: LogisticRegression and other linear classifiers, DecisionTree / RandomForest /
+    ExtraTrees classifiers, optionally behind StandardScaler steps in a Pipeline.
+    """
+    if isinstance(model, CompiledModel):
+        return model
+    try:
+        estimator, shift, scale = _split_pipeline(model)
+        name = type(estimator).__name__
+        if hasattr(estimator, "tree_") or hasattr(getattr(estimator, "estimators_", [None])[0], "tree_"):
+            if not hasattr(estimator, "predict_proba"):
+                raise TypeError(f"{name} is not a classifier")
+            kind, arrays = "forest", _flatten_forest(estimator)
+        elif hasattr(estimator, "coef_") and hasattr(estimator, "classes_"):
+            arrays = {"coef": np.atleast_2d(np.asarray(estimator.coef_, dtype=np.float64)),
+                      "intercept": np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64))}
+            if not hasattr(estimator, "predict_proba"):
+                kind = "linear-decision"
+            elif name == "LogisticRegression" and getattr(estimator, "multi_class", "auto") != "ovr":
+                kind = "linear-softmax"
+            else:
+                kind = "linear-ovr"
+        else:
+            raise TypeError(f"unsupported estimator {name}")
+
+        compiled = CompiledModel(kind, model.classes_, model.n_features_in_, arrays, shift, scale,
+                                 source=type(model).__name__)
+        if hasattr(model, "feature_names_in_"):
+            compiled.feature_names_in_ = np.asarray(model.feature_names_in_, dtype=object)
+        if verify:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # probes are bare arrays; feature-name warnings are noise
+                _verify(compiled, model, n_probes, seed)
+        return compiled
+
+    except Exception as e:
+        log.warning(f"⚠️ Not compiling {type(model).__name__}: {e}")
+        return None
+
+
+def _verify(compiled, model, n_probes, seed):
+    """Raise ValueError unless the compiled model reproduces sklearn on probe inputs."""
+    X = _probes(compiled, n_probes, np.random.default_rng(seed))
+    if compiled.kind == "linear-decision":
+        if not np.array_equal(compiled.predict(X), model.predict(X)):
+            raise ValueError("predictions differ from sklearn")
+    elif not np.allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=1e-9, atol=1e-12):
+        raise ValueError("probabilities differ from sklearn")
+
+    # Mirror sklearn's NaN handling: raise where it raises, route like it where it accepts NaN
+    nan_probe = X[:1].copy()
+    nan_probe[0, 0] = np.nan
+    try:
+        model.predict(nan_probe)
+    except ValueError:
+        return
+    compiled.allow_nan = True
+    if compiled.kind != "linear-decision" and not np.allclose(
+            compiled.predict_proba(nan_probe), model.predict_proba(nan_probe), rtol=1e-9, atol=1e-12):
+        raise ValueError("NaN handling differs from sklearn")
+
+
+def compile_bundle(bundle):
+    """
+    The bundle (a dict or a bare estimator) with its model replaced by its CompiledModel,
+    or None if the model does not compile. A model that is already compiled is kept as is.
+    """
+    if not isinstance(bundle, dict):
+        bundle = {"model": bundle}
+    compiled = compile_model(bundle["model"])
+    if compiled is None:
+        return None
+    bundle = dict(bundle, model=compiled)
+    if bundle.get("features") is None and hasattr(compiled, "feature_names_in_"):
+        bundle["features"] = list(compiled.feature_names_in_)
+    return bundle
+
+
+def main():
+    import joblib
+    from .bundle_store import save_bundle
+    # Under `python -m` this module is __main__; compile via the package so the pickle
+    # references app.compiled_model.CompiledModel
+    from .compiled_model import compile_bundle
+
+    parser = argparse.ArgumentParser(description="Export a bundle whose model is NumPy-only.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ex = sub.add_parser("export", help="Compile bundle['model'] and write a new bundle")
+    ex.add_argument("src")
+    ex.add_argument("dst")
+    args = parser.parse_args()
+
+    bundle = compile_bundle(joblib.load(args.src))
+    if bundle is None:
+        raise SystemExit(1)
+    save_bundle(bundle, args.dst)
+    print(f"[CompiledModel] ✅ Exported {bundle['model']!r} to {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import os
+
+import numpy as np
+from functools import lru_cache
+from scipy.integrate import trapezoid
+from scipy.signal import butter, filtfilt, get_window, sosfreqz, welch
+
+# Canonical EEG bands used by the acquisition scripts and the bridge
+EEG_BANDS = {
+    "alpha": (8, 12),
+    "beta": (13, 30),
+    "theta": (4, 7),
+    "gamma": (31, 45),
+}
+
+# Muse 2 EEG channels in BrainFlow's get_eeg_channels() order
+MUSE_CHANNELS = ["TP9", "AF7", "AF8", "TP10"]
+
+# Band powers default to band_powers_exact(), the estimate of the old per-script
+# bandpower() helper every existing dataset and bundle was built with. BAND_POWER_EXACT=0
+# opts the whole process (collection scripts, muse_bridge, binary raw records) into the
+# ~10x cheaper one-PSD approximation (median ~2%, worst bands ~20-40% off). Datasets and
+# bundles record the method as "band_power"; check_band_power() refuses a mismatch.
+BAND_POWER_EXACT = os.getenv("BAND_POWER_EXACT", "1") == "1"
+BAND_POWER_METHOD = "exact" if BAND_POWER_EXACT else "fast"
+LEGACY_BAND_POWER = "exact"  # datasets and bundles without a "band_power" record
+
+
+def check_band_power(recorded, source):
+    """Raise ValueError if `source` holds band powers of another method than this process computes."""
+    recorded = recorded or LEGACY_BAND_POWER
+    if recorded != BAND_POWER_METHOD:
+        raise ValueError(f"{source} was built with {recorded} band powers but this process computes "
+                         f"{BAND_POWER_METHOD} ones; set BAND_POWER_EXACT={int(recorded == 'exact')} "
+                         f"or regenerate it")
+
+
+def _band_key(bands):
+    return tuple((name, float(lo), float(hi)) for name, (lo, hi) in bands.items())
+
+
+@lru_cache(maxsize=64)
+def band_weights(fs, nperseg, band_key, order=4):
+    """
+    (n_freqs, n_bands) matrix that turns one Welch PSD into every band power.
+
+    Each column holds the trapezoid weights over [lo, hi] multiplied by |H(f)|^4 of the
+    order-`order` Butterworth bandpass the legacy bandpower() ran through filtfilt, so a
+    single PSD reproduces the per-band filter + Welch estimate. order=None integrates
+    the raw PSD instead.
+    """
+    freqs = np.fft.rfftfreq(nperseg, d=1.0 / fs)
+    weights = np.zeros((len(freqs), len(band_key)))
+    for j, (_, lo, hi) in enumerate(band_key):
+        sel = np.nonzero((freqs >= lo) & (freqs <= hi))[0]
+        if len(sel) > 1:
+            step = np.diff(freqs[sel]) / 2.0
+            weights[sel[:-1], j] += step
+            weights[sel[1:], j] += step
+        if order:
+            sos = butter(order, [lo / (fs / 2), hi / (fs / 2)], btype="band", output="sos")
+            _, h = sosfreqz(sos, worN=freqs, fs=fs)
+            weights[:, j] *= np.abs(h) ** 4
+    weights.setflags(write=False)
+    return weights
+
+
+def band_powers_exact(data, fs, bands=EEG_BANDS, order=4):
+    """
+    The legacy estimate for every band and channel: filtfilt through an order-`order`
+    Butterworth bandpass per band, Welch PSD (nperseg = fs), trapezoid over [lo, hi].
+    One filter pass and one PSD per band, so ~n_bands times the cost of band_powers().
+    """
+    x = np.asarray(data, dtype=np.float64)
+    nperseg = min(int(fs), x.shape[-1])
+    out = np.empty(x.shape[:-1] + (len(bands),))
+    for j, (lo, hi) in enumerate(bands.values()):
+        y = x
+        if order:
+            b, a = butter(order, [lo / (fs / 2), hi / (fs / 2)], btype="band")
+            y = filtfilt(b, a, x, axis=-1)
+        freqs, psd = welch(y, fs=fs, nperseg=nperseg, axis=-1)
+        idx = (freqs >= lo) & (freqs <= hi)
+        out[..., j] = trapezoid(psd[..., idx], freqs[idx], axis=-1)
+    return out
+
+
+def band_powers(data, fs, bands=EEG_BANDS, order=4, exact=None):
+    """
+    Power of every band for every channel from one PSD per channel.
+
+    `data` is (..., n_samples) — a single signal, a (channels × samples) block or a stack
+    of windows. Returns (..., n_bands) in the order of `bands`. exact=True (default:
+    BAND_POWER_EXACT) computes band_powers_exact() instead.
+    """
+    if BAND_POWER_EXACT if exact is None else exact:
+        return band_powers_exact(data, fs, bands, order)
+    x = np.asarray(data, dtype=np.float64)
+    nperseg = min(int(fs), x.shape[-1])
+    _, psd = welch(x, fs=fs, nperseg=nperseg, axis=-1)
+    return psd @ band_weights(fs, nperseg, _band_key(bands), order)
+
+
+def band_power_dict(sig, fs, bands=EEG_BANDS, order=4):
+    """band_powers() for a single signal as a {band: power} dict."""
+    return dict(zip(bands, band_powers(sig, fs, bands, order).tolist()))
+
+
+def bandpower(sig, fs, f1, f2):
+    """Compute bandpower between f1 and f2 Hz."""
+    return float(band_powers(sig, fs, {"band": (f1, f2)})[..., 0])
+
+
+class SlidingBandpower:
+    """
+    Band powers over the last `window` seconds, emitted every `hop` seconds.
+
+    Samples go into a ring buffer and each Welch segment (nperseg = fs, 50% overlap) is
+    transformed once and cached, so an emission only FFTs the segments no earlier window
+    already covered. Every emission equals band_powers() over the same W samples; in
+    exact mode (default: BAND_POWER_EXACT) it is band_powers_exact() of the window.
+    """
+
+    def __init__(self, fs, n_channels, window=3.0, hop=0.25, bands=EEG_BANDS, order=4, exact=None):
+        self.fs = fs
+        self.bands = bands
+        self.order = order
+        self.exact = BAND_POWER_EXACT if exact is None else exact
+        self.n_channels = n_channels
+        self.window = int(round(window * fs))
+        self.hop = max(1, int(round(hop * fs)))
+        self.nperseg = min(int(fs), self.window)
+        self.step = self.nperseg - self.nperseg // 2
+        self.n_segments = (self.window - self.nperseg) // self.step + 1
+        self.weights = band_weights(fs, self.nperseg, _band_key(bands), order)
+
+        win = get_window("hann", self.nperseg)
+        self._win = win
+        self._scale = np.full(self.nperseg // 2 + 1, 1.0 / (fs * (win * win).sum()))
+        self._scale[1:-1 if self.nperseg % 2 == 0 else None] *= 2.0
+
+        # Every sample is written twice so any span of <= window samples is contiguous
+        self._ring = np.zeros((n_channels, 2 * self.window))
+        self._segments = {}
+        self.n_seen = 0
+        self.next_emit = self.window
+
+    def _write(self, block):
+        pos = self.n_seen % self.window
+        n = block.shape[1]
+        first = min(n, self.window - pos)
+        for offset in (0, self.window):
+            self._ring[:, offset + pos:offset + pos + first] = block[:, :first]
+            self._ring[:, offset:offset + n - first] = block[:, first:]
+        self.n_seen += n
+
+    def _emit(self):
+        if self.exact:
+            base = self.n_seen % self.window
+            return band_powers_exact(self._ring[:, base:base + self.window], self.fs, self.bands, self.order)
+        start = self.n_seen - self.window
+        starts = [start + k * self.step for k in range(self.n_segments)]
+        missing = [s for s in starts if s not in self._segments]
+        if missing:
+            base = self.n_seen % self.window  # ring index of `start`
+            segs = np.stack([
+                self._ring[:, base + s - start:base + s - start + self.nperseg] for s in missing
+            ])
+            segs = segs - segs.mean(axis=-1, keepdims=True)
+            spectra = np.abs(np.fft.rfft(segs * self._win, axis=-1)) ** 2 * self._scale
+            self._segments.update(zip(missing, spectra))
+        psd = np.mean([self._segments[s] for s in starts], axis=0)
+        # The next window starts one hop later; older segments are never needed again
+        for s in [s for s in self._segments if s < start + self.hop]:
+            del self._segments[s]
+        return psd @ self.weights
+
+    def push(self, block):
+        """
+        Add a (n_channels, n_samples) block; returns the (n_channels, n_bands) band
+        powers of every window completed by it, oldest first.
+        """
+        block = np.asarray(block, dtype=np.float64).reshape(self.n_channels, -1)
+        emitted = []
+        i = 0
+        while i < block.shape[1]:
+            take = min(block.shape[1] - i, self.next_emit - self.n_seen, self.window)
+            self._write(block[:, i:i + take])
+            i += take
+            if self.n_seen == self.next_emit:
+                emitted.append(self._emit())
+                self.next_emit += self.hop
+        return emitted
+
+
+class BlockWindower:
+    """
+    Every complete `window`-sample window, `hop` samples apart, from a stream of
+    (n_channels, n_samples) blocks.
+
+    Each push() concatenates the few samples left over from the previous block and
+    returns all new windows at once as a strided (n_windows, n_channels, window) view,
+    so there is no per-sample Python work however small `hop` is.
+    """
+
+    def __init__(self, n_channels, window, hop=None):
+        self.n_channels = n_channels
+        self.window = int(window)
+        self.hop = int(hop or window)
+        self.reset()
+
+    def reset(self):
+        self._tail = np.empty((self.n_channels, 0))
+        self._skip = 0  # samples to discard before the next window starts (hop > window)
+
+    def push(self, block):
+        buf = np.concatenate([self._tail, np.asarray(block, dtype=np.float64).reshape(self.n_channels, -1)], axis=1)
+        if self._skip:
+            drop = min(self._skip, buf.shape[1])
+            buf, self._skip = buf[:, drop:], self._skip - drop
+        n = buf.shape[1]
+        if n < self.window:
+            self._tail = buf
+            return np.empty((0, self.n_channels, self.window))
+
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self.window, axis=1)[:, ::self.hop]
+        next_start = windows.shape[1] * self.hop
+        self._skip = max(0, next_start - n)
+        self._tail = buf[:, next_start:].copy()
+        return windows.transpose(1, 0, 2)
+
+
+def channel_band_names(channels=MUSE_CHANNELS, bands=EEG_BANDS):
+    """Per-channel feature names, e.g. alpha_TP9, in channel-major order."""
+    return [f"{band}_{ch}" for ch in channels for band in bands]
+
+
+def band_table(powers, channels=MUSE_CHANNELS, bands=EEG_BANDS):
+    """
+    Flatten (n_windows, n_channels, n_bands) powers into rows laid out as
+    band_columns(): the plain band names carry the first channel (the single channel
+    the models were trained on), followed by every channel as band_channel.
+    """
+    powers = np.asarray(powers, dtype=np.float64)
+    return np.hstack([powers[:, 0, :], powers.reshape(len(powers), -1)])
+
+
+def band_columns(channels=MUSE_CHANNELS, bands=EEG_BANDS):
+    return list(bands) + channel_band_names(channels, bands)
+
+
+def band_frame(powers, channels=MUSE_CHANNELS, bands=EEG_BANDS):
+    """band_table() of one window's (n_channels, n_bands) powers as a dict."""
+    powers = np.asarray(powers, dtype=np.float64)
+    return dict(zip(band_columns(channels[:len(powers)], bands), band_table(powers[None])[0].tolist()))
@@ -0,0 +1,183 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .preprocess import preprocess_windows
+from .model_loader import classify_frame, classify_frames
+from .bundle_store import load_bundle
+from .model_registry import file_sha256
+from .compiled_model import COMPILE_MODELS, CompiledModel, compile_model
+from .spatial import with_spatial
+from .log import get_logger
+
+log = get_logger("ClassifyExecutor")
+
+# inline | thread | process
+CLASSIFY_BACKEND = os.getenv("CLASSIFY_BACKEND", "thread")
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", str(min(4, os.cpu_count() or 1))))
+CLASSIFY_MAX_PENDING = int(os.getenv("CLASSIFY_MAX_PENDING", "256"))
+
+
+class ExecutorBusy(Exception):
+    """Raised when the classify queue is full; callers answer 503 instead of queueing forever."""
+
+
+class ModelChanged(ExecutorBusy):
+    """A process worker no longer finds the submitted model's bundle on disk (it was replaced)."""
+
+
+# --- Jobs (module-level so the process backend can pickle them) ---
+def classify_one(model, features):
+    """Classify one extracted feature vector, exactly like /frame does inline."""
+    return classify_frame(model, features)
+
+
+def classify_windows(model, windows, features=None, filtered=False, channel_columns=()):
+    """
+    Preprocess a (n_windows, n_samples, 4 + len(channel_columns)) array and classify every window.
+    `features` is the served model's column list: the preprocessed columns are reindexed
+    to it by name (absent ones become 0) so their order never depends on the window
+    length. Bind it (and the other options) with functools.partial to submit this as a job.
+    """
+    X = preprocess_windows(windows, filtered=filtered, channel_columns=channel_columns)
+    if features is not None:
+        X = X.reindex(columns=features, fill_value=0.0)
+    return classify_frames(model, X)
+
+
+# --- Process-pool worker state: each worker keeps its own preloaded model ---
+_worker_model = None
+_worker_version = None  # sha256 of the bundle file _worker_model was loaded from
+
+
+def _load_worker_model(path):
+    global _worker_model, _worker_version
+    before = os.stat(path)
+    sha256 = file_sha256(path)
+    bundle = load_bundle(path)
+    if os.stat(path).st_ino != before.st_ino:
+        sha256 = None  # replaced while loading: the hash may not describe what was loaded
+    model = bundle.get("model") if isinstance(bundle, dict) else bundle
+    if COMPILE_MODELS and not isinstance(model, CompiledModel):
+        model = compile_model(model) or model  # installed bundles hold the compiled arrays already
+    _worker_model = with_spatial(model, bundle) if isinstance(bundle, dict) else model
+    _worker_version = sha256
+
+
+def _run_in_worker(job, arg, path, sha256):
+    """Run job with the model whose bundle file hashes to `sha256` (None: whatever is loaded)."""
+    if sha256 is not None and sha256 != _worker_version:
+        _load_worker_model(path)
+        if _worker_version != sha256:
+            raise ModelChanged(f"model {sha256[:12]} is no longer at {path}")
+    return job(_worker_model, arg)
+
+
+class ClassifyExecutor:
+    """
+    Runs CPU-bound preprocessing + prediction off the event loop.
+
+    backend="inline" keeps the old behaviour, "thread" uses a thread pool and
+    "process" a spawn-based process pool whose workers preload the served model and
+    reload it when a job is paired with another one: each job carries the sha256 of its
+    ActiveModel's bundle, and a worker that cannot load that exact file (replaced since)
+    fails the job with ModelChanged instead of scoring it with another model. Failed
+    jobs are counted in `failed`, not `completed`. At most `max_pending` jobs may be
+    queued or running; beyond that submit() raises ExecutorBusy. A worker that dies
+    (segfault, OOM kill) breaks the whole process pool: the jobs in flight fail with
+    ExecutorBusy and the next submit() starts a fresh pool.
+    """
+
+    def __init__(self, registry, backend=CLASSIFY_BACKEND, workers=CLASSIFY_WORKERS,
+                 max_pending=CLASSIFY_MAX_PENDING):
+        if backend not in ("inline", "thread", "process"):
+            raise ValueError(f"Unknown classify backend: {backend}")
+        self.registry = registry
+        self.backend = backend
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.backend == "thread":
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="classify")
+            else:
+                active = self.registry.active
+                self._pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_load_worker_model,
+                    initargs=(self.registry.path,),
+                )
+        return self._pool
+
+    async def submit(self, job, arg, active=None):
+        """
+        Run job(model, arg) on the configured backend with the model of `active` (a registry
+        ActiveModel the caller built its input for); defaults to the served one.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorBusy(f"{self.pending} classify jobs pending")
+
+        active = active or self.registry.active
+        model = active.model if active else None
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            if self.backend == "inline":
+                result = job(model, arg)
+            elif self.backend == "thread":
+                result = await asyncio.get_running_loop().run_in_executor(self._get_pool(), job, model, arg)
+            else:
+                pool = self._get_pool()
+                result = await asyncio.get_running_loop().run_in_executor(
+                    pool, _run_in_worker, job, arg,
+                    self.registry.path, active.sha256 if active else None,
+                )
+        except BrokenProcessPool as e:
+            self.failed += 1
+            self._replace_pool(pool)
+            raise ExecutorBusy(f"classify worker crashed, restarting the pool ({e})")
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    def _replace_pool(self, broken):
+        """Drop a broken pool once; concurrent jobs that failed on it find it already replaced."""
+        if self._pool is broken:
+            log.error("💀 Classify worker died; starting a new process pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self.restarts += 1
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "workers": 1 if self.backend == "inline" else self.workers,
+            "queue_depth": self.pending,
+            "peak_queue_depth": self.peak_pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
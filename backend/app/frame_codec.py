@@ -0,0 +1,186 @@
+"""
+Wire formats for frame ingest and fast JSON replies.
+
+Binary frames (Content-Type: application/octet-stream) are one or more fixed-layout
+records back to back, little-endian:
+
+    offset  size  field
+    0       2     magic b"MF"
+    2       1     version (1)
+    3       1     kind: 0 = band frames, 1 = raw samples
+    4       4     session id (uint32)
+    8       2     rows: frames (kind 0) or samples (kind 1)
+    10      2     cols: 4 bands in BAND_FEATURES order, or those plus the 16 per-channel
+                  bands in CHANNEL_FEATURES order (kind 0); channels (kind 1)
+    12      4     fs in Hz (float32, raw samples only)
+    16      8     timestamp (float64, client clock in ms)
+    24      4*rows*cols   float32 values, row-major
+
+A raw block with one column per Muse channel (TP9, AF7, AF8, TP10) yields the bands
+and the per-channel bands; other channel counts are averaged into the 4 bands.
+Payloads are read with np.frombuffer (no copy). msgpack bodies (application/msgpack)
+carry the same objects as the JSON API; JSON stays the default.
+"""
+import json
+import struct
+from collections import namedtuple
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from .dsp import EEG_BANDS, MUSE_CHANNELS, band_powers, band_table
+from .preprocess import BAND_FEATURES, CHANNEL_FEATURES
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack ingest disabled
+    msgpack = None
+
+MAGIC = b"MF"
+VERSION = 1
+KIND_BANDS = 0
+KIND_RAW = 1
+
+HEADER = struct.Struct("<2sBBIHHfd")  # magic, version, kind, session_id, rows, cols, fs, timestamp
+PAYLOAD = np.dtype("<f4")
+
+BINARY_TYPES = ("application/octet-stream",)
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+FrameRecord = namedtuple("FrameRecord", ["kind", "session_id", "timestamp", "fs", "values"])
+# Columns a band row may carry: the bands, then every per-channel band
+ROW_COLUMNS = BAND_FEATURES + CHANNEL_FEATURES
+
+# Decoded binary body: (N, 4) or (N, 20) ROW_COLUMNS rows plus the session id / timestamp of each row
+BinaryFrames = namedtuple("BinaryFrames", ["bands", "session_ids", "timestamps"])
+
+
+class FrameFormatError(ValueError):
+    """Malformed binary or msgpack payload; endpoints answer 400."""
+
+
+# --- BINARY RECORDS ---
+def encode_record(values, session_id=0, timestamp=0.0, kind=KIND_BANDS, fs=0.0):
+    """Pack a (rows, cols) array into one record (clients and tests use this)."""
+    values = np.asarray(values, dtype=PAYLOAD)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    header = HEADER.pack(MAGIC, VERSION, kind, session_id, values.shape[0], values.shape[1], fs, timestamp)
+    return header + values.tobytes()
+
+
+def decode_records(buf):
+    """Split a buffer into FrameRecords; `values` are read-only views into `buf`."""
+    records = []
+    offset = 0
+    while offset < len(buf):
+        if len(buf) - offset < HEADER.size:
+            raise FrameFormatError(f"truncated header at byte {offset}")
+        magic, version, kind, session_id, rows, cols, fs, timestamp = HEADER.unpack_from(buf, offset)
+        if magic != MAGIC or version != VERSION:
+            raise FrameFormatError(f"bad magic/version at byte {offset}")
+        if kind == KIND_BANDS and cols not in (len(BAND_FEATURES), len(ROW_COLUMNS)):
+            raise FrameFormatError(f"band records need {len(BAND_FEATURES)} or {len(ROW_COLUMNS)} columns, got {cols}")
+        if kind == KIND_RAW and not fs > 0:
+            raise FrameFormatError("raw sample records need fs > 0")
+        if kind not in (KIND_BANDS, KIND_RAW):
+            raise FrameFormatError(f"unknown record kind {kind}")
+
+        offset += HEADER.size
+        size = rows * cols * PAYLOAD.itemsize
+        if len(buf) - offset < size:
+            raise FrameFormatError(f"truncated payload: need {size} bytes, have {len(buf) - offset}")
+        values = np.frombuffer(buf, PAYLOAD, count=rows * cols, offset=offset).reshape(rows, cols)
+        records.append(FrameRecord(kind, session_id, timestamp, fs, values))
+        offset += size
+    return records
+
+
+def record_bands(record):
+    """
+    Band rows of a record: (n_frames, 4) or (n_frames, 20). A raw Muse block becomes one
+    band_table() frame with its per-channel bands; other raw blocks one channel-averaged frame.
+    """
+    if record.kind == KIND_BANDS:
+        return record.values
+    if record.values.shape[0] == 0:
+        raise FrameFormatError("empty raw sample block")
+    powers = band_powers(record.values.T, record.fs, EEG_BANDS)
+    if powers.shape[0] == len(MUSE_CHANNELS):
+        return band_table(powers[None])
+    return powers.mean(axis=0).reshape(1, -1)
+
+
+def pad_channels(rows):
+    """Widen (n, 4) band rows to ROW_COLUMNS; absent channel columns are 0, as /frame treats them."""
+    rows = np.asarray(rows, dtype=np.float64)
+    if rows.shape[1] == len(ROW_COLUMNS):
+        return rows
+    if rows.shape[1] != len(BAND_FEATURES):
+        raise FrameFormatError(f"band rows need {len(BAND_FEATURES)} or {len(ROW_COLUMNS)} columns, got {rows.shape[1]}")
+    return np.hstack([rows, np.zeros((len(rows), len(CHANNEL_FEATURES)))])
+
+
+def stack_records(records):
+    """Flatten decoded records into one BinaryFrames batch; mixed widths are padded to ROW_COLUMNS."""
+    blocks = [record_bands(r) for r in records]
+    if len({b.shape[1] for b in blocks}) > 1:
+        blocks = [pad_channels(b) for b in blocks]
+    session_ids, timestamps = [], []
+    for record, block in zip(records, blocks):
+        session_ids += [record.session_id] * len(block)
+        timestamps += [record.timestamp] * len(block)
+    bands = np.vstack(blocks).astype(np.float64) if blocks else np.empty((0, len(BAND_FEATURES)))
+    return BinaryFrames(bands, session_ids, timestamps)
+
+
+# --- REQUEST BODIES ---
+def loads_json(body):
+    """orjson when available; falls back to json for NaN/Infinity literals Python clients emit."""
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(body)
+
+
+async def read_payload(request):
+    """
+    Decode a request body by Content-Type.
+    Returns BinaryFrames for binary bodies, otherwise the JSON/msgpack object.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    if content_type in BINARY_TYPES:
+        return stack_records(decode_records(body))
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise FrameFormatError("msgpack is not installed on this server")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise FrameFormatError(f"invalid msgpack: {e}")
+    return loads_json(body)
+
+
+# --- RESPONSES ---
+def dumps_json(content):
+    """Compact JSON text for WebSocket replies."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(content, separators=(",", ":"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (NumPy scalars/arrays serialize natively, NaN → null)."""
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, separators=(",", ":")).encode("utf-8")
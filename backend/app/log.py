@@ -0,0 +1,59 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+# DEBUG shows per-frame classification lines; INFO (default) keeps lifecycle messages only
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per call site: sustained records/second and burst size before records are dropped
+LOG_RATE = float(os.getenv("LOG_RATE", "1"))
+LOG_BURST = int(os.getenv("LOG_BURST", "10"))
+
+_configured = False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (file, line), so one noisy line cannot flood stdout.
+    The next record that gets through reports how many were suppressed meanwhile.
+    """
+
+    def __init__(self, rate=LOG_RATE, burst=LOG_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+        return True
+
+
+def get_logger(name):
+    """Logger under the shared "muse" hierarchy: leveled, rate-limited, one line per record."""
+    global _configured
+    root = logging.getLogger("muse")
+    if not _configured:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s [%(name)s] %(message)s"))
+        handler.addFilter(RateLimitFilter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+    logger = logging.getLogger(f"muse.{name}")
+    return logger
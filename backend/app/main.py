@@ -1,14 +1,25 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from .preprocess import preprocess
-from .model_loader import load_model, classify_frame
+from fastapi.responses import PlainTextResponse
+from .preprocess import BAND_FEATURES, CHANNEL_FEATURES
+from .model_registry import ModelRegistry
+from .executor import ClassifyExecutor, ExecutorBusy, classify_one, classify_windows
+from .batcher import MicroBatcher
 from .sagemaker_sync import schedule_model_updates
-import pandas as pd
+from .websocket_server import serve_stream
+from .frame_codec import (BinaryFrames, FrameFormatError, FastJSONResponse as JSONResponse, ROW_COLUMNS,
+                          pad_channels, read_payload)
+from . import metrics
+from .metrics import FRAMES, StageTimer
+from .log import get_logger
+import numpy as np
 import asyncio
-import traceback
+from functools import partial
+import time
 
-app = FastAPI(title="Muse Backend", version="1.1.0")
+log = get_logger("Backend")
+
+app = FastAPI(title="Muse Backend", version="1.1.0", default_response_class=JSONResponse)
 
 # --- CORS ---
 app.add_middleware(
@@ -19,41 +30,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Global model reference ---
-model = None
+# --- Served model (hot-swappable) ---
+registry = ModelRegistry()
+
+# --- Where classification runs (inline / thread pool / process pool, see CLASSIFY_BACKEND) ---
+executor = ClassifyExecutor(registry)
+
+# Bundles trained with `app.train --filter stream` need filter state carried across frames
+STREAM_ONLY = "Model expects stream-filtered input; send frames over /ws"
+
+# --- Coalesces concurrent /frame requests into one model call (see MICROBATCH_*) ---
+batcher = MicroBatcher(executor)
+
+
+@metrics.register_collector
+def _collect_serving_state():
+    active = registry.active
+    metrics.MODEL_INFO.clear()
+    if active is not None:
+        metrics.MODEL_INFO.set(active.loaded_at, active.version, active.sha256[:12], str(active.compiled).lower())
+    metrics.QUEUE_DEPTH.set(executor.pending, "executor")
+    metrics.QUEUE_DEPTH.set(batcher.depth(), "microbatch")
+    metrics.REJECTED.set(executor.rejected, "executor")
+    metrics.REJECTED.set(batcher.rejected, "microbatch")
+    metrics.EXECUTOR_RESTARTS.set(executor.restarts)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Load model and start periodic SageMaker sync on backend startup."""
-    global model
     try:
-        model = load_model()
-
-        # 🩹 FIX: handle dict-style bundles here
-        if isinstance(model, dict):
-            if "model" in model:
-                print("⚙️ Extracted model object from bundle on startup.")
-                model = model["model"]
-            else:
-                print("❌ Model bundle missing 'model' key — cannot proceed.")
-                model = None
-
-        if model:
-            print("✅ Model loaded successfully.")
+        if await registry.reload():
+            log.info("✅ Model loaded successfully.")
         else:
-            print("⚠️ No model available on startup.")
+            log.warning("⚠️ No model available on startup.")
     except Exception as e:
-        print(f"⚠️ Failed to load model on startup: {e}")
-        traceback.print_exc()
+        log.exception(f"⚠️ Failed to load model on startup: {e}")
+
+    # Pick up bundles written by the model-updater without a restart
+    asyncio.create_task(registry.watch())
 
     # Start periodic SageMaker sync loop
     try:
         asyncio.create_task(schedule_model_updates())
-        print("🌀 SageMaker sync task started.")
+        log.info("🌀 SageMaker sync task started.")
     except Exception as e:
-        print(f"⚠️ Failed to start SageMaker sync worker: {e}")
-        traceback.print_exc()
+        log.exception(f"⚠️ Failed to start SageMaker sync worker: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    executor.shutdown()
+
+
+# One lazy load at a time; requests queued behind it reuse its result
+_lazy_load = asyncio.Lock()
+
+
+async def ensure_model():
+    """Return the served model, lazily loading it (in a worker thread) if startup could not."""
+    if registry.model is None:
+        async with _lazy_load:
+            if registry.model is None:
+                await registry.reload()
+    return registry.model
+
+
+async def ensure_active():
+    """ensure_model() for callers that also need the model's features and bundle settings."""
+    await ensure_model()
+    return registry.active
 
 
 @app.get("/")
@@ -63,11 +109,18 @@ async def root():
 
 @app.get("/status")
 async def status():
-    """Return backend readiness for the Muse bridge to check."""
-    global model
-    if model is not None:
-        return {"status": "ready"}
-    return JSONResponse({"status": "loading"}, status_code=503)
+    """Return backend readiness and the active model version for the Muse bridge to check."""
+    if registry.model is not None:
+        return {"status": "ready", "model": registry.status(), "executor": executor.stats(),
+                "microbatch": batcher.stats()}
+    return JSONResponse({"status": "loading", "model": registry.status(), "executor": executor.stats(),
+                         "microbatch": batcher.stats()}, status_code=503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms, error counters, model and queue state."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/frame")
@@ -75,41 +128,139 @@ async def receive_frame(request: Request):
     """
     Receives a JSON payload containing a single EEG frame
     Example: {"alpha": 0.1, "beta": 0.2, "theta": 0.05, "gamma": 0.01}
+    Also accepts one binary record (application/octet-stream, see frame_codec) or msgpack.
     """
+    timer = StageTimer("/frame")
     try:
-        data = await request.json()
-        if not isinstance(data, dict):
-            return JSONResponse({"error": "Invalid format: expected JSON object"}, status_code=400)
-
-        # --- Step 1: Convert to DataFrame and preprocess ---
-        df = pd.DataFrame([data])
-        cleaned = preprocess(df, aggregate=True, add_features=True)
-
-        # --- Step 2: Ensure model is loaded ---
-        global model
-        if model is None:
-            model = load_model()
-
-            # 🩹 FIX: handle dict-style bundles here too
-            if isinstance(model, dict):
-                if "model" in model:
-                    print("⚙️ Extracted model object from bundle during request.")
-                    model = model["model"]
-                else:
-                    print("❌ Model bundle missing 'model' key — cannot proceed.")
-                    model = None
-
-            if model is None:
-                return JSONResponse({"error": "Model not available"}, status_code=503)
-
-        # --- Step 3: Classify frame ---
-        result = classify_frame(model, cleaned)
-
-        return JSONResponse({
-            "result": result.get("label", "unknown"),
+        data = await read_payload(request)
+        timer.mark("parse")
+
+        # --- Step 1: Ensure model is loaded ---
+        active = await ensure_active()
+        if active is None:
+            return timer.respond(JSONResponse, {"error": "Model not available"}, 503, "no_model")
+        if active.filter == "stream":
+            return timer.respond(JSONResponse, {"error": STREAM_ONLY}, 409, "stream_only")
+        frame_features = active.frame_features  # the served model's feature layout, rebuilt on hot swap
+
+        # --- Step 2: Extract the feature vector (pandas-free fast path) ---
+        if isinstance(data, BinaryFrames):
+            if len(data.bands) != 1:
+                return timer.respond(JSONResponse, {
+                    "error": f"Invalid format: expected 1 frame, got {len(data.bands)} (use /frames)"
+                }, 400, "invalid")
+            cleaned = frame_features.from_values(data.bands[0])
+        elif isinstance(data, dict):
+            cleaned = frame_features(data)
+        else:
+            return timer.respond(JSONResponse, {"error": "Invalid format: expected JSON object"}, 400, "invalid")
+        timer.mark("preprocess")
+
+        # --- Step 3: Classify frame (micro-batched with concurrent requests, off the event loop) ---
+        if batcher.enabled:
+            result = await batcher.classify(cleaned)
+        else:
+            result = await executor.submit(classify_one, cleaned, active)
+        timer.mark("inference")
+        FRAMES.inc("/frame")
+
+        label = result.get("label", "unknown")
+        return timer.respond(JSONResponse, {
+            "result": label,
             "confidence": result.get("confidence", None)
+        }, error="classify" if label == "Unknown error" else None)
+
+    except FrameFormatError as e:
+        return timer.respond(JSONResponse, {"error": f"Invalid format: {e}"}, 400, "invalid")
+    except ExecutorBusy as e:
+        return timer.respond(JSONResponse, {"error": f"Server busy: {e}"}, 503, "busy")
+    except Exception as e:
+        log.exception(f"💀 /frame failed: {e}")
+        return timer.respond(JSONResponse, {"error": str(e)}, 500, "internal")
+
+
+@app.post("/frames")
+async def receive_frames(request: Request):
+    """
+    Receives a batch of EEG frames and classifies them in one vectorized pass.
+    Example: {"frames": [{"session_id": "muse-1", "alpha": 0.1, "beta": 0.2, "theta": 0.05, "gamma": 0.01}, ...]}
+    A bare JSON list of frames is accepted too; "session_id" is optional and echoed back.
+    Per-channel bands (alpha_TP9 ... gamma_TP10) are used when the served model was trained on them.
+    Binary bodies (application/octet-stream) may hold any number of records back to back.
+    """
+    timer = StageTimer("/frames")
+    try:
+        data = await read_payload(request)
+        timer.mark("parse")
+
+        active = await ensure_active()
+        if active is None:
+            return timer.respond(JSONResponse, {"error": "Model not available"}, 503, "no_model")
+        if active.filter == "stream":
+            return timer.respond(JSONResponse, {"error": STREAM_ONLY}, 409, "stream_only")
+        # Per-channel bands the served model was trained on; frames without them get 0 like /frame
+        channels = [c for c in CHANNEL_FEATURES if c in (active.features or ())]
+
+        if isinstance(data, BinaryFrames):
+            columns = BAND_FEATURES + channels
+            windows = pad_channels(data.bands)[:, [ROW_COLUMNS.index(c) for c in columns]]
+            session_ids = data.session_ids
+        else:
+            frames = data.get("frames") if isinstance(data, dict) else data
+            if not isinstance(frames, list) or not all(isinstance(f, dict) for f in frames):
+                return timer.respond(JSONResponse, {"error": "Invalid format: expected a list of JSON objects"},
+                                     400, "invalid")
+            # --- Step 1: One (N, 1, 4 + channels) window array ---
+            try:
+                windows = np.array([[f.get(c, np.nan) for c in BAND_FEATURES] + [f.get(c, 0.0) for c in channels]
+                                    for f in frames], dtype=float)
+            except (TypeError, ValueError):
+                return timer.respond(JSONResponse, {"error": "Invalid format: band values must be numeric"},
+                                     400, "invalid")
+            session_ids = [f.get("session_id") for f in frames]
+        timer.mark("preprocess")
+
+        results = []
+        if len(session_ids):
+            # --- Step 2: One preprocess + predict_proba over the N×F matrix, off the event loop ---
+            windows = windows.reshape(len(session_ids), 1, len(BAND_FEATURES) + len(channels))
+            # Model and feature layout come from the same ActiveModel, so a hot swap cannot mix them
+            job = partial(classify_windows, features=active.features, channel_columns=channels)
+            results = await executor.submit(job, windows, active)
+        timer.mark("inference")
+        FRAMES.inc("/frames", amount=len(results))
+        failed = sum(r["label"] == "Unknown error" for r in results)
+        if failed:
+            metrics.ERRORS.inc("/frames", "classify", amount=failed)
+
+        elapsed = time.perf_counter() - timer.start
+        return timer.respond(JSONResponse, {
+            "results": [
+                {"session_id": sid, "result": r["label"], "confidence": r["confidence"]}
+                for sid, r in zip(session_ids, results)
+            ],
+            "count": len(session_ids),
+            "elapsed_ms": elapsed * 1000.0,
+            "frames_per_sec": len(session_ids) / elapsed if elapsed > 0 else None,
         })
 
+    except FrameFormatError as e:
+        return timer.respond(JSONResponse, {"error": f"Invalid format: {e}"}, 400, "invalid")
+    except ExecutorBusy as e:
+        return timer.respond(JSONResponse, {"error": f"Server busy: {e}"}, 503, "busy")
     except Exception as e:
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        log.exception(f"💀 /frames failed: {e}")
+        return timer.respond(JSONResponse, {"error": str(e)}, 500, "internal")
+
+
+@app.websocket("/ws")
+async def stream_frames(websocket: WebSocket, window: int = None):
+    """
+    Persistent streaming endpoint: one connection per headset, predictions pushed back per frame.
+    ?window=N classifies the rolling last N frames instead of each frame on its own; the
+    default is the window the served bundle was trained on (its "frame", else 1).
+    """
+    if window is None:
+        active = registry.active
+        window = active.frame if active is not None and active.frame else 1
+    await serve_stream(websocket, ensure_active, window, executor.submit)
@@ -0,0 +1,162 @@
+"""
+In-process metrics in the Prometheus text format, served by GET /metrics.
+
+Hot-path updates are a bisect plus two additions, no allocation. Values are per
+process: with several uvicorn workers each one reports its own series.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; dense below 10 ms where the per-frame stages live
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    """Label value escaping of the text format: backslash, double quote and newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.extend(self._render_series(label_values, value))
+        return lines
+
+    def _render_series(self, label_values, value):
+        return [f"{self.name}{_labels(self.label_names, label_values)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        # Lock-free after the first observation of a series (called from the event loop)
+        series = self._values.get(label_values)
+        if series is None:
+            with self._lock:
+                series = self._values.setdefault(label_values, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def _render_series(self, label_values, series):
+        counts, total, n = series
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _fmt(bound) + '"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {_fmt(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {n}")
+        return lines
+
+
+REGISTRY = []
+_collectors = []
+
+
+def register_collector(fn):
+    """fn() runs before every scrape to refresh gauges that mirror other objects' state."""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    for fn in _collectors:
+        fn()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- SERVING METRICS ---
+REQUESTS = Counter("muse_requests_total", "Requests by endpoint and HTTP status.", ("endpoint", "status"))
+ERRORS = Counter("muse_errors_total", "Failed requests and frames by endpoint and reason.", ("endpoint", "reason"))
+FRAMES = Counter("muse_frames_total", "Frames classified by endpoint.", ("endpoint",))
+REQUEST_SECONDS = Histogram("muse_request_seconds", "End-to-end handler latency.", ("endpoint",))
+STAGE_SECONDS = Histogram("muse_stage_seconds", "Latency per handler stage (parse, preprocess, inference, serialize).",
+                          ("endpoint", "stage"))
+MODEL_INFO = Gauge("muse_model_info", "Served model; value is the load time (unix seconds).",
+                   ("version", "sha256", "compiled"))
+MODEL_LOADS = Counter("muse_model_loads_total", "Model load attempts by result.", ("result",))
+QUEUE_DEPTH = Gauge("muse_queue_depth", "Work waiting or running, by queue.", ("queue",))
+REJECTED = Gauge("muse_rejected_requests", "Requests rejected as busy since start, by queue.", ("queue",))
+EXECUTOR_RESTARTS = Gauge("muse_executor_restarts", "Process pools replaced after a worker crash since start.")
+WS_SESSIONS = Gauge("muse_ws_sessions", "Open WebSocket streaming sessions.")
+
+
+class StageTimer:
+    """
+    Times one request: mark(stage) records the time since the previous mark, respond()
+    times serialization and counts the request under its status code.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - self.last, self.endpoint, stage)
+        self.last = now
+
+    def respond(self, response_class, content, status_code=200, error=None):
+        response = response_class(content, status_code=status_code)  # renders the body
+        self.mark("serialize")
+        REQUEST_SECONDS.observe(self.last - self.start, self.endpoint)
+        REQUESTS.inc(self.endpoint, str(status_code))
+        if error:
+            ERRORS.inc(self.endpoint, error)
+        return response
@@ -2,13 +2,17 @@ import os
 import joblib
 import numpy as np
 
+from .log import get_logger
+
+log = get_logger("ModelLoader")
+
 # Correct path for use inside Docker (/app is the working directory)
-MODEL_PATH = "/app/backend/data/cache/bigboy.joblib"
+MODEL_PATH = os.getenv("MODEL_PATH", "/app/backend/data/cache/bigboy.joblib")
 
 
 def load_model():
     if not os.path.exists(MODEL_PATH):
-        print(f"[ModelLoader] ❌ No cached model found at {MODEL_PATH}")
+        log.error(f"❌ No cached model found at {MODEL_PATH}")
         return None
 
     try:
@@ -17,14 +21,14 @@ def load_model():
         # Handle dict-style bundles
         if isinstance(model_obj, dict):
             keys = model_obj.keys()
-            print(f"[ModelLoader] ℹ️ Loaded bundle keys: {list(keys)}")
+            log.info(f"ℹ️ Loaded bundle keys: {list(keys)}")
             model_obj = model_obj.get("model", None)
 
-        print(f"[ModelLoader] ✅ Loaded model successfully from {MODEL_PATH}")
+        log.info(f"✅ Loaded model successfully from {MODEL_PATH}")
         return model_obj
 
     except Exception as e:
-        print(f"[ModelLoader] 💀 Failed to load model: {e}")
+        log.error(f"💀 Failed to load model: {e}")
         return None
 
 
@@ -44,19 +48,61 @@ def classify_frame(model, data):
         if features.size == 0:
             raise ValueError("Empty feature array passed to classifier.")
 
-        # Run prediction
-        prediction = model.predict(features)[0]
-
-        # Compute confidence (if model supports predict_proba)
+        # Run prediction: one predict_proba, the label is its argmax
         if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(features)
-            confidence = float(np.max(proba))
+            proba = model.predict_proba(features)[0]
+            best = int(np.argmax(proba))
+            prediction = model.classes_[best]
+            confidence = float(proba[best])
         else:
+            prediction = model.predict(features)[0]
             confidence = 1.0  # fallback for non-probabilistic models
 
-        print(f"[ModelLoader] 🧠 Classification result: {prediction} (confidence={confidence:.2f})")
+        log.debug("🧠 Classification result: %s (confidence=%.2f)", prediction, confidence)
         return {"label": str(prediction), "confidence": confidence}
 
     except Exception as e:
-        print(f"[ModelLoader] 💀 Classification error: {e}")
+        log.error(f"💀 Classification error: {e}")
         return {"label": "Unknown error", "confidence": 0.0}
+
+
+def classify_frames(model, data):
+    """
+    Classify a batch of preprocessed EEG frames with a single predict_proba call.
+    Rows with non-finite features (e.g. blink-masked) get their own "Unknown error"
+    result; the rest of the batch is classified as usual.
+    """
+    features = data.values if hasattr(data, "values") else np.asarray(data)
+    if features.ndim == 1:
+        features = features.reshape(1, -1)
+    results = [{"label": "Unknown error", "confidence": 0.0} for _ in range(features.shape[0])]
+    if features.shape[0] == 0:
+        return results
+
+    try:
+        if model is None:
+            raise ValueError("Model is None — not loaded.")
+        valid = np.isfinite(np.asarray(features, dtype=np.float64)).all(axis=1)
+        if not valid.all():
+            log.warning(f"⚠️ {int((~valid).sum())} of {len(valid)} frame(s) have non-finite features")
+        rows = np.flatnonzero(valid)
+        if not len(rows):
+            return results
+        X = features[rows]
+
+        if hasattr(model, "predict_proba"):
+            proba = model.predict_proba(X)
+            best = np.argmax(proba, axis=1)
+            labels = np.asarray(model.classes_)[best]
+            confidences = proba[np.arange(len(best)), best]
+        else:
+            labels = model.predict(X)
+            confidences = np.ones(len(labels))
+
+        for i, l, c in zip(rows, labels, confidences):
+            results[i] = {"label": str(l), "confidence": float(c)}
+        return results
+
+    except Exception as e:
+        log.exception(f"💀 Batch classification error: {e}")
+        return results
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .model_loader import MODEL_PATH
+from .cache_manager import install_bundle
+from .bundle_store import load_bundle
+from .preprocess import BAND_FEATURES, FrameFeatures
+from .compiled_model import COMPILE_MODELS, CompiledModel, compile_model
+from .spatial import with_spatial
+from .dsp import check_band_power
+from .metrics import MODEL_LOADS
+from .log import get_logger
+
+log = get_logger("ModelRegistry")
+
+WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+
+# `frame`: band frames per sample the bundle was trained on (app.train), None if unknown.
+# `frame_features`: the /frame extractor laid out in this model's feature order.
+# `filter`: "window" (each sample filtered on its own) or "stream" (StreamingFilter state
+# carried across a session's frames, only servable over /ws).
+ActiveModel = namedtuple("ActiveModel", ["model", "features", "version", "sha256", "loaded_at", "compiled", "frame",
+                                         "frame_features", "filter"], defaults=(False, None, None, "window"))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Owns the model the backend serves and swaps in new bundles with zero downtime.
+
+    Bundles are installed atomically at `path` (temp file + rename), loaded and
+    warm-up validated off the request path, then published with a single reference
+    assignment, so requests always see either the old or the new model, never a mix.
+    """
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self.active = None
+        self._signature = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        active = self.active
+        return active.model if active else None
+
+    def status(self):
+        active = self.active
+        if active is None:
+            return {"version": None, "sha256": None, "loaded_at": None, "path": self.path}
+        return {
+            "version": active.version,
+            "sha256": active.sha256,
+            "loaded_at": active.loaded_at,
+            "compiled": active.compiled,
+            "n_features": len(active.features) if active.features is not None else None,
+            "frame": active.frame,
+            "filter": active.filter,
+            "path": self.path,
+        }
+
+    def install(self, src_path):
+        """Atomically place a new bundle at the served path and load it."""
+        install_bundle(src_path, self.path)
+        return self.load()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self):
+        """Load, validate and publish the bundle at `path`. Keeps the old model on failure."""
+        with self._load_lock:
+            signature = self._stat_signature()
+            if signature is None:
+                log.error(f"❌ No cached model found at {self.path}")
+                MODEL_LOADS.inc("missing")
+                return False
+            self._signature = signature
+
+            try:
+                sha256 = file_sha256(self.path)
+                if self.active is not None and self.active.sha256 == sha256:
+                    MODEL_LOADS.inc("unchanged")
+                    return True
+
+                bundle = load_bundle(self.path)  # arrays memory-mapped, shared across workers
+                features = None
+                version = None
+                frame = None
+                filter_mode = "window"
+                model = bundle
+                if isinstance(bundle, dict):
+                    if "model" not in bundle:
+                        raise ValueError("bundle missing 'model' key")
+                    model = bundle["model"]
+                    features = bundle.get("features")
+                    version = bundle.get("version")
+                    frame = bundle.get("frame")
+                    filter_mode = bundle.get("filter", "window")
+                    if filter_mode not in ("window", "stream"):
+                        raise ValueError(f"unknown filter mode {filter_mode!r}")
+                if features is None and hasattr(model, "feature_names_in_"):
+                    features = list(model.feature_names_in_)
+                # Bare estimators and older bundles predate the record: the old (exact) helper
+                check_band_power(bundle.get("band_power") if isinstance(bundle, dict) else None, "bundle")
+                if COMPILE_MODELS and not isinstance(model, CompiledModel):
+                    # install_bundle() stores the compiled model; anything else is compiled per process
+                    compiled = compile_model(model)
+                    if compiled is not None:
+                        log.warning(f"⚠️ Compiling {type(model).__name__} in this process; install the bundle "
+                                    f"with cache_manager.install_bundle() to compile it once for every worker")
+                        model = compiled
+                inner = model
+                model = with_spatial(model, bundle, features)  # fitted ICA/PCA as one matmul
+
+                self._warm_up(model, features)
+            except Exception as e:
+                log.error(f"💀 Rejected model at {self.path}: {e}")
+                MODEL_LOADS.inc("rejected")
+                return False
+
+            self.active = ActiveModel(
+                model=model,
+                features=list(features) if features is not None else None,
+                version=str(version) if version is not None else sha256[:12],
+                sha256=sha256,
+                loaded_at=time.time(),
+                compiled=isinstance(inner, CompiledModel),
+                frame=int(frame) if frame is not None else None,
+                frame_features=FrameFeatures(features),
+                filter=filter_mode,
+            )
+            MODEL_LOADS.inc("loaded")
+            spatial = " + spatial filter" if inner is not model else ""
+            log.info(f"✅ Serving model {self.active.version} ({type(inner).__name__}{spatial}) from {self.path}")
+            return True
+
+    @staticmethod
+    def _warm_up(model, features):
+        """Run one prediction at the serving width so a broken bundle is never served."""
+        probe = np.zeros((1, len(features) if features else len(BAND_FEATURES)))
+        if hasattr(model, "predict_proba"):
+            model.predict_proba(probe)
+        else:
+            model.predict(probe)
+
+    async def reload(self):
+        """Load in a worker thread so the event loop keeps serving the current model."""
+        return await asyncio.to_thread(self.load)
+
+    async def watch(self, interval=WATCH_INTERVAL):
+        """Reload whenever the bundle file is replaced (e.g. by the model-updater process)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._stat_signature() not in (None, self._signature):
+                    log.info("🔄 Model file changed, reloading in background...")
+                    await self.reload()
+            except Exception as e:
+                log.warning(f"⚠️ Watch error: {e}")
@@ -1,29 +1,106 @@
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt, welch, iirnotch
+from functools import lru_cache
+from scipy.signal import butter, filtfilt, welch, iirnotch, sosfilt, sosfilt_zi, tf2sos
+import logging
 import warnings
 
+# Plain logging (no package import) so frontend scripts can load this file standalone
+log = logging.getLogger("muse.Preprocess")
+
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
+# Per-channel band powers (app.dsp.channel_band_names()); spelled out here so this file
+# stays loadable on its own. They pass through cleanup and aggregation next to the bands.
+CHANNEL_FEATURES = [f"{band}_{ch}" for ch in ["TP9", "AF7", "AF8", "TP10"]
+                    for band in ["alpha", "beta", "theta", "gamma"]]
+
+# --- FILTER DESIGNS (cached per fs/band/order) ---
+@lru_cache(maxsize=32)
+def _bandpass_ba(lowcut, highcut, fs, order):
+    nyq = 0.5 * fs
+    return butter(order, [lowcut / nyq, highcut / nyq], btype="band")
+
+
+@lru_cache(maxsize=32)
+def _notch_ba(freq, fs, quality):
+    return iirnotch(freq, quality, fs)
+
+
+@lru_cache(maxsize=32)
+def _filter_sos(lowcut, highcut, fs, order, notch, quality):
+    """Bandpass + notch cascade as second-order sections."""
+    nyq = 0.5 * fs
+    band = butter(order, [lowcut / nyq, highcut / nyq], btype="band", output="sos")
+    return np.vstack([band, tf2sos(*_notch_ba(notch, fs, quality))])
+
+
 # --- FILTER HELPERS ---
 def bandpass_filter(data, lowcut=1.0, highcut=40.0, fs=256, order=5):
     """Apply bandpass filter to EEG signal."""
-    nyq = 0.5 * fs
-    low, high = lowcut / nyq, highcut / nyq
-    b, a = butter(order, [low, high], btype="band")
+    b, a = _bandpass_ba(lowcut, highcut, fs, order)
     return filtfilt(b, a, data)
 
 
 def notch_filter(data, freq=60.0, fs=256, quality=30):
     """Remove powerline noise."""
-    b, a = iirnotch(freq, quality, fs)
+    b, a = _notch_ba(freq, fs, quality)
     return filtfilt(b, a, data)
 
 
+class StreamingFilter:
+    """
+    Causal bandpass + notch filter for live chunks.
+
+    Carries sosfilt initial conditions per channel between calls, so each chunk is
+    filtered once in O(chunk) and the concatenated output equals causal_filter() over
+    the whole recording. Non-finite samples hold the previous value for the filter
+    state and come back as NaN.
+    """
+
+    def __init__(self, lowcut=1.0, highcut=40.0, fs=256, order=5, notch=60.0, quality=30):
+        self.sos = _filter_sos(lowcut, highcut, fs, order, notch, quality)
+        self.zi = None
+        self.last = None
+
+    def reset(self):
+        self.zi = None
+        self.last = None
+
+    def process(self, chunk):
+        """Filter a (n_samples,) or (n_samples, n_channels) chunk."""
+        x = np.array(chunk, dtype=np.float64)
+        squeeze = x.ndim == 1
+        if squeeze:
+            x = x[:, None]
+        if len(x) == 0:
+            return x[:, 0] if squeeze else x
+
+        missing = ~np.isfinite(x)
+        x[missing] = np.nan
+        if self.zi is None:
+            # Start in steady state at the first finite sample of each channel
+            first = np.nan_to_num(pd.DataFrame(x).bfill().values[0])
+            self.last = first
+            self.zi = sosfilt_zi(self.sos)[:, :, None] * first[None, None, :]
+        if missing.any():
+            x = pd.DataFrame(np.vstack([self.last, x])).ffill().values[1:]
+        self.last = x[-1].copy()
+
+        y, self.zi = sosfilt(self.sos, x, axis=0, zi=self.zi)
+        y[missing] = np.nan
+        return y[:, 0] if squeeze else y
+
+
+def causal_filter(data, **kwargs):
+    """Offline reference for StreamingFilter: one causal pass over the whole signal."""
+    return StreamingFilter(**kwargs).process(data)
+
+
 # --- ARTIFACT REDUCTION ---
 def remove_blink_artifacts(df, threshold=150.0):
     """Interpolates and smooths spikes above threshold to reduce blink/muscle artifacts."""
-    features = ["alpha", "beta", "theta", "gamma"]
+    features = ["alpha", "beta", "theta", "gamma"] + CHANNEL_FEATURES
     for f in features:
         if f in df.columns:
             mask = df[f].abs() > threshold
@@ -69,9 +146,12 @@ def add_interaction_features(df):
 
 
 # --- MAIN PIPELINE ---
-def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = True) -> pd.DataFrame:
+def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = True,
+               stream: StreamingFilter = None) -> pd.DataFrame:
     """
     Full EEG preprocessing pipeline — filters, artifact cleaning, feature expansion.
+    Pass a StreamingFilter as `stream` to filter live chunks causally, carrying its
+    state across calls, instead of running zero-phase filtfilt on each chunk.
     """
     if df.empty:
         return df
@@ -82,13 +162,17 @@ def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = Tr
     features = ["alpha", "beta", "theta", "gamma"]
 
     # 1. Bandpass + Notch filtering
-    for f in features:
-        if f in df.columns:
-            try:
-                df[f] = bandpass_filter(df[f].values)
-                df[f] = notch_filter(df[f].values)
-            except Exception:
-                pass
+    if stream is not None:
+        present = [f for f in features if f in df.columns]
+        df[present] = stream.process(df[present].values)
+    else:
+        for f in features:
+            if f in df.columns:
+                try:
+                    df[f] = bandpass_filter(df[f].values)
+                    df[f] = notch_filter(df[f].values)
+                except Exception:
+                    pass
 
     # 2. Artifact cleanup
     df = remove_blink_artifacts(df)
@@ -99,7 +183,7 @@ def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = Tr
         try:
             df, psd_features = add_psd_features(df)
         except Exception as e:
-            print(f"[Preprocess] PSD feature gen failed: {e}")
+            log.warning(f"PSD feature gen failed: {e}")
         df = add_interaction_features(df)
 
         # Guarantee that we always return expected feature names
@@ -111,6 +195,7 @@ def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = Tr
 
     # 4. Aggregate by attempt_id and label if available
     if aggregate:
+        psd_features = psd_features + [c for c in CHANNEL_FEATURES if c in df.columns]
         group_cols = []
         if "attempt_id" in df.columns:
             group_cols.append("attempt_id")
@@ -125,3 +210,107 @@ def preprocess(df: pd.DataFrame, aggregate: bool = True, add_features: bool = Tr
         return aggregated
 
     return df
+
+
+# --- BATCHED PIPELINE ---
+BAND_FEATURES = ["alpha", "beta", "theta", "gamma"]
+
+
+def preprocess_windows(windows, fs=256, add_features=True, channel_columns=(), filtered=False) -> pd.DataFrame:
+    """
+    Vectorized equivalent of preprocess(window, aggregate=True) applied to every window.
+
+    `windows` is a (n_windows, n_samples, 4) array with columns in BAND_FEATURES order,
+    optionally followed by the CHANNEL_FEATURES named in `channel_columns`; a single
+    /frame payload is just a window with n_samples == 1. Returns one row per window with
+    the same columns preprocess() produces. `filtered=True` skips the per-window
+    filtfilt for bands that already ran through a StreamingFilter, like preprocess(stream=...).
+    """
+    X = np.array(windows, dtype=np.float64)
+    if X.ndim == 2:
+        X = X[:, None, :]
+    X = np.ascontiguousarray(X.transpose(0, 2, 1))  # (n_windows, 4 + channels, n_samples)
+    n_samples = X.shape[2]
+    X[~np.isfinite(X)] = np.nan
+
+    # 1. Bandpass + Notch filtering of the bands (both skipped when the window is too short)
+    if not filtered:
+        try:
+            X[:, :4] = notch_filter(bandpass_filter(X[:, :4], fs=fs), fs=fs)
+        except ValueError:
+            pass
+
+    # 2. Artifact cleanup — only (window, band) series containing a spike are touched
+    spikes = np.abs(X) > 150.0
+    w_idx, c_idx = np.nonzero(spikes.any(axis=2))
+    if len(w_idx):
+        series = X[w_idx, c_idx, :]
+        series[spikes[w_idx, c_idx, :]] = np.nan
+        X[w_idx, c_idx, :] = pd.DataFrame(series.T).interpolate().bfill().ffill().values.T
+
+    # All-NaN series (e.g. a fully masked band) aggregate to NaN; np.nanmean's
+    # "Mean of empty slice" warning for them is expected, so it is silenced here only
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        columns = list(BAND_FEATURES)
+        values = [np.nanmean(X[:, :4], axis=2)]
+
+        # 3. Add features — preprocess() overwrites the PSD columns with interaction terms,
+        #    so only the Welch frequency grid decides which columns exist.
+        if add_features and n_samples >= 8:
+            freqs = np.fft.rfftfreq(min(n_samples, 256), d=1.0 / fs)
+            bands = {"theta": (4, 8), "alpha": (8, 13), "beta": (13, 30), "gamma": (30, 40)}
+            for i, a in enumerate(BAND_FEATURES):
+                for b, (low, high) in bands.items():
+                    if np.any((freqs >= low) & (freqs <= high)):
+                        j = BAND_FEATURES.index(b)
+                        columns.append(f"{a}_{b}_power")
+                        values.append(np.nanmean(X[:, i, :] * X[:, j, :], axis=1)[:, None])
+
+        if len(channel_columns):
+            columns.extend(channel_columns)
+            values.append(np.nanmean(X[:, 4:], axis=2))
+
+    return pd.DataFrame(np.hstack(values), columns=columns)
+
+
+# --- SINGLE-FRAME FAST PATH ---
+class FrameFeatures:
+    """
+    Pandas-free equivalent of preprocess(pd.DataFrame([frame]), aggregate=True, add_features=True).
+
+    A lone frame is too short to filter or to yield PSD/interaction columns, so the
+    pipeline reduces to masking non-finite values and blink spikes. The band values
+    are written straight into a (1, n) vector laid out in `columns` (the model's
+    feature order); columns the frame cannot produce are 0.0, like reindex(fill_value=0).
+    """
+
+    def __init__(self, columns=None, threshold=150.0):
+        self.columns = list(columns) if columns is not None else list(BAND_FEATURES)
+        self.threshold = threshold
+        self._slots = [(self.columns.index(f), f) for f in BAND_FEATURES if f in self.columns]
+        self._channel_slots = [(self.columns.index(f), f) for f in CHANNEL_FEATURES if f in self.columns]
+        self._template = np.zeros((1, len(self.columns)))
+
+    def __call__(self, frame, out=None):
+        """Return the feature vector for one frame dict; `out` reuses a caller-owned buffer."""
+        if out is None:
+            out = self._template.copy()
+        else:
+            out[:] = 0.0
+        row = out[0]
+        for i, f in self._slots:
+            v = float(frame[f])
+            row[i] = v if abs(v) <= self.threshold else np.nan  # inf/NaN/spikes → NaN
+        for i, f in self._channel_slots:
+            if f in frame:  # optional; absent columns stay 0.0 like reindex(fill_value=0)
+                v = float(frame[f])
+                row[i] = v if abs(v) <= self.threshold else np.nan
+        return out
+
+    def from_values(self, values, out=None):
+        """
+        Same as __call__ for values already laid out in BAND_FEATURES order, optionally
+        followed by the CHANNEL_FEATURES (a binary band record with 4 or 20 columns).
+        """
+        return self(dict(zip(BAND_FEATURES + CHANNEL_FEATURES, np.asarray(values, dtype=np.float64).ravel())), out)
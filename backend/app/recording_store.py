@@ -0,0 +1,390 @@
+"""
+Append-only binary store for raw EEG recordings.
+
+A recording is a directory of flat little-endian arrays that only ever grow:
+
+    session.museraw/
+        meta.json        format, fs, channel names, created_at, source
+        samples.f32      float32, row-major (n_samples, n_channels)
+        timestamps.f64   float64 unix seconds, one per sample
+        chunks.i64       int64 (n_chunks, 2): first sample and sample count of every append
+
+Readers memory-map the arrays, so any time range is a slice of the page cache with no
+text parsing. A torn final append is ignored: the sample count is whatever every file
+holds completely. `StreamRecorder` moves the disk writes of a live recording onto a
+background thread behind a bounded queue, so acquisition never waits on the disk.
+
+    python -m app.recording_store convert raw_muse_data.csv raw_muse_data.museraw --fs 256
+    python -m app.recording_store info raw_muse_data.museraw
+    python -m app.recording_store export raw_muse_data.museraw out.csv --start 2 --end 5
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+FORMAT = "muse-raw"
+FORMAT_VERSION = 1
+SAMPLE_DTYPE = np.dtype("<f4")
+TIME_DTYPE = np.dtype("<f8")
+CHUNK_DTYPE = np.dtype("<i8")
+DEFAULT_CHANNELS = ["TP9", "AF7", "AF8", "TP10"]
+CSV_CHUNK_ROWS = 1 << 16
+GAP_TOLERANCE = 2.5  # sample periods between timestamps before samples count as missing
+
+META_FILE = "meta.json"
+SAMPLES_FILE = "samples.f32"
+TIMESTAMPS_FILE = "timestamps.f64"
+CHUNKS_FILE = "chunks.i64"
+
+
+def _complete_samples(path, n_channels):
+    """Samples fully present in both the sample and timestamp files."""
+    sample_bytes = os.path.getsize(os.path.join(path, SAMPLES_FILE))
+    time_bytes = os.path.getsize(os.path.join(path, TIMESTAMPS_FILE))
+    return min(sample_bytes // (SAMPLE_DTYPE.itemsize * n_channels), time_bytes // TIME_DTYPE.itemsize)
+
+
+class RecordingWriter:
+    """
+    Appends (n_samples, n_channels) blocks to a recording, creating it on first use.
+    Reopening an existing recording continues it; fs and channels must match.
+    Timestamps default to a continuous clock at `fs` from the previous sample.
+    """
+
+    def __init__(self, path, channels=DEFAULT_CHANNELS, fs=256.0, source=None):
+        self.path = path
+        self.channels = list(channels)
+        self.fs = float(fs)
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["channels"] != self.channels or float(meta["fs"]) != self.fs:
+                raise ValueError(f"{path} holds {meta['channels']} at {meta['fs']} Hz, "
+                                 f"not {self.channels} at {self.fs} Hz")
+            self.n_samples = _complete_samples(path, len(self.channels))
+            self._truncate_torn_tail()
+        else:
+            meta = {"format": FORMAT, "version": FORMAT_VERSION, "fs": self.fs, "channels": self.channels,
+                    "dtype": SAMPLE_DTYPE.str, "created_at": time.time(), "source": source}
+            tmp_path = meta_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f, indent=2)
+            os.replace(tmp_path, meta_path)
+            self.n_samples = 0
+
+        self._samples = open(os.path.join(path, SAMPLES_FILE), "ab")
+        self._timestamps = open(os.path.join(path, TIMESTAMPS_FILE), "ab")
+        self._chunks = open(os.path.join(path, CHUNKS_FILE), "ab")
+        self._last_time = None
+        if self.n_samples:
+            ts = np.memmap(os.path.join(path, TIMESTAMPS_FILE), TIME_DTYPE, mode="r", shape=(self.n_samples,))
+            self._last_time = float(ts[-1])
+            del ts
+
+    def _truncate_torn_tail(self):
+        n = self.n_samples
+        for name, size in ((SAMPLES_FILE, n * len(self.channels) * SAMPLE_DTYPE.itemsize),
+                           (TIMESTAMPS_FILE, n * TIME_DTYPE.itemsize)):
+            file_path = os.path.join(self.path, name)
+            if os.path.getsize(file_path) > size:
+                os.truncate(file_path, size)
+        chunks_path = os.path.join(self.path, CHUNKS_FILE)
+        if os.path.exists(chunks_path):
+            chunks = np.fromfile(chunks_path, CHUNK_DTYPE)
+            chunks = chunks[:len(chunks) // 2 * 2].reshape(-1, 2)
+            keep = chunks[chunks.sum(axis=1) <= n]
+            if len(keep) != len(chunks) or os.path.getsize(chunks_path) != keep.nbytes:
+                keep.astype(CHUNK_DTYPE).tofile(chunks_path)
+
+    def append(self, samples, timestamps=None):
+        """Append one block; returns the number of samples written."""
+        block = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE)
+        if block.ndim == 1:
+            block = block.reshape(-1, len(self.channels))
+        if block.shape[1] != len(self.channels):
+            raise ValueError(f"expected {len(self.channels)} channels, got {block.shape[1]}")
+        n = len(block)
+        if n == 0:
+            return 0
+
+        if timestamps is None:
+            first = self._last_time + 1.0 / self.fs if self._last_time is not None else time.time() - (n - 1) / self.fs
+            timestamps = first + np.arange(n) / self.fs
+        timestamps = np.ascontiguousarray(timestamps, dtype=TIME_DTYPE)
+        if timestamps.shape != (n,):
+            raise ValueError(f"expected {n} timestamps, got {timestamps.shape}")
+
+        # Samples and timestamps before the chunk row, so the index never points past the data
+        self._samples.write(block.tobytes())
+        self._timestamps.write(timestamps.tobytes())
+        self._chunks.write(np.array([self.n_samples, n], dtype=CHUNK_DTYPE).tobytes())
+        self.n_samples += n
+        self._last_time = float(timestamps[-1])
+        return n
+
+    def flush(self, fsync=False):
+        for f in (self._samples, self._timestamps, self._chunks):
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        if self._samples.closed:
+            return
+        self.flush(fsync=True)
+        for f in (self._samples, self._timestamps, self._chunks):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    Read-only, memory-mapped view of a recording.
+    `samples` is (n_samples, n_channels) float32 and `timestamps` (n_samples,) float64;
+    slicing either touches only the pages it needs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} recording")
+        self.fs = float(self.meta["fs"])
+        self.channels = list(self.meta["channels"])
+        self.n_samples = _complete_samples(path, len(self.channels))
+        shape = (self.n_samples, len(self.channels))
+        if self.n_samples:
+            self.samples = np.memmap(os.path.join(path, SAMPLES_FILE), SAMPLE_DTYPE, mode="r", shape=shape)
+            self.timestamps = np.memmap(os.path.join(path, TIMESTAMPS_FILE), TIME_DTYPE, mode="r",
+                                        shape=(self.n_samples,))
+        else:
+            self.samples = np.empty(shape, SAMPLE_DTYPE)
+            self.timestamps = np.empty(0, TIME_DTYPE)
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def start_time(self):
+        return float(self.timestamps[0]) if self.n_samples else None
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) + 1.0 / self.fs if self.n_samples else 0.0
+
+    def chunks(self):
+        """(n_chunks, 2) array of [first sample, sample count] per append."""
+        chunks = np.fromfile(os.path.join(self.path, CHUNKS_FILE), CHUNK_DTYPE)
+        chunks = chunks[:len(chunks) // 2 * 2].reshape(-1, 2)
+        return chunks[chunks.sum(axis=1) <= self.n_samples]
+
+    def index_range(self, start=None, end=None, absolute=False):
+        """Sample index range [i, j) for seconds since the first sample (or unix seconds if absolute)."""
+        if not self.n_samples:
+            return 0, 0
+        offset = 0.0 if absolute else self.start_time
+        i = 0 if start is None else int(np.searchsorted(self.timestamps, offset + start, side="left"))
+        j = self.n_samples if end is None else int(np.searchsorted(self.timestamps, offset + end, side="left"))
+        return i, max(i, j)
+
+    def slice(self, start=None, end=None, absolute=False):
+        """(samples, timestamps) views for [start, end) seconds, without copying."""
+        i, j = self.index_range(start, end, absolute)
+        return self.samples[i:j], self.timestamps[i:j]
+
+    def to_dataframe(self, start=None, end=None, absolute=False):
+        import pandas as pd
+        samples, timestamps = self.slice(start, end, absolute)
+        df = pd.DataFrame(np.asarray(samples, dtype=np.float64), columns=self.channels)
+        df.insert(0, "timestamp", np.asarray(timestamps))
+        return df
+
+
+class StreamRecorder:
+    """
+    Writes blocks from an acquisition loop to a RecordingWriter on a background thread.
+
+    put() never blocks: when the bounded queue is full the block is dropped and counted,
+    so memory stays at `max_blocks` blocks however long the session runs. The writer
+    thread appends everything queued in one go, flushes after each batch and fsyncs every
+    `fsync_interval` seconds. Timestamp jumps larger than GAP_TOLERANCE sample periods, other
+    than those left by dropped blocks, are counted as samples lost upstream (BLE drops, a
+    ring-buffer overflow).
+    """
+
+    _STOP = object()
+
+    def __init__(self, writer, max_blocks=64, fsync_interval=5.0):
+        self.writer = writer
+        self.fsync_interval = fsync_interval
+        self.queue = queue.Queue(max_blocks)
+        self.written = 0
+        self.dropped_blocks = 0
+        self.dropped_samples = 0
+        self.gap_samples = 0
+        self.error = None
+        self._last_time = writer._last_time
+        self._after_drop = False
+        self._thread = threading.Thread(target=self._run, name="recording-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, samples, timestamps=None):
+        """Queue one block; returns False if it was dropped."""
+        if self.error is not None:
+            raise RuntimeError("recording writer failed") from self.error
+        if len(samples) == 0:
+            return True
+        try:
+            # After a drop the jump to this block is already counted in dropped_samples
+            self.queue.put_nowait((samples, timestamps, self._after_drop))
+            self._after_drop = False
+            return True
+        except queue.Full:
+            self.dropped_blocks += 1
+            self.dropped_samples += len(samples)
+            self._after_drop = True
+            return False
+
+    def _count_gaps(self, timestamps, after_drop):
+        if self._last_time is not None and not after_drop:
+            timestamps = np.concatenate([[self._last_time], timestamps])
+        steps = np.diff(timestamps) * self.writer.fs
+        missing = steps[steps > GAP_TOLERANCE]
+        self.gap_samples += int(np.rint(missing).sum() - len(missing))
+
+    def _run(self):
+        last_sync = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.queue.maxsize:  # take everything already waiting
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for i, item in enumerate(batch):
+                if item is self._STOP:
+                    stopping = True
+                    batch = batch[:i]
+                    break
+            try:
+                for samples, timestamps, after_drop in batch:
+                    if timestamps is not None:
+                        self._count_gaps(np.asarray(timestamps, dtype=np.float64), after_drop)
+                    self.written += self.writer.append(samples, timestamps)
+                    self._last_time = self.writer._last_time
+                if batch:
+                    self.writer.flush()
+                if time.monotonic() - last_sync >= self.fsync_interval:
+                    self.writer.flush(fsync=True)
+                    last_sync = time.monotonic()
+            except Exception as e:  # disk full, permissions...: stop accepting blocks
+                self.error = e
+                return
+
+    def stop(self):
+        """Write everything queued, fsync and close the writer."""
+        while self._thread.is_alive():
+            try:
+                self.queue.put(self._STOP, timeout=0.5)
+                break
+            except queue.Full:
+                pass  # writer is draining; it may also have died with self.error set
+        if self._thread.ident is not None:
+            self._thread.join()
+        self.writer.close()
+
+    def stats(self):
+        return {"written": self.written, "queued": self.queue.qsize(), "dropped_blocks": self.dropped_blocks,
+                "dropped_samples": self.dropped_samples, "gap_samples": self.gap_samples}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def open_recording(path):
+    return Recording(path)
+
+
+def convert_csv(csv_path, out_path, fs=256.0, start_time=0.0, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Convert a raw CSV (header of channel names, optional 'timestamp' column) in bounded memory.
+    Without a timestamp column, samples are stamped start_time + i / fs.
+    """
+    import pandas as pd
+    if os.path.exists(os.path.join(out_path, META_FILE)):
+        raise FileExistsError(f"{out_path} already exists")
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    channels = [c for c in header if c != "timestamp"]
+    writer = None
+    n = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=np.float64):
+            if writer is None:
+                writer = RecordingWriter(out_path, channels, fs, source=os.path.basename(csv_path))
+            if "timestamp" in chunk.columns:
+                timestamps = chunk["timestamp"].to_numpy()
+            else:
+                timestamps = start_time + (n + np.arange(len(chunk))) / fs
+            n += writer.append(chunk[channels].to_numpy(), timestamps)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary raw EEG recordings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cv = sub.add_parser("convert", help="Convert a raw CSV into a recording")
+    cv.add_argument("csv")
+    cv.add_argument("out")
+    cv.add_argument("--fs", type=float, default=256.0)
+    info = sub.add_parser("info", help="Describe a recording")
+    info.add_argument("path")
+    ex = sub.add_parser("export", help="Write a time range of a recording as CSV")
+    ex.add_argument("path")
+    ex.add_argument("out")
+    ex.add_argument("--start", type=float, default=None, help="Seconds from the first sample")
+    ex.add_argument("--end", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        n = convert_csv(args.csv, args.out, args.fs)
+        csv_size = os.path.getsize(args.csv)
+        store_size = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out))
+        print(f"[RecordingStore] ✅ {n} samples → {args.out} ({csv_size / 1024:.0f} KiB CSV → {store_size / 1024:.0f} KiB)")
+    elif args.command == "info":
+        rec = open_recording(args.path)
+        print(f"[RecordingStore] {args.path}: {len(rec)} samples × {len(rec.channels)} channels "
+              f"({', '.join(rec.channels)}) at {rec.fs:g} Hz, {rec.duration:.1f}s in {len(rec.chunks())} chunks")
+    else:
+        open_recording(args.path).to_dataframe(args.start, args.end).to_csv(args.out, index=False)
+        print(f"[RecordingStore] ✅ Exported to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,175 @@
 import os
+import json
+import random
+import hashlib
+import tempfile
 import requests
 import asyncio
-from datetime import datetime, timedelta
-from .cache_manager import update_cache
+from datetime import datetime
+from .cache_manager import update_cache, CACHE_DIR
+from .model_loader import MODEL_PATH
+from .model_registry import file_sha256
 import base64
+from .log import get_logger
+
+log = get_logger('SageMakerSync')
 
 
 # from .env.backend
 LAMBDA_ENDPOINT = os.getenv('LAMBDA_ENDPOINT', 'https://dai6vxt176.execute-api.us-east-1.amazonaws.com/soChopped67')
-CHECK_INTERVAL = 3600
+CHECK_INTERVAL = int(os.getenv('MODEL_CHECK_INTERVAL', '3600'))
+REQUEST_TIMEOUT = (5, 60)          # (connect, read) seconds
+RETRY_BASE = 30                    # first retry after a failed check, doubled per failure
+CHUNK_SIZE = 1 << 20
+STATE_PATH = os.path.join(CACHE_DIR, 'sync_state.json')
 
 
-async def schedule_model_updates():
-    while True:
+class ModelSync:
+    """
+    Polls the model endpoint and installs new bundles without re-downloading unchanged ones.
+
+    Each check sends the last ETag / model hash as conditional headers, streams the
+    payload to a temp file in chunks while hashing it, verifies the advertised
+    checksum, and only installs when the content actually changed. check_once() is
+    blocking and is run in a worker thread by run(), so the event loop never stalls;
+    that includes the first one, which loads the sync state (and may hash the bundle).
+
+    The state keeps two hashes: "sha256" of the payload as the endpoint serves it (what
+    its checksum header describes) and "installed_sha256" of the file install() left at
+    `model_path`, which can differ because installing may rewrite the bundle (see
+    cache_manager.install_bundle). A payload matching either is already installed.
+    """
+
+    def __init__(self, endpoint=LAMBDA_ENDPOINT, state_path=STATE_PATH, install=update_cache,
+                 interval=CHECK_INTERVAL, timeout=REQUEST_TIMEOUT, model_path=MODEL_PATH):
+        self.endpoint = endpoint
+        self.state_path = state_path
+        self.install = install
+        self.interval = interval
+        self.timeout = timeout
+        self.model_path = model_path
+        self.session = requests.Session()
+        self.state = None  # loaded by the first check_once()
+
+    def _load_state(self):
         try:
-            print('[SageMakerSync] Checking for new model at', datetime.utcnow())
-            response = requests.get(LAMBDA_ENDPOINT)
-            if response.status_code == 200:
-                data = response.json()
-                if 'body' in data :
-                    model_data = base64.b64decode(data['body'])
-                    temp_path = '/tmp/latest_model.joblib'
-                    with open(temp_path, 'wb') as f:
-                        f.write(model_data)
-                    print('[SageMakerSync] Model downloaded and cached.')
-                    update_cache(temp_path)
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        # No sync history yet: describe the bundle already on disk so it is not re-fetched
+        if os.path.exists(self.model_path):
+            state['installed_sha256'] = file_sha256(self.model_path)
+        return state
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _conditional_headers(self):
+        headers = {}
+        if self.state.get('etag'):
+            headers['If-None-Match'] = self.state['etag']
+        if self.state.get('sha256') or self.state.get('installed_sha256'):
+            headers['X-Model-Sha256'] = self.state.get('sha256') or self.state['installed_sha256']
+        if self.state.get('version'):
+            headers['X-Model-Version'] = str(self.state['version'])
+        return headers
+
+    def check_once(self):
+        """Run one update check. Returns 'updated', 'unchanged' or 'empty'; raises on failure."""
+        if self.state is None:
+            self.state = self._load_state()
+        with self.session.get(self.endpoint, headers=self._conditional_headers(),
+                              stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return 'unchanged'
+            if response.status_code != 200:
+                raise RuntimeError(f'Lambda response: {response.status_code}')
+
+            etag = response.headers.get('ETag')
+            expected = response.headers.get('X-Model-Sha256')
+            version = response.headers.get('X-Model-Version')
+            if etag and etag == self.state.get('etag'):
+                return 'unchanged'
+
+            fd, temp_path = tempfile.mkstemp(prefix='latest_model-', suffix='.joblib')
+            try:
+                digest = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as f:
+                    if 'json' in response.headers.get('Content-Type', ''):
+                        # Legacy Lambda envelope: {"body": <base64 model>, "sha256"?, "version"?}
+                        data = response.json()
+                        if 'body' not in data:
+                            return 'empty'
+                        expected = expected or data.get('sha256')
+                        version = version or data.get('version')
+                        if self._is_current(expected, version):
+                            return 'unchanged'
+                        body = data['body']
+                        if any(c in body for c in '\r\n '):
+                            body = ''.join(body.split())
+                        step = 4 * (CHUNK_SIZE // 3)
+                        for i in range(0, len(body), step):
+                            chunk = base64.b64decode(body[i:i + step])
+                            digest.update(chunk)
+                            f.write(chunk)
+                    else:
+                        if self._is_current(expected, version):
+                            return 'unchanged'
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            digest.update(chunk)
+                            f.write(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                sha256 = digest.hexdigest()
+                if expected and expected.lower() != sha256:
+                    raise ValueError(f'checksum mismatch (expected {expected}, got {sha256})')
+                if self._is_current(sha256, None):
+                    self.state.update(etag=etag, sha256=sha256, version=version)
+                    self._save_state()
+                    return 'unchanged'
+
+                if not self.install(temp_path):
+                    raise RuntimeError('cache update failed')
+                self.state = {'etag': etag, 'sha256': sha256, 'version': version,
+                              'installed_sha256': file_sha256(self.model_path),
+                              'updated_at': datetime.utcnow().isoformat()}
+                self._save_state()
+                return 'updated'
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _is_current(self, sha256, version):
+        if sha256 and sha256.lower() in (self.state.get('sha256'), self.state.get('installed_sha256')):
+            return True
+        return bool(version) and str(version) == str(self.state.get('version'))
+
+    async def run(self):
+        failures = 0
+        while True:
+            log.info(f'Checking for new model at {datetime.utcnow()}')
+            try:
+                result = await asyncio.to_thread(self.check_once)
+                failures = 0
+                if result == 'updated':
+                    log.info(f"Model downloaded and cached ({self.state['sha256'][:12]}).")
+                elif result == 'unchanged':
+                    log.info('Model unchanged, skipping download.')
                 else:
-                    print('[SageMakerSync] No model data found in response.')
-            else:
-                print('[SageMakerSync] Lambda response:', response.status_code)
-        except Exception as e:
-            print('[SageMakerSync] Error during update check:', e)
-        await asyncio.sleep(CHECK_INTERVAL)
\ No newline at end of file
+                    log.warning('No model data found in response.')
+                delay = self.interval
+            except Exception as e:
+                failures += 1
+                delay = min(self.interval, RETRY_BASE * 2 ** (failures - 1)) * random.uniform(0.8, 1.2)
+                log.error(f'Error during update check: {e} (retry in {delay:.0f}s)')
+            await asyncio.sleep(delay)
+
+
+async def schedule_model_updates():
+    await ModelSync().run()
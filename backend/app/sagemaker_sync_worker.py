@@ -1,6 +1,7 @@
 import asyncio
 from app.sagemaker_sync import schedule_model_updates
+from app.log import get_logger
 
 if __name__ == "__main__":
-    print("[SageMakerSyncWorker] Starting model update scheduler...")
+    get_logger("SageMakerSyncWorker").info("Starting model update scheduler...")
     asyncio.run(schedule_model_updates())
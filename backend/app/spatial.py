@@ -0,0 +1,155 @@
+"""
+Fit-once spatial filtering (ICA artifact removal + PCA projection) applied as plain matrices.
+
+benson/preprocess.py fits MNE's ICA and sklearn's PCA on the training band series and
+stores their fitted parameters in the model bundle under "spatial" (see spatial_params).
+Serving never refits and never imports MNE: the average reference, ICA reconstruction
+without the excluded components and the PCA projection are all affine, so they collapse
+into one (channels + components) × channels matrix and an offset applied per chunk.
+
+The stage runs on preprocessed rows, after temporal filtering and aggregation. Both of
+those act on each channel the same linear way, so the order matches the training
+pipeline's filter → reference → ICA → PCA up to blink cleanup.
+"""
+import numpy as np
+
+SPATIAL_VERSION = 1
+DEFAULT_CHANNELS = ["alpha", "beta", "theta", "gamma"]
+
+
+def spatial_params(ica, pca, channels=DEFAULT_CHANNELS, reference="average"):
+    """
+    Bundle entry for a fitted mne.preprocessing.ICA and sklearn PCA, as plain arrays and
+    lists so the bundle unpickles without MNE (or this module) installed.
+    """
+    return {
+        "version": SPATIAL_VERSION,
+        "channels": list(channels),
+        "reference": reference,
+        "ica_pre_whitener": np.asarray(ica.pre_whitener_, dtype=np.float64).ravel(),
+        "ica_pca_mean": np.asarray(ica.pca_mean_ if ica.pca_mean_ is not None else np.zeros(len(channels)),
+                                   dtype=np.float64),
+        "ica_pca_components": np.asarray(ica.pca_components_, dtype=np.float64),
+        "ica_unmixing": np.asarray(ica.unmixing_matrix_, dtype=np.float64),
+        "ica_mixing": np.asarray(ica.mixing_matrix_, dtype=np.float64),
+        "ica_exclude": [int(i) for i in ica.exclude],
+        "pca_components": np.asarray(pca.components_, dtype=np.float64),
+        "pca_mean": np.asarray(pca.mean_, dtype=np.float64),
+    }
+
+
+class SpatialFilter:
+    """
+    x (n, channels) → [cleaned channels | PCA components] with one matmul.
+
+    `weights` is (channels + k, channels) and `offset` (channels + k,); the first
+    `channels` outputs replace the band values, the rest become pca_0..pca_{k-1}.
+    """
+
+    def __init__(self, channels, weights, offset):
+        self.channels = list(channels)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.n_components = self.weights.shape[0] - len(self.channels)
+        self.component_names = [f"pca_{i}" for i in range(self.n_components)]
+
+    @classmethod
+    def from_params(cls, params):
+        """Compose the persisted ICA/PCA parameters into one affine map."""
+        if params.get("version") != SPATIAL_VERSION:
+            raise ValueError(f"Unsupported spatial filter version: {params.get('version')}")
+        channels = list(params["channels"])
+        n_ch = len(channels)
+
+        # Average reference: subtract the mean over channels
+        ref = np.eye(n_ch) - (np.full((n_ch, n_ch), 1.0 / n_ch) if params["reference"] == "average" else 0.0)
+
+        # ICA reconstruction without the excluded sources (mne ICA.apply): whiten, remove the
+        # PCA mean, unmix, zero the excluded sources, remix, restore mean and scale
+        w = np.asarray(params["ica_pre_whitener"], dtype=np.float64)
+        m = np.asarray(params["ica_pca_mean"], dtype=np.float64)
+        pca_ica = np.asarray(params["ica_pca_components"], dtype=np.float64)
+        n_pca = pca_ica.shape[0]
+        n_comp = np.asarray(params["ica_unmixing"]).shape[0]
+        unmixing = np.eye(n_pca)
+        unmixing[:n_comp, :n_comp] = params["ica_unmixing"]
+        unmixing = unmixing @ pca_ica
+        mixing = np.eye(n_pca)
+        mixing[:n_comp, :n_comp] = params["ica_mixing"]
+        mixing = pca_ica.T @ mixing
+        keep = np.setdiff1d(np.arange(n_pca), params["ica_exclude"])
+        proj = mixing[:, keep] @ unmixing[keep, :]
+
+        clean = (w[:, None] * proj / w[None, :]) @ ref
+        clean_offset = w * (m - proj @ m)
+
+        # PCA projection of the cleaned channels
+        comps = np.asarray(params["pca_components"], dtype=np.float64)
+        pca_offset = comps @ (clean_offset - np.asarray(params["pca_mean"], dtype=np.float64))
+        return cls(channels, np.vstack([clean, comps @ clean]), np.concatenate([clean_offset, pca_offset]))
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """The bundle's spatial filter, or None for bundles trained without one."""
+        params = bundle.get("spatial") if isinstance(bundle, dict) else None
+        return cls.from_params(params) if params else None
+
+    def apply(self, X):
+        """(n, channels) → (n, channels + k): cleaned channels then PCA components."""
+        return np.asarray(X, dtype=np.float64) @ self.weights.T + self.offset
+
+    def transform(self, df):
+        """Preprocessed DataFrame with cleaned channel columns and pca_* columns appended."""
+        out = df.copy()
+        values = self.apply(out[self.channels].to_numpy(dtype=np.float64))
+        out[self.channels] = values[:, :len(self.channels)]
+        for i, name in enumerate(self.component_names):
+            out[name] = values[:, len(self.channels) + i]
+        return out
+
+
+class SpatialModel:
+    """
+    Serves a model trained on SpatialFilter.transform() rows from the backend's raw
+    feature vectors, laid out in `features` like the model input (FrameFeatures,
+    classify_windows reindex to the bundle's list). Every column is passed through as
+    is; the filter reads its channels by name and overwrites the cleaned channels and
+    the pca_* columns, which the raw vector holds as 0.0.
+    """
+
+    def __init__(self, model, spatial, features):
+        self.model = model
+        self.spatial = spatial
+        self.features = list(features)
+        self.classes_ = getattr(model, "classes_", None)
+        missing = [c for c in spatial.channels if c not in self.features]
+        if missing:
+            raise ValueError(f"spatial filter channels {missing} are not model features")
+        self._channels = np.array([self.features.index(c) for c in spatial.channels], dtype=np.intp)
+        names = spatial.channels + spatial.component_names
+        self._slots = np.array([self.features.index(n) for n in names if n in self.features], dtype=np.intp)
+        self._outputs = np.array([i for i, n in enumerate(names) if n in self.features], dtype=np.intp)
+        if hasattr(model, "predict_proba"):
+            self.predict_proba = self._predict_proba
+
+    def _inputs(self, X):
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        X[:, self._slots] = self.spatial.apply(X[:, self._channels])[:, self._outputs]
+        return X
+
+    def _predict_proba(self, X):
+        return self.model.predict_proba(self._inputs(X))
+
+    def predict(self, X):
+        return self.model.predict(self._inputs(X))
+
+
+def with_spatial(model, bundle, features=None):
+    """Wrap `model` in SpatialModel when the bundle carries a spatial filter."""
+    spatial = SpatialFilter.from_bundle(bundle)
+    if spatial is None:
+        return model
+    features = features if features is not None else bundle.get("features")
+    if features is None:
+        raise ValueError("bundle with a spatial filter needs a 'features' list")
+    return SpatialModel(model, spatial, features)
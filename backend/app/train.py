@@ -0,0 +1,379 @@
+"""
+Offline training: labeled window datasets → a versioned model bundle, entirely local.
+
+    python -m app.train eeg_training_data.musewin
+    python -m app.train eeg_training_data.musewin old_session.csv --frame 8 --search random --iter 40
+    python -m app.train eeg_training_data.musewin --label left --label right --out /tmp/bigboy.joblib
+
+A training sample is the unit the live paths classify: `--frame` consecutive band frames
+of one attempt, run through preprocess_windows() (the vectorized preprocess() the
+/frames and /ws endpoints use). --frame 1 (the default) is one band frame, what /frame,
+/frames and muse_bridge send; --frame N matches /ws?window=N and simulate --frame N.
+The unit is stored in the bundle as "frame" and "hop", and /ws and the simulator
+default to it. `--filter stream` runs each attempt's bands through one StreamingFilter
+(causal, state carried across frames) instead of filtering every window on its own; such
+bundles are tagged "filter": "stream" and need a stateful path (/ws, muse_bridge).
+`--spatial` fits the ICA/PCA spatial filter once on the training band series (needs MNE),
+trains on SpatialFilter.transform() rows and stores the parameters as "spatial"; serving
+applies them as a matmul. Attempts are featurized in parallel, then a cross-validated
+hyperparameter search fits its candidates on all cores. Folds are grouped by attempt,
+so frames of one attempt never sit on both sides of a split.
+
+Featurized attempts are cached as .npz files keyed by a hash of the attempt's windows
+and the sample unit (--frame, --hop, --filter), under a directory named after the
+preprocessing code (app/preprocess.py and featurize_attempt()) and CACHE_VERSION. A
+retrain only featurizes new or changed attempts. Editing that code moves to a fresh
+directory, and the stale ones are removed; only directories carrying the cache's
+manifest file are ever deleted, so other data under --cache is left alone.
+
+The bundle is the {"model", "features", "version"} dict the registry, the bridge and the
+simulator load, plus "metrics", "params" and "data". It is written uncompressed and
+atomically (bundle_store.save_bundle), so it can be dropped into the serving path as is;
+installing it with cache_manager.install_bundle() also compiles the model once for all workers.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from . import preprocess as preprocess_module
+from .bundle_store import save_bundle
+from .dsp import LEGACY_BAND_POWER
+from .preprocess import BAND_FEATURES, CHANNEL_FEATURES, StreamingFilter, preprocess_windows
+from .spatial import SpatialFilter
+from .window_store import WindowStore
+
+DEFAULT_OUT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "bigboy.joblib"))
+DEFAULT_CACHE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "features"))
+CACHE_VERSION = 2  # bump when the cache entry layout changes
+CACHE_MANIFEST = "feature-cache.json"  # marks a directory as a FeatureCache entry set
+KEY_COLUMNS = ["attempt_id", "label"]
+SCORING = ["accuracy", "balanced_accuracy", "f1_macro"]
+
+
+def search_space(seed=0):
+    """
+    Candidate estimators and their grids. All of them are servable by compile_model():
+    scaled logistic regression and tree ensembles behind the same StandardScaler step.
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    return [
+        {"clf": [LogisticRegression(max_iter=5000)],
+         "clf__C": [0.01, 0.1, 1.0, 10.0, 100.0]},
+        {"clf": [RandomForestClassifier(random_state=seed)],
+         "clf__n_estimators": [100, 300],
+         "clf__max_depth": [None, 4, 8],
+         "clf__min_samples_leaf": [1, 2, 4]},
+        {"clf": [ExtraTreesClassifier(random_state=seed)],
+         "clf__n_estimators": [100, 300],
+         "clf__max_depth": [None, 4, 8],
+         "clf__min_samples_leaf": [1, 2, 4]},
+    ]
+
+
+# --- DATA ---
+def load_windows(path, labels=None):
+    """Windows of a .musewin dataset or a collection CSV (attempt_id, label, window_idx, bands...)."""
+    if os.path.isdir(path):
+        return WindowStore(path).to_dataframe(labels=labels)
+    df = pd.read_csv(path)
+    missing = [c for c in KEY_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path} has no {missing} column(s); "
+                         f"import it with `python -m app.window_store import {path} <dataset> --label <label>`")
+    df["label"] = df["label"].astype(str)
+    return df[df["label"].isin(labels)] if labels else df
+
+
+def source_band_power(path):
+    """Band-power method a source was collected with; CSVs predate the record (the old helper)."""
+    return WindowStore(path).band_power if os.path.isdir(path) else LEGACY_BAND_POWER
+
+
+def split_attempts(df):
+    """Per-attempt window tables, windows in recording order."""
+    if "window_idx" in df.columns:
+        df = df.sort_values(KEY_COLUMNS + ["window_idx"], kind="stable")
+    for _, attempt in df.groupby(KEY_COLUMNS, sort=False):
+        yield attempt.reset_index(drop=True)
+
+
+def featurize_attempt(attempt, frame=1, hop=None, filter="window"):
+    """
+    Feature rows for one attempt: one per window of `frame` consecutive band frames,
+    `hop` frames apart (default: non-overlapping). Short attempts yield no rows. With
+    filter="stream" the bands are filtered causally over the whole attempt first, as a
+    live session's StreamingFilter does, and the windows are not filtered again.
+    """
+    missing = [c for c in BAND_FEATURES if c not in attempt.columns]
+    if missing:
+        raise ValueError(f"windows are missing band columns {missing}")
+    channels = [c for c in CHANNEL_FEATURES if c in attempt.columns]
+    values = attempt[BAND_FEATURES + channels].to_numpy(dtype=np.float64, copy=True)
+    if filter == "stream":
+        values[:, :len(BAND_FEATURES)] = StreamingFilter().process(values[:, :len(BAND_FEATURES)])
+    if len(values) < frame:
+        return pd.DataFrame(columns=BAND_FEATURES + channels, dtype=np.float64)
+    windows = np.lib.stride_tricks.sliding_window_view(values, frame, axis=0)[::hop or frame]
+    return preprocess_windows(windows.transpose(0, 2, 1), channel_columns=channels, filtered=filter == "stream")
+
+
+# --- FEATURE CACHE ---
+def _digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """
+    Featurized attempts as <root>/<config key>/<attempt key>.npz. The config key hashes the
+    preprocessing source, featurize_attempt() and CACHE_VERSION; the attempt key hashes the
+    attempt's window values (not its id, so renumbered or re-imported attempts still hit)
+    and the sample unit. Each config directory holds a CACHE_MANIFEST with its config;
+    sibling directories with a manifest for another config are removed, nothing else is.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE):
+        with open(preprocess_module.__file__, "rb") as f:
+            source = f.read()
+        self.config = {
+            "version": CACHE_VERSION,
+            "preprocess": _digest(source),
+            "featurize": _digest(inspect.getsource(featurize_attempt).encode()),
+        }
+        self.key = _digest(json.dumps(self.config, sort_keys=True).encode())
+        self.path = os.path.join(root, self.key)
+        self.removed = 0
+        os.makedirs(self.path, exist_ok=True)
+        manifest = os.path.join(self.path, CACHE_MANIFEST)
+        if not os.path.exists(manifest):
+            with open(manifest, "w") as f:
+                json.dump(self.config, f, sort_keys=True)
+        for name in os.listdir(root):  # entries for other preprocessing code are never read again
+            stale = os.path.join(root, name)
+            if name != self.key and os.path.isfile(os.path.join(stale, CACHE_MANIFEST)):
+                shutil.rmtree(stale, ignore_errors=True)
+                self.removed += 1
+
+    @staticmethod
+    def attempt_key(attempt, frame=1, hop=None, filter="window"):
+        inputs = [c for c in attempt.columns if c not in KEY_COLUMNS]
+        values = np.ascontiguousarray(attempt[inputs].to_numpy(dtype=np.float64))
+        unit = f"frame={frame},hop={hop or frame},filter={filter}"
+        return _digest(",".join(inputs).encode(), values.tobytes(), unit.encode())
+
+    def get(self, key):
+        """Cached feature rows (without attempt_id/label), or None."""
+        try:
+            with np.load(os.path.join(self.path, key + ".npz")) as entry:
+                return pd.DataFrame(entry["values"], columns=entry["columns"].tolist())
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, key, rows):
+        """Store featurize_attempt() rows; written to a temp file and renamed into place."""
+        features = [c for c in rows.columns if c not in KEY_COLUMNS]
+        path = os.path.join(self.path, key + ".npz")
+        tmp_path = os.path.join(self.path, f".incoming-{os.getpid()}-{key}.npz")
+        np.savez(tmp_path, values=rows[features].to_numpy(dtype=np.float64),
+                 columns=np.asarray(features, dtype=str))
+        os.replace(tmp_path, path)
+
+
+def build_features(sources, labels=None, frame=1, hop=None, jobs=-1, cache=None, filter="window"):
+    """
+    (X, y, groups, info) over every attempt of every source; groups number attempts across
+    sources, whose attempt ids may collide. With a FeatureCache only attempts missing from
+    it are featurized (in parallel), so the cost follows the new data. Sources collected
+    with different band-power methods are refused; info["band_power"] names the one used.
+    """
+    attempts, info = [], {"sources": [], "n_windows": 0}
+    for path in sources:
+        df = load_windows(path, labels)
+        info["sources"].append({"path": os.path.abspath(path), "n_windows": len(df),
+                                "band_power": source_band_power(path)})
+        info["n_windows"] += len(df)
+        attempts.extend(split_attempts(df))
+    if not attempts:
+        raise ValueError("no labeled windows to train on")
+    methods = sorted({s["band_power"] for s in info["sources"]})
+    if len(methods) > 1:
+        raise ValueError(f"sources mix band-power methods {methods}; regenerate them with one method")
+    info["band_power"] = methods[0]
+
+    keys = [cache.attempt_key(a, frame, hop, filter) for a in attempts] if cache is not None else [None] * len(attempts)
+    rows = [cache.get(k) for k in keys] if cache is not None else [None] * len(attempts)
+    todo = [i for i, r in enumerate(rows) if r is None]
+    computed = Parallel(n_jobs=jobs)(delayed(featurize_attempt)(attempts[i], frame, hop, filter) for i in todo)
+    for i, r in zip(todo, computed):
+        if cache is not None:
+            cache.put(keys[i], r)
+        rows[i] = r
+
+    # Sources without per-channel bands serve them as absent, i.e. 0.0 (reindex fill_value=0)
+    columns = list(dict.fromkeys(c for r in rows for c in r.columns))
+    X = pd.concat([r.reindex(columns=columns, fill_value=0.0) for r in rows], ignore_index=True)
+    X = X.astype(np.float64)
+    y = np.concatenate([np.full(len(r), str(a["label"].iloc[0]), dtype=object) for r, a in zip(rows, attempts)])
+    groups = np.concatenate([np.full(len(r), i) for i, r in enumerate(rows)])
+    valid = X.notna().all(axis=1).to_numpy()
+    info.update(n_samples=int(valid.sum()), n_dropped=int((~valid).sum()), n_attempts=len(attempts),
+                n_featurized=len(todo))
+    return X[valid].reset_index(drop=True), y[valid].astype(str), groups[valid], info
+
+
+def fit_spatial(sources, labels=None, fs=256):
+    """
+    bundle["spatial"] parameters: ICA/PCA fitted once (benson.preprocess.fit_spatial_filter)
+    on the band series of every attempt of every source, in recording order.
+    """
+    from benson.preprocess import fit_spatial_filter  # MNE is a training-only dependency
+
+    series = pd.concat([a[BAND_FEATURES] for path in sources for a in split_attempts(load_windows(path, labels))],
+                       ignore_index=True)
+    params, _ = fit_spatial_filter(series, sfreq=fs)
+    return params
+
+
+# --- SEARCH ---
+def train(X, y, groups, folds=5, search="grid", n_iter=30, jobs=-1, seed=0):
+    """Cross-validated search over search_space(); returns (fitted search, cv splitter)."""
+    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, StratifiedGroupKFold
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    per_label = pd.Series(groups).groupby(y).nunique()
+    n_splits = int(min(folds, per_label.min()))
+    if n_splits < 2:
+        raise ValueError(f"need at least 2 attempts per label for cross-validation, got {per_label.to_dict()}")
+    cv = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+
+    pipeline = Pipeline([("scale", StandardScaler()), ("clf", "passthrough")])
+    common = dict(scoring=SCORING, refit="accuracy", cv=cv, n_jobs=jobs, error_score=np.nan)
+    if search == "random":
+        searcher = RandomizedSearchCV(pipeline, search_space(seed), n_iter=n_iter, random_state=seed, **common)
+    else:
+        searcher = GridSearchCV(pipeline, search_space(seed), **common)
+    searcher.fit(X, y, groups=groups)
+    return searcher, cv
+
+
+def cv_metrics(searcher, X, y, groups, cv, jobs=-1):
+    """Best candidate's fold scores plus a pooled out-of-fold confusion matrix."""
+    from sklearn.base import clone
+    from sklearn.metrics import confusion_matrix
+    from sklearn.model_selection import cross_val_predict
+
+    i = searcher.best_index_
+    results = searcher.cv_results_
+    metrics = {name: {"mean": float(results[f"mean_test_{name}"][i]), "std": float(results[f"std_test_{name}"][i])}
+               for name in SCORING}
+    predicted = cross_val_predict(clone(searcher.best_estimator_), X, y, groups=groups, cv=cv, n_jobs=jobs)
+    classes = list(searcher.classes_)
+    metrics.update(
+        folds=cv.get_n_splits(),
+        candidates=len(results["params"]),
+        classes=classes,
+        confusion=confusion_matrix(y, predicted, labels=classes).tolist(),
+        support={c: int((y == c).sum()) for c in classes},
+    )
+    return metrics
+
+
+def data_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(",".join(X.columns).encode())
+    digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+    digest.update("\0".join(y).encode())
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a model bundle from labeled window datasets.")
+    parser.add_argument("data", nargs="+", help=".musewin datasets and/or collection CSVs")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Bundle path (default: backend/data/cache/bigboy.joblib)")
+    parser.add_argument("--label", action="append", default=None, help="Train on these labels only (repeatable)")
+    parser.add_argument("--frame", type=int, default=1,
+                        help="Band frames per training sample; must match the serving window (1: /frame, muse_bridge)")
+    parser.add_argument("--hop", type=int, default=None, help="Frames between sample starts (default: --frame)")
+    parser.add_argument("--filter", choices=["window", "stream"], default="window",
+                        help="window: filter each sample on its own (/frame, /frames); "
+                             "stream: causal filter carried across frames (/ws, muse_bridge)")
+    parser.add_argument("--spatial", action="store_true",
+                        help="Fit the ICA/PCA spatial filter on the training bands and train on its output (needs mne)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--iter", type=int, default=30, help="Candidates sampled by --search random")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel workers (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Feature cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Featurize every attempt, bypassing the cache")
+    args = parser.parse_args()
+    if args.frame < 1 or (args.hop is not None and args.hop < 1):
+        parser.error("--frame and --hop must be at least 1")
+    args.hop = args.hop or args.frame
+
+    start = time.perf_counter()
+    cache = None if args.no_cache else FeatureCache(args.cache)
+    if cache is not None and cache.removed:
+        print(f"[Train] ♻️ Preprocessing changed; dropped {cache.removed} stale feature cache(s)")
+    X, y, groups, info = build_features(args.data, args.label, args.frame, args.hop, args.jobs, cache, args.filter)
+    t_features = time.perf_counter()
+    print(f"[Train] ✅ {info['n_samples']} samples × {X.shape[1]} features from {info['n_attempts']} attempts "
+          f"({info['n_windows']} windows) in {t_features - start:.1f}s; "
+          f"featurized {info['n_featurized']}, {info['n_attempts'] - info['n_featurized']} from cache")
+    if info["n_dropped"]:
+        print(f"[Train] ⚠️ {info['n_dropped']} sample(s) had NaN features (blink-masked) and were dropped")
+
+    spatial = None
+    if args.spatial:
+        try:
+            spatial = fit_spatial(args.data, args.label)
+        except ImportError as e:
+            parser.error(f"--spatial needs MNE ({e})")
+        X = SpatialFilter.from_params(spatial).transform(X)
+        t_features = time.perf_counter()
+        print(f"[Train] ✅ Fitted spatial filter: {X.shape[1]} features with the pca_* components")
+
+    searcher, cv = train(X, y, groups, args.folds, args.search, args.iter, args.jobs, args.seed)
+    metrics = cv_metrics(searcher, X, y, groups, cv, args.jobs)
+    t_search = time.perf_counter()
+    print(f"[Train] ✅ Searched {metrics['candidates']} candidates × {metrics['folds']} folds "
+          f"in {t_search - t_features:.1f}s")
+    for name in SCORING:
+        print(f"   {name:<18}: {metrics[name]['mean']:.3f} ± {metrics[name]['std']:.3f}")
+
+    best = searcher.best_estimator_
+    params = {k: (type(v).__name__ if k == "clf" else v) for k, v in searcher.best_params_.items()}
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{data_hash(X, y)[:8]}"
+    save_bundle({
+        "model": best,
+        "features": list(X.columns),
+        "version": version,
+        "frame": args.frame,
+        "hop": args.hop,
+        "filter": args.filter,
+        "band_power": info["band_power"],
+        "spatial": spatial,
+        "metrics": metrics,
+        "params": params,
+        "data": dict(info, labels=sorted(set(y))),
+        "trained_at": time.time(),
+    }, args.out)
+    print(f"[Train] 🧠 Best: {params}")
+    print(f"[Train] ✅ Wrote bundle {version} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
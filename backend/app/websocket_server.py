@@ -0,0 +1,173 @@
+import time
+from collections import deque
+from functools import partial
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .preprocess import BAND_FEATURES, CHANNEL_FEATURES, StreamingFilter
+from .executor import ExecutorBusy, classify_windows
+from .frame_codec import ROW_COLUMNS, decode_records, dumps_json, loads_json, pad_channels, stack_records
+from .metrics import ERRORS, FRAMES, REQUEST_SECONDS, WS_SESSIONS, StageTimer
+from .log import get_logger
+
+log = get_logger("WebSocket")
+_open_sessions = 0
+
+MAX_WINDOW_FRAMES = 1024
+
+
+class StreamSession:
+    """
+    Per-connection state for one streaming headset.
+
+    The served model, the rolling frame window and this headset's StreamingFilter live
+    here for the lifetime of the socket, so nothing is rebuilt per frame. Every frame
+    runs through the filter on arrival, so its state follows this connection only;
+    bundles trained with `--filter stream` are classified on the filtered history.
+    Frames are kept with every ROW_COLUMNS column (absent channels 0), and windows are
+    cut down to the per-channel bands the served model was trained on.
+    With window == 1 every frame is classified exactly like POST /frame; larger windows
+    classify the last N frames.
+    """
+
+    def __init__(self, active, window=1):
+        self.window_size = max(1, min(int(window), MAX_WINDOW_FRAMES))
+        self.window = deque(maxlen=self.window_size)
+        self.filtered = deque(maxlen=self.window_size)
+        self.stream_filter = StreamingFilter()
+        self.seq = 0
+        self.frames_in = 0
+        self.opened_at = time.time()
+        self.use(active)
+
+    def use(self, active):
+        """Serve `active` (a registry ActiveModel) from the next frame on; window and filter state carry over."""
+        self.active = active
+        self.model = active.model
+        self.features = active.features
+        self.stream = active.filter == "stream"
+        self.channels = [c for c in CHANNEL_FEATURES if c in (active.features or ())]
+        self.columns = list(range(len(BAND_FEATURES))) + [ROW_COLUMNS.index(c) for c in self.channels]
+
+    async def push(self, frames, run=None):
+        """
+        Append frames to the window and classify every window they complete.
+        `run(job, arg, active)` is the executor hook (ClassifyExecutor.submit); without one the job runs inline.
+        """
+        rows = np.array([[f.get(c, np.nan) for c in BAND_FEATURES] + [f.get(c, 0.0) for c in CHANNEL_FEATURES]
+                         for f in frames], dtype=float)
+        return await self.push_rows(rows, run)
+
+    async def push_rows(self, rows, run=None):
+        """push() for frames already stacked as (n_frames, 4) or (n_frames, 20) in ROW_COLUMNS order."""
+        rows = pad_channels(np.atleast_2d(np.asarray(rows, dtype=float)))
+        filtered = rows.copy()
+        filtered[:, :len(BAND_FEATURES)] = self.stream_filter.process(rows[:, :len(BAND_FEATURES)])
+        past = self.filtered if self.stream else self.window
+        history = np.vstack([np.asarray(past).reshape(-1, len(ROW_COLUMNS)), filtered if self.stream else rows])
+        self.window.extend(rows)
+        self.filtered.extend(filtered)
+        self.frames_in += len(rows)
+
+        # Windows ending at each new frame; frames arriving before the window fills only buffer
+        n_ready = min(len(rows), len(history) - self.window_size + 1)
+        results = []
+        if n_ready > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(history, self.window_size, axis=0)
+            windows = windows[-n_ready:].transpose(0, 2, 1)[:, :, self.columns]
+            job = partial(classify_windows, features=self.features, filtered=self.stream, channel_columns=self.channels)
+            if run is None:
+                results = job(self.model, windows)
+            else:
+                results = await run(job, windows, self.active)
+
+        replies = []
+        for i in range(len(rows)):
+            self.seq += 1
+            j = i - (len(rows) - n_ready)
+            if j >= 0:
+                replies.append({"seq": self.seq, "result": results[j]["label"], "confidence": results[j]["confidence"]})
+            else:
+                replies.append({"seq": self.seq, "status": "buffering", "buffered": len(history) - len(rows) + i + 1})
+        return replies
+
+
+async def serve_stream(websocket: WebSocket, get_active, window=1, run=None):
+    """
+    Run one streaming session until the client disconnects.
+    Client messages: a frame {"alpha": .., "beta": .., "theta": .., "gamma": .., "t": <client ts>}
+    or a batch {"frames": [...], "t": <client ts>}. "t" is echoed back for round-trip timing.
+    Binary messages carry frame_codec records and are answered like a batch, with "t" set
+    to the timestamp of the last record. `await get_active()` returns the registry's ActiveModel.
+    """
+    await websocket.accept()
+    active = await get_active()
+    if active is None:
+        await websocket.send_json({"error": "Model not available"})
+        await websocket.close(code=1013)
+        return
+
+    global _open_sessions
+    session = StreamSession(active, window)
+    _open_sessions += 1
+    WS_SESSIONS.set(_open_sessions)
+    log.info(f"🔌 Session opened (window={session.window_size})")
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            timer = StageTimer("/ws")
+            active = await get_active()
+            if active is not None:
+                session.use(active)  # follow hot-swapped models
+            try:
+                if message.get("bytes") is not None:
+                    batch = stack_records(decode_records(message["bytes"]))
+                    data = {"frames": None}
+                    if batch.timestamps:
+                        data["t"] = batch.timestamps[-1]
+                    timer.mark("parse")
+                    replies = await session.push_rows(batch.bands, run)
+                else:
+                    data = loads_json(message.get("text") or "")
+                    frames = data.get("frames", [data]) if isinstance(data, dict) else None
+                    if not isinstance(frames, list) or not all(isinstance(f, dict) for f in frames):
+                        raise ValueError("expected a JSON frame object or {\"frames\": [...]}")
+                    timer.mark("parse")
+                    replies = await session.push(frames, run)
+            except (TypeError, ValueError) as e:  # includes FrameFormatError and JSON errors
+                ERRORS.inc("/ws", "invalid")
+                await websocket.send_text(dumps_json({"error": f"Invalid format: {e}"}))
+                continue
+            except ExecutorBusy as e:  # includes a crashed classify worker
+                ERRORS.inc("/ws", "busy")
+                await websocket.send_text(dumps_json({"error": f"Server busy: {e}"}))
+                continue
+            except Exception as e:
+                # Keep the session: one failed batch must not drop the headset's connection
+                log.exception(f"💀 /ws batch failed: {e}")
+                ERRORS.inc("/ws", "internal")
+                await websocket.send_text(dumps_json({"error": "Internal error"}))
+                continue
+            timer.mark("inference")
+            FRAMES.inc("/ws", amount=len(replies))
+
+            server_ms = (time.perf_counter() - timer.start) * 1000.0
+            if "frames" in data:
+                reply = {"results": replies, "server_ms": server_ms}
+            else:
+                reply = dict(replies[0], server_ms=server_ms)
+            if "t" in data:
+                reply["t"] = data["t"]
+            text = dumps_json(reply)
+            timer.mark("serialize")
+            REQUEST_SECONDS.observe(timer.last - timer.start, "/ws")
+            await websocket.send_text(text)
+
+    except WebSocketDisconnect:
+        log.info(f"👋 Session closed after {session.frames_in} frames")
+    finally:
+        _open_sessions -= 1
+        WS_SESSIONS.set(_open_sessions)
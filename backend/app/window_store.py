@@ -0,0 +1,425 @@
+"""
+Append-only store for labeled band-power windows, the training dataset written by the
+collection scripts (collect_data.py, frontend/collectdata.py).
+
+A dataset is a directory of column files plus a small attempt index:
+
+    eeg_training_data.musewin/
+        meta.json         format, band names, label vocabulary, band-power method
+        attempt_id.i64    one value per window
+        window_idx.i32
+        label.i16         code into meta["labels"]
+        bands.f64         (n_windows, n_bands) row-major
+        attempts.i64      (n_attempts, 4): attempt_id, label code, first row, window count
+        tombstones.i64    first row of every deleted attempt
+
+Deleting an attempt appends its first row to tombstones.i64 instead of rewriting the
+data; readers skip tombstoned attempts and `compact()` drops them from disk later. The
+attempt index is tiny next to the windows, so the next attempt id and label/attempt
+selections never scan the columns. Windows of an attempt that was never ended (the
+collector crashed) are indexed on the next open, as the old CSV would have kept them.
+
+    python -m app.window_store import eeg_training_data_temporal.csv eeg_training_data.musewin
+    python -m app.window_store info eeg_training_data.musewin
+    python -m app.window_store compact eeg_training_data.musewin
+    python -m app.window_store export eeg_training_data.musewin out.csv --label left
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from .dsp import LEGACY_BAND_POWER
+
+FORMAT = "muse-windows"
+FORMAT_VERSION = 1
+DEFAULT_BANDS = ["alpha", "beta", "theta", "gamma"]
+CSV_CHUNK_ROWS = 1 << 16
+
+META_FILE = "meta.json"
+ATTEMPTS_FILE = "attempts.i64"
+TOMBSTONES_FILE = "tombstones.i64"
+COLUMNS = {  # per-window column -> (file, dtype)
+    "attempt_id": ("attempt_id.i64", np.dtype("<i8")),
+    "window_idx": ("window_idx.i32", np.dtype("<i4")),
+    "label": ("label.i16", np.dtype("<i2")),
+}
+BANDS_FILE, BANDS_DTYPE = "bands.f64", np.dtype("<f8")
+INDEX_DTYPE = np.dtype("<i8")
+
+
+def _write_json(path, obj):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_index(path, width):
+    if not os.path.exists(path):
+        return np.empty((0, width), INDEX_DTYPE)
+    rows = np.fromfile(path, INDEX_DTYPE)
+    return rows[:len(rows) // width * width].reshape(-1, width)
+
+
+class WindowStore:
+    """
+    Labeled windows grouped into attempts. Writing is one attempt at a time:
+
+        with WindowStore(path) as store:
+            attempt_id = store.begin_attempt("left")
+            store.add_window([alpha, beta, theta, gamma])
+            store.end_attempt()
+            store.delete_attempt(attempt_id)   # tombstone; compact() reclaims the space
+    """
+
+    def __init__(self, path, bands=DEFAULT_BANDS, band_power=None):
+        self.path = path
+        self._files = {}
+        self._open(bands, band_power)
+
+    def _open(self, bands=DEFAULT_BANDS, band_power=None):
+        """`band_power` is the writer's app.dsp method; appending to a dataset of another one is refused."""
+        path = self.path
+        if not os.path.exists(path) and os.path.exists(path + ".compact"):
+            os.replace(path + ".compact", path)  # compaction finished writing but not swapping
+        shutil.rmtree(path + ".compact", ignore_errors=True)
+        shutil.rmtree(path + ".old", ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta.get("format") != FORMAT:
+                raise ValueError(f"{path} is not a {FORMAT} dataset")
+        else:
+            self.meta = {"format": FORMAT, "version": FORMAT_VERSION, "bands": list(bands), "labels": [],
+                         "band_power": band_power or LEGACY_BAND_POWER, "created_at": time.time()}
+            _write_json(meta_path, self.meta)
+            for file_name, _ in self._column_files():
+                open(os.path.join(path, file_name), "ab").close()
+        self.bands = list(self.meta["bands"])
+        self.labels = list(self.meta["labels"])
+        self.band_power = self.meta.get("band_power", LEGACY_BAND_POWER)
+        if band_power is not None and band_power != self.band_power:
+            raise ValueError(f"{path} holds {self.band_power} band powers; cannot append {band_power} ones")
+
+        self._current = None  # [attempt_id, label code, first row, window count] while recording
+        self.n_rows = self._complete_rows()
+        self._truncate_torn_tail()
+        self._attempts = _read_index(os.path.join(path, ATTEMPTS_FILE), 4)
+        self._attempts = self._attempts[self._attempts[:, 2] + self._attempts[:, 3] <= self.n_rows]
+        self._tombstones = set(_read_index(os.path.join(path, TOMBSTONES_FILE), 1)[:, 0].tolist())
+        self._index_unended_rows()
+
+    # --- FILES ---
+    def _column_files(self):
+        return list(COLUMNS.values()) + [(BANDS_FILE, BANDS_DTYPE)]
+
+    def _row_bytes(self, file_name, dtype):
+        return dtype.itemsize * (len(self.bands) if file_name == BANDS_FILE else 1)
+
+    def _complete_rows(self):
+        return min(os.path.getsize(os.path.join(self.path, name)) // self._row_bytes(name, dtype)
+                   for name, dtype in self._column_files())
+
+    def _truncate_torn_tail(self):
+        for name, dtype in self._column_files():
+            file_path = os.path.join(self.path, name)
+            size = self.n_rows * self._row_bytes(name, dtype)
+            if os.path.getsize(file_path) > size:
+                os.truncate(file_path, size)
+
+    def _append_file(self, name):
+        f = self._files.get(name)
+        if f is None:
+            f = self._files[name] = open(os.path.join(self.path, name), "ab")
+        return f
+
+    def _column(self, name):
+        if name == "bands":
+            file_name, dtype, shape = BANDS_FILE, BANDS_DTYPE, (self.n_rows, len(self.bands))
+        else:
+            (file_name, dtype), shape = COLUMNS[name], (self.n_rows,)
+        if not self.n_rows:
+            return np.empty(shape, dtype)
+        self.flush()
+        return np.memmap(os.path.join(self.path, file_name), dtype, mode="r", shape=shape)
+
+    def _index_unended_rows(self):
+        """Attempts whose windows reached disk without end_attempt() are indexed from the columns."""
+        indexed = int((self._attempts[:, 2] + self._attempts[:, 3]).max()) if len(self._attempts) else 0
+        if indexed >= self.n_rows:
+            return
+        ids = np.asarray(self._column("attempt_id")[indexed:])
+        codes = np.asarray(self._column("label")[indexed:])
+        starts = np.flatnonzero(np.r_[True, (ids[1:] != ids[:-1]) | (codes[1:] != codes[:-1])])
+        counts = np.diff(np.r_[starts, len(ids)])
+        entries = np.column_stack([ids[starts], codes[starts], starts + indexed, counts]).astype(INDEX_DTYPE)
+        self._append_file(ATTEMPTS_FILE).write(entries.tobytes())
+        self._attempts = np.concatenate([self._attempts, entries])
+
+    # --- WRITE ---
+    def _label_code(self, label):
+        label = str(label)
+        if label not in self.labels:
+            self.labels.append(label)
+            self.meta["labels"] = self.labels
+            _write_json(os.path.join(self.path, META_FILE), self.meta)
+        return self.labels.index(label)
+
+    @property
+    def max_attempt_id(self):
+        """Highest attempt id among live attempts (0 when empty); deleted ids are reused like the old CSV did."""
+        live = self._live_attempts()
+        ids = live[:, 0].max() if len(live) else 0
+        return max(int(ids), self._current[0] if self._current else 0)
+
+    def begin_attempt(self, label, attempt_id=None):
+        if self._current is not None:
+            raise RuntimeError(f"attempt {self._current[0]} is still open")
+        attempt_id = self.max_attempt_id + 1 if attempt_id is None else int(attempt_id)
+        self._current = [attempt_id, self._label_code(label), self.n_rows, 0]
+        return attempt_id
+
+    def add_window(self, bands, window_idx=None):
+        """One window: values in self.bands order, or a {column: value} dict holding at least self.bands."""
+        if isinstance(bands, dict):
+            bands = [bands[b] for b in self.bands]
+        self.add_windows(np.reshape(bands, (1, -1)), None if window_idx is None else [window_idx])
+
+    def add_windows(self, bands, window_idx=None, columns=None):
+        """
+        Append (n, n_bands) windows to the open attempt; window_idx defaults to counting on.
+        With `columns` naming the input columns, the store's own band columns are picked out
+        (a dataset created with the 4 plain bands ignores extra per-channel columns).
+        """
+        if self._current is None:
+            raise RuntimeError("add_windows() outside begin_attempt()/end_attempt()")
+        if columns is not None:
+            bands = np.asarray(bands)[:, [list(columns).index(b) for b in self.bands]]
+        values = np.ascontiguousarray(bands, dtype=BANDS_DTYPE)
+        if values.ndim != 2 or values.shape[1] != len(self.bands):
+            raise ValueError(f"expected (n, {len(self.bands)}) band values, got {values.shape}")
+        n = len(values)
+        attempt_id, code, _, count = self._current
+        if window_idx is None:
+            window_idx = np.arange(count, count + n)
+        columns = {"attempt_id": np.full(n, attempt_id), "window_idx": window_idx, "label": np.full(n, code)}
+        self._append_file(BANDS_FILE).write(values.tobytes())
+        for name, (file_name, dtype) in COLUMNS.items():
+            self._append_file(file_name).write(np.asarray(columns[name], dtype).tobytes())
+        self._current[3] += n
+        self.n_rows += n
+
+    def end_attempt(self):
+        """Index the open attempt; returns its window count."""
+        entry, self._current = self._current, None
+        if entry is None or entry[3] == 0:
+            return 0
+        self._append_file(ATTEMPTS_FILE).write(np.array(entry, INDEX_DTYPE).tobytes())
+        self._attempts = np.concatenate([self._attempts, np.array([entry], INDEX_DTYPE)])
+        self.flush()
+        return entry[3]
+
+    def delete_attempt(self, attempt_id):
+        """Tombstone every live attempt with this id; returns the number of windows removed."""
+        if self._current is not None and self._current[0] == attempt_id:
+            self.end_attempt()
+        live = self._live_attempts()
+        doomed = live[live[:, 0] == attempt_id]
+        if len(doomed):
+            self._append_file(TOMBSTONES_FILE).write(doomed[:, 2].astype(INDEX_DTYPE).tobytes())
+            self._tombstones.update(doomed[:, 2].tolist())
+            self.flush()
+        return int(doomed[:, 3].sum())
+
+    def flush(self, fsync=False):
+        for f in self._files.values():
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        self.end_attempt()
+        self.flush(fsync=True)
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- READ ---
+    def _live_attempts(self):
+        if not self._tombstones:
+            return self._attempts
+        dead = np.isin(self._attempts[:, 2], np.fromiter(self._tombstones, INDEX_DTYPE))
+        return self._attempts[~dead]
+
+    def attempts(self, labels=None):
+        """Live attempts as a DataFrame of attempt_id, label, n_windows."""
+        import pandas as pd
+        live = self._select(labels, None)
+        return pd.DataFrame({"attempt_id": live[:, 0], "label": np.asarray(self.labels, dtype=object)[live[:, 1]]
+                             if len(live) else np.empty(0, object), "n_windows": live[:, 3]})
+
+    def _select(self, labels, attempts):
+        live = self._live_attempts()
+        if labels is not None:
+            codes = [self.labels.index(str(l)) for l in np.atleast_1d(labels) if str(l) in self.labels]
+            live = live[np.isin(live[:, 1], codes)]
+        if attempts is not None:
+            live = live[np.isin(live[:, 0], np.atleast_1d(attempts))]
+        return live
+
+    def _rows(self, entries):
+        """Row numbers covered by attempt entries, without a Python loop per attempt."""
+        entries = entries[np.argsort(entries[:, 2], kind="stable")]
+        starts, counts = entries[:, 2], entries[:, 3]
+        offsets = np.cumsum(counts) - counts
+        return np.arange(counts.sum()) - np.repeat(offsets - starts, counts)
+
+    def read(self, columns=("attempt_id", "label", "window_idx", "bands"), labels=None, attempts=None):
+        """
+        Column arrays for live windows, optionally only some labels/attempts. `label` is
+        decoded to strings; `bands` is (n, n_bands) float64.
+        """
+        entries = self._select(labels, attempts)
+        rows = self._rows(entries)
+        contiguous = len(rows) == self.n_rows  # everything live: plain sequential reads
+        out = {}
+        for name in columns:
+            column = self._column(name)
+            values = np.array(column) if contiguous else column[rows]
+            if name == "label":
+                values = np.asarray(self.labels, dtype=object)[values] if len(values) else values.astype(object)
+            out[name] = values
+        return out
+
+    def to_dataframe(self, labels=None, attempts=None):
+        """Live windows in the collection CSV layout (attempt_id, label, window_idx, bands...)."""
+        import pandas as pd
+        cols = self.read(labels=labels, attempts=attempts)
+        df = pd.DataFrame(cols["bands"], columns=self.bands)
+        df.insert(0, "window_idx", cols["window_idx"])
+        df.insert(0, "label", cols["label"])
+        df.insert(0, "attempt_id", cols["attempt_id"])
+        return df
+
+    @property
+    def n_windows(self):
+        return int(self._live_attempts()[:, 3].sum())
+
+    # --- MAINTENANCE ---
+    def compact(self):
+        """Rewrite the dataset without tombstoned attempts; returns the windows reclaimed."""
+        if self._current is not None:
+            raise RuntimeError("compact() with an attempt open")
+        if not self._tombstones:
+            return 0
+        reclaimed = self.n_rows - self.n_windows
+        live = self._live_attempts()
+        live = live[np.argsort(live[:, 2], kind="stable")]
+        rows = self._rows(live)
+
+        tmp = self.path + ".compact"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, (file_name, _) in dict(COLUMNS, bands=(BANDS_FILE, BANDS_DTYPE)).items():
+            np.ascontiguousarray(self._column(name)[rows]).tofile(os.path.join(tmp, file_name))
+        index = live.copy()
+        index[:, 2] = np.cumsum(index[:, 3]) - index[:, 3]
+        index.tofile(os.path.join(tmp, ATTEMPTS_FILE))
+        open(os.path.join(tmp, TOMBSTONES_FILE), "wb").close()
+        _write_json(os.path.join(tmp, META_FILE), self.meta)
+
+        # Swap directories; a crash in between is finished by the next open
+        self.close()
+        os.replace(self.path, self.path + ".old")
+        os.replace(tmp, self.path)
+        shutil.rmtree(self.path + ".old", ignore_errors=True)
+        self._open()
+        return reclaimed
+
+
+def import_csv(csv_path, store_path, label=None, chunk_rows=CSV_CHUNK_ROWS, band_power=LEGACY_BAND_POWER):
+    """
+    Append a collection CSV to a dataset. Files without attempt_id/label columns (older
+    recordings) become a single new attempt labeled `label`. CSVs do not record how their
+    band powers were computed; `band_power` says it (the old scripts' helper: "exact").
+    """
+    import pandas as pd
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    if "label" not in header and label is None:
+        raise ValueError(f"{csv_path} has no 'label' column; pass a label")
+    n = 0
+    with WindowStore(store_path, band_power=band_power) as store:
+        missing = [b for b in store.bands if b not in header]
+        if missing:
+            raise ValueError(f"{csv_path} is missing band columns {missing}")
+        fallback_id = store.max_attempt_id + 1
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            ids = chunk["attempt_id"].to_numpy() if "attempt_id" in chunk else np.full(len(chunk), fallback_id)
+            labels = chunk["label"].astype(str).to_numpy() if "label" in chunk else np.full(len(chunk), str(label))
+            widx = chunk["window_idx"].to_numpy() if "window_idx" in chunk else None
+            bands = chunk[store.bands].to_numpy(dtype=np.float64)
+            # One add_windows() per run of rows from the same attempt
+            starts = np.flatnonzero(np.r_[True, (ids[1:] != ids[:-1]) | (labels[1:] != labels[:-1])])
+            for start, end in zip(starts, np.r_[starts[1:], len(chunk)]):
+                current = store._current
+                if current is None or current[0] != ids[start] or store.labels[current[1]] != labels[start]:
+                    store.end_attempt()
+                    store.begin_attempt(labels[start], ids[start])
+                store.add_windows(bands[start:end], None if widx is None else widx[start:end])
+            n += len(chunk)
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Labeled band-power window datasets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    im = sub.add_parser("import", help="Append a collection CSV to a dataset")
+    im.add_argument("csv")
+    im.add_argument("path")
+    im.add_argument("--label", default=None, help="Label for CSVs without a 'label' column")
+    im.add_argument("--band-power", choices=["exact", "fast"], default=LEGACY_BAND_POWER,
+                    help="Band-power method the CSV was collected with (default: exact, the old helper)")
+    info = sub.add_parser("info", help="Describe a dataset")
+    info.add_argument("path")
+    cp = sub.add_parser("compact", help="Drop deleted attempts from disk")
+    cp.add_argument("path")
+    ex = sub.add_parser("export", help="Write live windows as CSV")
+    ex.add_argument("path")
+    ex.add_argument("out")
+    ex.add_argument("--label", action="append", default=None)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        n = import_csv(args.csv, args.path, args.label, band_power=args.band_power)
+        print(f"[WindowStore] ✅ Imported {n} windows from {args.csv} into {args.path}")
+    elif args.command == "info":
+        store = WindowStore(args.path)
+        attempts = store.attempts()
+        print(f"[WindowStore] {args.path}: {store.n_windows} windows in {len(attempts)} attempts "
+              f"({store.n_rows - store.n_windows} deleted, awaiting compaction); max attempt id {store.max_attempt_id}; {store.band_power} band powers")
+        for label, group in attempts.groupby("label"):
+            print(f"   {label:<10}: {len(group)} attempts, {int(group['n_windows'].sum())} windows")
+    elif args.command == "compact":
+        with WindowStore(args.path) as store:
+            reclaimed = store.compact()
+        print(f"[WindowStore] ✅ Compacted {args.path}: {reclaimed} deleted windows removed")
+    else:
+        WindowStore(args.path).to_dataframe(labels=args.label).to_csv(args.out, index=False)
+        print(f"[WindowStore] ✅ Exported to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
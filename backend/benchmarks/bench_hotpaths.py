@@ -0,0 +1,358 @@
+"""
+Benchmarks for the DSP, preprocessing and classification hot paths, driven by the
+recordings in frontend/ (raw_muse_data.csv, eeg_training_data_temporal.csv).
+
+    cd backend
+    python -m benchmarks.bench_hotpaths                  # run and compare with baseline.json
+    python -m benchmarks.bench_hotpaths --save           # record a new baseline
+    python -m benchmarks.bench_hotpaths -k preprocess    # only matching benchmarks
+
+Each benchmark reports ops/sec (best of --repeats timed runs, like timeit) and the peak memory
+traced during one call. Without --save the run exits non-zero when a benchmark loses
+more than --tolerance of its baseline throughput or grows its peak memory by as much. Baselines
+are machine-specific: re-record them with --save on the machine that compares.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(REPO, "backend"))
+sys.path.insert(0, os.path.join(REPO, "frontend"))
+
+RAW_CSV = os.path.join(REPO, "frontend", "raw_muse_data.csv")
+BANDS_CSV = os.path.join(REPO, "frontend", "eeg_training_data_temporal.csv")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+FS = 256
+WINDOW = 4 * FS          # samples per raw window (collect_bandpower_windows.py)
+FRAME_WINDOW = 256       # band frames per preprocess() window
+SEED = 0
+
+BENCHMARKS = []
+
+# Before any app import: the served model path is read at import time
+BENCH_MODEL_PATH = os.path.join(tempfile.mkdtemp(prefix="muse-bench-"), "bigboy.joblib")
+os.environ["MODEL_PATH"] = BENCH_MODEL_PATH
+os.environ.setdefault("LAMBDA_ENDPOINT", "http://127.0.0.1:9/")  # no network during runs
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def benchmark(name):
+    """Register `setup() -> fn`; fn() is the timed operation."""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+# --- FIXTURES ---
+def _raw_window():
+    raw = pd.read_csv(RAW_CSV).to_numpy(dtype=np.float64)
+    return raw[:WINDOW]  # (samples, channels)
+
+
+def _band_frames():
+    return pd.read_csv(BANDS_CSV)[["alpha", "beta", "theta", "gamma"]]
+
+
+def _synthetic_model(compiled=False):
+    """LogisticRegression on single-frame features with labels from a fixed random projection."""
+    from sklearn.linear_model import LogisticRegression
+    from app.compiled_model import compile_model
+
+    X = _band_frames().to_numpy()
+    X = np.where(np.abs(X) <= 150, X, 0.0)
+    rng = np.random.default_rng(SEED)
+    y = np.array(["left", "right", "up", "down"])[np.argmax(X @ rng.normal(size=(4, 4)), axis=1)]
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    return compile_model(model) if compiled else model
+
+
+def _frame_payload():
+    """First frame without blink spikes (> 150 is masked to NaN and cannot be classified)."""
+    frames = _band_frames()
+    clean = (frames.abs() <= 150).all(axis=1)
+    return frames[clean].iloc[0].to_dict()
+
+
+# --- DSP ---
+@benchmark("dsp.bandpower[alpha, 1ch 4s]")
+def _bench_bandpower():
+    from app.dsp import bandpower
+    sig = _raw_window()[:, 0]
+    return lambda: bandpower(sig, FS, 8, 12)
+
+
+@benchmark("dsp.band_powers[4ch 4s]")
+def _bench_band_powers():
+    from app.dsp import band_powers
+    block = _raw_window().T
+    return lambda: band_powers(block, FS)
+
+
+@benchmark("dsp.band_powers[4ch 4s, fast]")
+def _bench_band_powers_fast():
+    from app.dsp import band_powers
+    block = _raw_window().T
+    return lambda: band_powers(block, FS, exact=False)
+
+
+@benchmark("dsp.BlockWindower+band_powers[4ch 1s, hop 64]")
+def _bench_block_windows():
+    from app.dsp import BlockWindower, band_powers
+    raw = pd.read_csv(RAW_CSV).to_numpy(dtype=np.float64).T
+    block = raw[:, 3 * FS:4 * FS]
+
+    def run():
+        windower = BlockWindower(4, 3 * FS, hop=64)
+        windower.push(raw[:, :3 * FS])
+        return band_powers(windower.push(block), FS)
+    assert run().shape == (4, 4, 4)
+    return run
+
+
+@benchmark("collect_bandpower_windows.compute_bands[4ch 4s]")
+def _bench_compute_bands():
+    from collect_bandpower_windows import compute_bands  # needs brainflow
+    frame = _raw_window()
+    return lambda: compute_bands(frame)
+
+
+# --- RECORDINGS ---
+_recording = None
+
+
+def _raw_recording():
+    """raw_muse_data.csv converted once into a temporary binary recording."""
+    global _recording
+    if _recording is None:
+        from app.recording_store import convert_csv, open_recording
+        path = os.path.join(tempfile.mkdtemp(prefix="muse-bench-"), "raw.museraw")
+        convert_csv(RAW_CSV, path, FS)
+        _recording = open_recording(path)
+    return _recording
+
+
+@benchmark("raw load[csv, full file]")
+def _bench_raw_csv():
+    return lambda: pd.read_csv(RAW_CSV).to_numpy(dtype=np.float32)
+
+
+@benchmark("raw load[recording_store, full file]")
+def _bench_raw_store():
+    from app.recording_store import open_recording
+    path = _raw_recording().path
+    return lambda: np.array(open_recording(path).samples)
+
+
+@benchmark("raw load[recording_store, 4s slice]")
+def _bench_raw_store_slice():
+    rec = _raw_recording()
+    assert len(rec.slice(2.0, 6.0)[0]) == WINDOW
+    return lambda: np.array(rec.slice(2.0, 6.0)[0])
+
+
+# --- PREPROCESS ---
+@benchmark("preprocess.preprocess[256 frames, features]")
+def _bench_preprocess_features():
+    from app.preprocess import preprocess
+    df = _band_frames().iloc[:FRAME_WINDOW]
+    return lambda: preprocess(df, aggregate=True, add_features=True)
+
+
+@benchmark("preprocess.preprocess[256 frames, no features]")
+def _bench_preprocess_plain():
+    from app.preprocess import preprocess
+    df = _band_frames().iloc[:FRAME_WINDOW]
+    return lambda: preprocess(df, aggregate=True, add_features=False)
+
+
+@benchmark("preprocess.preprocess[1 frame]")
+def _bench_preprocess_frame():
+    from app.preprocess import preprocess
+    df = pd.DataFrame([_frame_payload()])
+    return lambda: preprocess(df, aggregate=True, add_features=True)
+
+
+@benchmark("preprocess.FrameFeatures[1 frame]")
+def _bench_frame_features():
+    from app.preprocess import FrameFeatures
+    frame, features = _frame_payload(), FrameFeatures()
+    return lambda: features(frame)
+
+
+# --- CLASSIFY ---
+@benchmark("model_loader.classify_frame[sklearn]")
+def _bench_classify_sklearn():
+    from app.model_loader import classify_frame
+    from app.preprocess import FrameFeatures
+    model, features = _synthetic_model(), FrameFeatures()(_frame_payload())
+    assert classify_frame(model, features)["label"] != "Unknown error"
+    return lambda: classify_frame(model, features)
+
+
+@benchmark("model_loader.classify_frame[compiled]")
+def _bench_classify_compiled():
+    from app.model_loader import classify_frame
+    from app.preprocess import FrameFeatures
+    model, features = _synthetic_model(compiled=True), FrameFeatures()(_frame_payload())
+    assert classify_frame(model, features)["label"] != "Unknown error"
+    return lambda: classify_frame(model, features)
+
+
+# --- END TO END ---
+_client = None
+
+
+def _test_client():
+    """One TestClient for every /frame benchmark, serving the synthetic model from a temp bundle."""
+    global _client
+    if _client is None:
+        import joblib
+        joblib.dump({"model": _synthetic_model(), "features": ["alpha", "beta", "theta", "gamma"],
+                     "version": "bench"}, BENCH_MODEL_PATH)
+        from fastapi.testclient import TestClient
+        from app import main
+        _client = (TestClient(main.app).__enter__(), main)
+    return _client
+
+
+@benchmark("main./frame[json, microbatch off]")
+def _bench_frame_endpoint():
+    client, main = _test_client()
+    main.batcher.enabled = False
+    payload = _frame_payload()
+    assert client.post("/frame", json=payload).status_code == 200
+    return lambda: client.post("/frame", json=payload)
+
+
+@benchmark("main./frame[binary, microbatch off]")
+def _bench_frame_endpoint_binary():
+    from app.frame_codec import encode_record
+    client, main = _test_client()
+    main.batcher.enabled = False
+    body = encode_record(list(_frame_payload().values()))
+    headers = {"Content-Type": "application/octet-stream"}
+    assert client.post("/frame", content=body, headers=headers).status_code == 200
+    return lambda: client.post("/frame", content=body, headers=headers)
+
+
+# --- RUNNER ---
+def measure(fn, repeats=7, min_time=0.2):
+    """ops/sec (best of `repeats`), mean µs per op and traced peak KiB of one call."""
+    fn()  # warm caches and lazy imports
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rates.append(number / (time.perf_counter() - start))
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ops = max(rates)  # slower repeats measure interference from the machine, not the code
+    return {"ops_per_sec": ops, "mean_us": 1e6 / ops, "peak_kib": peak / 1024.0}
+
+
+def environment():
+    import scipy
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (name, ops delta, peak delta, regressed) against a stored baseline."""
+    rows = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, None, False))
+            continue
+        ops_delta = r["ops_per_sec"] / base["ops_per_sec"] - 1.0
+        mem_delta = (r["peak_kib"] - base["peak_kib"]) / max(base["peak_kib"], 64.0)
+        rows.append((name, ops_delta, mem_delta, ops_delta < -tolerance or mem_delta > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DSP, preprocessing and classification hot paths.")
+    parser.add_argument("-k", "--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timed repeat")
+    parser.add_argument("--save", action="store_true", help=f"Write results to {os.path.basename(BASELINE_PATH)}")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed fractional regression")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+
+    results = {}
+    print(f"{'benchmark':<50} {'ops/sec':>12} {'mean':>11} {'peak':>10}  vs baseline")
+    for name, setup in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        try:
+            fn = setup()
+        except ImportError as e:
+            print(f"{name:<50} skipped ({e})")
+            continue
+        except AssertionError:
+            print(f"{name:<50} FAILED (setup did not produce a valid result)")
+            continue
+        r = results[name] = measure(fn, args.repeats, args.min_time)
+        (_, ops_delta, mem_delta, regressed), = compare({name: r}, baseline, args.tolerance)
+        note = "" if ops_delta is None else f"{ops_delta:+.0%} ops, {mem_delta:+.0%} mem{'  REGRESSION' if regressed else ''}"
+        print(f"{name:<50} {r['ops_per_sec']:>12,.0f} {r['mean_us']:>9,.1f}µs {r['peak_kib']:>7,.1f}KiB  {note}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+    if args.save:
+        # Keep baselines of benchmarks that were filtered out or skipped this run
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": environment(), "results": dict(baseline, **results)}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = [row[0] for row in compare(results, baseline, args.tolerance) if row[3]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
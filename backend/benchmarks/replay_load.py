@@ -0,0 +1,260 @@
+"""
+Replay recorded sessions as N simulated headsets against a running backend.
+
+Every headset streams band frames from a recording at its real rate (--rate frames/s,
+times --speed) with one request in flight, like muse_bridge does. A frame whose send
+slot passes while the previous one is still waiting is dropped, so an overloaded
+backend shows up as drops and tail latency instead of an ever-growing client queue.
+
+    cd backend
+    python -m benchmarks.replay_load --url http://localhost:5000 --headsets 8 --duration 30
+    python -m benchmarks.replay_load --transport ws --format binary --speed 10 --headsets 4
+    python -m benchmarks.replay_load --sweep 1,2,4,8,16,32 --slo-ms 50   # find saturation
+
+Needs httpx (HTTP) and websockets (WebSocket).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(REPO, "backend"))
+
+from app.frame_codec import ROW_COLUMNS, encode_record  # noqa: E402
+
+BAND_COLS = ["alpha", "beta", "theta", "gamma"]
+DEFAULT_RECORDINGS = [os.path.join(REPO, "frontend", "eeg_training_data_temporal.csv")]
+FRAME_RATE = 4.0  # muse_bridge emits one band frame per 0.25 s hop
+FAILED_LABEL = "Unknown error"  # the label the server returns for a frame it could not classify
+
+
+def load_recordings(paths):
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path)
+        missing = [c for c in BAND_COLS if c not in df.columns]
+        if missing:
+            raise ValueError(f"{path} is missing band columns {missing}")
+        # Recordings with every per-channel band replay them too (ROW_COLUMNS starts with BAND_COLS)
+        columns = ROW_COLUMNS if all(c in df.columns for c in ROW_COLUMNS) else BAND_COLS
+        frames.append(df[columns].to_numpy(dtype=np.float64))
+    return frames
+
+
+class HeadsetStats:
+    def __init__(self):
+        self.latencies = []
+        self.sent = 0
+        self.ok = 0
+        self.errors = 0
+        self.busy = 0
+        self.dropped = 0
+
+
+# --- TRANSPORTS ---
+def reply_outcome(reply):
+    """"ok", "busy" or "error" for a /frame or /ws reply; a frame classified as FAILED_LABEL is an error."""
+    if "error" in reply:
+        return "busy" if str(reply["error"]).startswith("Server busy") else "error"
+    results = reply.get("results", [reply])
+    return "error" if any(r.get("result") == FAILED_LABEL for r in results) else "ok"
+
+
+class HttpTransport:
+    def __init__(self, url, fmt, connections):
+        import httpx
+        self.url = url.rstrip("/") + "/frame"
+        self.fmt = fmt
+        self.client = httpx.AsyncClient(timeout=10.0, limits=httpx.Limits(max_connections=connections))
+
+    async def open(self, headset_id):
+        return headset_id
+
+    async def send(self, handle, row, t_ms):
+        if self.fmt == "binary":
+            r = await self.client.post(self.url, content=encode_record(row, handle, t_ms),
+                                       headers={"Content-Type": "application/octet-stream"})
+        else:
+            r = await self.client.post(self.url, json=dict(zip(ROW_COLUMNS, row.tolist())))
+        if r.status_code == 503:
+            return "busy"
+        return reply_outcome(r.json()) if r.status_code == 200 else "error"
+
+    async def close(self, handle):
+        pass
+
+    async def shutdown(self):
+        await self.client.aclose()
+
+
+class WebSocketTransport:
+    def __init__(self, url, fmt, connections):
+        self.url = url.replace("http://", "ws://").replace("https://", "wss://").rstrip("/") + "/ws"
+        self.fmt = fmt
+
+    async def open(self, headset_id):
+        import websockets
+        return await websockets.connect(self.url, max_queue=None)
+
+    async def send(self, ws, row, t_ms):
+        if self.fmt == "binary":
+            await ws.send(encode_record(row, 0, t_ms))
+        else:
+            await ws.send(json.dumps(dict(zip(ROW_COLUMNS, row.tolist()), t=t_ms)))
+        return reply_outcome(json.loads(await ws.recv()))
+
+    async def close(self, ws):
+        await ws.close()
+
+    async def shutdown(self):
+        pass
+
+
+# --- LOAD ---
+async def run_headset(transport, headset_id, frames, interval, duration, stats, start_at):
+    """Stream `frames` on a fixed clock; late slots are dropped, never queued."""
+    try:
+        handle = await transport.open(headset_id)
+    except Exception:
+        stats.errors += 1
+        return
+    loop = asyncio.get_running_loop()
+    offset = (headset_id * 997) % len(frames)  # headsets start at different points of the recording
+    n_slots = int(np.ceil(duration / interval))
+    slot = 0
+    try:
+        while slot < n_slots:
+            due = start_at + slot * interval
+            now = loop.time()
+            if now < due:
+                await asyncio.sleep(due - now)
+            elif now - due >= interval:
+                # Previous request overran whole slots: those frames are lost, as on a real headset
+                missed = min(int((now - due) // interval), n_slots - slot)
+                stats.dropped += missed
+                slot += missed
+                continue
+
+            row = frames[(offset + slot) % len(frames)]
+            stats.sent += 1
+            t0 = time.perf_counter()
+            try:
+                result = await transport.send(handle, row, time.time() * 1000.0)
+            except Exception:
+                result = "error"
+            if result == "ok":
+                stats.ok += 1
+                stats.latencies.append(time.perf_counter() - t0)
+            elif result == "busy":
+                stats.busy += 1
+            else:
+                stats.errors += 1
+            slot += 1
+    finally:
+        try:
+            await transport.close(handle)
+        except Exception:
+            pass
+
+
+async def run_stage(args, recordings, headsets):
+    transport_cls = WebSocketTransport if args.transport == "ws" else HttpTransport
+    transport = transport_cls(args.url, args.format, headsets)
+    interval = 1.0 / (args.rate * args.speed)
+    stats = [HeadsetStats() for _ in range(headsets)]
+    loop = asyncio.get_running_loop()
+    start_at = loop.time() + 0.2
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            run_headset(transport, i, recordings[i % len(recordings)], interval, args.duration, stats[i], start_at)
+            for i in range(headsets)
+        ])
+    finally:
+        await transport.shutdown()
+    return summarize(stats, headsets, time.perf_counter() - started - 0.2, interval)
+
+
+def summarize(stats, headsets, elapsed, interval):
+    latencies = np.concatenate([np.asarray(s.latencies) for s in stats]) * 1000.0
+    sent = sum(s.sent for s in stats)
+    dropped = sum(s.dropped for s in stats)
+    failed = sum(s.errors + s.busy for s in stats)
+    scheduled = sent + dropped
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (float("nan"),) * 3
+    return {
+        "headsets": headsets,
+        "offered_fps": headsets / interval,
+        "throughput_fps": sum(s.ok for s in stats) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()) if len(latencies) else float("nan"),
+        "sent": sent,
+        "ok": sum(s.ok for s in stats),
+        "busy": sum(s.busy for s in stats),
+        "errors": sum(s.errors for s in stats),
+        "error_rate": failed / sent if sent else 0.0,
+        "dropped": dropped,
+        "drop_rate": dropped / scheduled if scheduled else 0.0,
+    }
+
+
+def print_row(r, header=False):
+    if header:
+        print(f"{'headsets':>8} {'offered/s':>10} {'ok/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'max ms':>8} {'errors':>8} {'busy':>6} {'err%':>6} {'dropped':>8} {'drop%':>6}")
+    print(f"{r['headsets']:>8} {r['offered_fps']:>10.1f} {r['throughput_fps']:>9.1f} {r['p50_ms']:>8.2f} "
+          f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {r['errors']:>8} {r['busy']:>6} "
+          f"{r['error_rate']:>6.1%} {r['dropped']:>8} {r['drop_rate']:>6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded EEG sessions as N headsets against the backend.")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--recording", action="append", help="Band CSV to replay (repeatable)")
+    parser.add_argument("--headsets", type=int, default=4)
+    parser.add_argument("--sweep", help="Comma-separated headset counts to run one after another, e.g. 1,2,4,8")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per stage")
+    parser.add_argument("--rate", type=float, default=FRAME_RATE, help="Recorded frames per second per headset")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1 = real time)")
+    parser.add_argument("--transport", choices=["http", "ws"], default="http")
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--slo-ms", type=float, default=100.0, help="p99 budget used to call saturation")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="Drop/error rate that counts as saturated")
+    parser.add_argument("--json", help="Write stage results to this file")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recording or DEFAULT_RECORDINGS)
+    stages = [int(n) for n in args.sweep.split(",")] if args.sweep else [args.headsets]
+    print(f"Replaying {sum(len(r) for r in recordings)} frames to {args.url} over {args.transport}/{args.format} "
+          f"at {args.rate * args.speed:g} frames/s per headset, {args.duration:g}s per stage")
+
+    results = []
+    for i, headsets in enumerate(stages):
+        r = asyncio.run(run_stage(args, recordings, headsets))
+        r["saturated"] = r["p99_ms"] > args.slo_ms or r["drop_rate"] + r["error_rate"] > args.max_drop
+        results.append(r)
+        print_row(r, header=i == 0)
+
+    healthy = [r for r in results if not r["saturated"]]
+    if len(stages) > 1:
+        if healthy:
+            best = max(healthy, key=lambda r: r["headsets"])
+            print(f"Highest healthy load: {best['headsets']} headsets ({best['throughput_fps']:.1f} frames/s, "
+                  f"p99 {best['p99_ms']:.1f} ms)")
+        else:
+            print("Saturated at every stage")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "stages": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
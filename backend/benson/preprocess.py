@@ -1,3 +1,5 @@
+import os
+import sys
 import numpy as np
 import mne
 from scipy.signal import butter, filtfilt, iirnotch
@@ -5,6 +7,9 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.decomposition import PCA
 from mne.preprocessing import ICA
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.spatial import SpatialFilter, spatial_params
+
 
 def bandpass_filter(data, lowcut, highcut, fs, order=5):
     nyq = 0.5 * fs
@@ -25,11 +30,13 @@ def apply_notch_filter(raw, notch_freq=60, Q=30, ref_type='average'):
     return raw
 
 
-def apply_ica(raw, n_components=4, exclude=[0,1], random_state=97):
+def apply_ica(raw, n_components=4, exclude=[0,1], random_state=97, return_model=False):
     ica = ICA(n_components=n_components, random_state=random_state)
     ica.fit(raw)
     ica.exclude = exclude
     raw_clean = ica.apply(raw)
+    if return_model:
+        return raw_clean, ica
     return raw_clean
 
 
@@ -42,26 +49,54 @@ def apply_pca(raw, n_components=0.95, return_model=False):
     return X_compressed
 
 
-def preprocess_eeg(df, sfreq=256, n_components_pca=0.95, aggregate=True):
+def notched_bands(df, sfreq=256):
+    """Bandpassed (1-40 Hz) and notched band series, not yet re-referenced: the input the spatial stage sees."""
     features = ["alpha", "beta", "theta", "gamma"]
+    filtered = bandpass_filter(df[features].values.T, 1, 40, sfreq)
+    b, a = iirnotch(60, Q=30, fs=sfreq)
+    return filtfilt(b, a, filtered, axis=1).T
 
-    # 1. Create MNE Raw object - in memory EEG object with 4 channels
+
+def fit_spatial_filter(df, sfreq=256, n_components_pca=0.95):
+    """
+    Fit ICA and PCA once on the training band series and return their parameters for
+    bundle["spatial"] (app.spatial.SpatialFilter applies them without MNE), plus the
+    PCA-compressed training data. The matmul stage is checked against MNE's output.
+    """
+    features = ["alpha", "beta", "theta", "gamma"]
     X_raw = df[features].values
     info = mne.create_info(ch_names=features, sfreq=sfreq, ch_types="eeg")
     raw = mne.io.RawArray(X_raw.T, info)
-
-    # 2. Bandpass filter (1-40 Hz) - filters everything below 1 hz and above 40 hz
     for i in range(len(features)):
-        raw._data[i,:] = bandpass_filter(raw._data[i,:], 1, 40, sfreq)
+        raw._data[i, :] = bandpass_filter(raw._data[i, :], 1, 40, sfreq)
+    notched = notched_bands(df, sfreq)
 
-    # 3. Notch filter - remove 60hz electrical interference
     raw = apply_notch_filter(raw)
+    raw, ica = apply_ica(raw, return_model=True)
+    X_compressed, pca_model = apply_pca(raw, n_components=n_components_pca, return_model=True)
+
+    params = spatial_params(ica, pca_model, channels=features, reference="average")
+    expected = np.hstack([raw.get_data().T, X_compressed])
+    got = SpatialFilter.from_params(params).apply(notched)
+    if not np.allclose(got, expected, rtol=1e-6, atol=1e-9 * np.abs(expected).max()):
+        raise ValueError("Spatial filter does not reproduce MNE's ICA/PCA output")
+    return params, X_compressed
+
+
+def preprocess_eeg(df, sfreq=256, n_components_pca=0.95, aggregate=True, spatial=None):
+    """
+    Filtered, ICA-cleaned and PCA-compressed band series plus encoded labels. Pass a
+    bundle's "spatial" parameters to reuse its fitted ICA/PCA instead of refitting; the
+    parameters (fitted or reused) are returned in place of the PCA model.
+    """
+    features = ["alpha", "beta", "theta", "gamma"]
 
-    # 4. ICA - exclude independent components
-    raw = apply_ica(raw)
-
-    # 5. PCA compression - further reduces noise
-    X_compressed, pca_model = apply_pca(raw, n_components=0.95, return_model=True)
+    if spatial is None:
+        # 1-5. Bandpass (1-40 Hz), notch, ICA and PCA, fitted once
+        spatial, X_compressed = fit_spatial_filter(df, sfreq, n_components_pca)
+    else:
+        # 1-3. Bandpass + notch; 4-5. the persisted ICA/PCA as one matmul, no MNE fit
+        X_compressed = SpatialFilter.from_params(spatial).apply(notched_bands(df, sfreq))[:, len(features):]
 
     # 6. Encode labels - converts text labels to numbers lables
     y = df['label'].values
@@ -78,4 +113,4 @@ def preprocess_eeg(df, sfreq=256, n_components_pca=0.95, aggregate=True):
     if group_cols:
         df_agg = df.groupby(group_cols)[features].mean().reset_index()
 
-    return X_compressed, y_encoded, df_agg, encoder, pca_model
\ No newline at end of file
+    return X_compressed, y_encoded, df_agg, encoder, spatial
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+install_bundle() + load_bundle(): an installed forest is stored as its flattened
+CompiledModel arrays, comes back memory-mapped and predicts exactly like the sklearn model
+it was installed from.
+"""
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import SVC
+
+from app.bundle_store import is_mmap_compatible, load_bundle
+from app.cache_manager import install_bundle
+from app.compiled_model import CompiledModel
+
+
+def forest(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 6))
+    y = np.where(X[:, 0] + rng.normal(size=300) > 0, "left", "right")
+    return RandomForestClassifier(20, random_state=seed).fit(X, y), X
+
+
+def test_installed_forest_is_mapped_and_equivalent(tmp_path):
+    model, X = forest()
+    src, dst = tmp_path / "trained.joblib", tmp_path / "bigboy.joblib"
+    joblib.dump({"model": model, "features": list("abcdef"), "version": "t"}, src, compress=3)
+
+    install_bundle(str(src), str(dst))
+    assert is_mmap_compatible(dst)
+    mapped, heap = load_bundle(str(dst)), load_bundle(str(dst), mmap=False)
+
+    assert isinstance(mapped["model"], CompiledModel)
+    assert (mapped["features"], mapped["version"]) == (list("abcdef"), "t")
+    assert all(isinstance(a, np.memmap) for a in mapped["model"].arrays.values() if isinstance(a, np.ndarray))
+    for loaded in (mapped, heap):
+        np.testing.assert_array_equal(loaded["model"].predict_proba(X), model.predict_proba(X))
+        np.testing.assert_array_equal(loaded["model"].predict(X), model.predict(X))
+
+
+def test_unsupported_model_is_installed_unchanged(tmp_path):
+    _, X = forest()
+    model = SVC().fit(X, X[:, 0] > 0)
+    src, dst = tmp_path / "trained.joblib", tmp_path / "bigboy.joblib"
+    joblib.dump({"model": model}, src)
+
+    install_bundle(str(src), str(dst))
+    assert src.read_bytes() == dst.read_bytes()
+    assert isinstance(load_bundle(str(dst))["model"], SVC)
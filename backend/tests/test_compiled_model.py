@@ -0,0 +1,78 @@
+"""
+CompiledModel against the sklearn model it was compiled from: probabilities and labels
+for linear models and tree ensembles, on random rows, exact split thresholds, extreme
+values and NaN (rejected where sklearn rejects it, routed like sklearn where it is not).
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.compiled_model import CompiledModel, compile_model
+
+RNG = np.random.default_rng(0)
+X = RNG.normal(0.0, 2.0, (400, 5))
+BINARY = np.where(X[:, 0] + X[:, 1] > 0, "left", "right")
+MULTI = np.array(["left", "right", "rest"])[np.digitize(X[:, 0], [-1.0, 1.0])]
+
+
+def edge_rows(compiled):
+    rows = [np.zeros(5), np.full(5, 1e6), np.full(5, -1e6), np.full(5, 3.4e38), np.full(5, 1e-300)]
+    if compiled.kind == "forest":
+        a = compiled.arrays
+        internal = a["left"] != np.arange(len(a["left"]))
+        for f, t in list(zip(a["feature"][internal], a["threshold"][internal]))[:50]:
+            row = np.zeros(5)
+            row[f] = t  # exactly on the split
+            rows.append(row)
+    return np.vstack([X[:50], rows])
+
+
+def assert_same(compiled, model, rows):
+    np.testing.assert_allclose(compiled.predict_proba(rows), model.predict_proba(rows), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(rows), model.predict(rows))
+
+
+MODELS = [
+    pytest.param(lambda: LogisticRegression().fit(X, BINARY), id="logreg-binary"),
+    pytest.param(lambda: LogisticRegression().fit(X, MULTI), id="logreg-multinomial"),
+    pytest.param(lambda: make_pipeline(StandardScaler(), LogisticRegression()).fit(X * 50 + 3, MULTI), id="scaled-logreg"),
+    pytest.param(lambda: RandomForestClassifier(30, random_state=0).fit(X, MULTI), id="random-forest"),
+    pytest.param(lambda: ExtraTreesClassifier(30, random_state=0).fit(X, BINARY), id="extra-trees"),
+]
+
+
+@pytest.mark.parametrize("make", MODELS)
+def test_matches_sklearn(make):
+    model = make()
+    compiled = compile_model(model)
+    assert isinstance(compiled, CompiledModel)
+    assert list(compiled.classes_) == list(model.classes_)
+    assert_same(compiled, model, edge_rows(compiled))
+
+
+@pytest.mark.parametrize("make", MODELS[:3])
+def test_linear_rejects_nan_like_sklearn(make):
+    model = make()
+    compiled = compile_model(model)
+    row = X[:1].copy()
+    row[0, 2] = np.nan
+    with pytest.raises(ValueError):
+        model.predict_proba(row)
+    with pytest.raises(ValueError):
+        compiled.predict_proba(row)
+
+
+def test_forest_routes_nan_like_sklearn():
+    train = X.copy()
+    train[RNG.random(train.shape) < 0.1] = np.nan  # trees learn where missing values go
+    model = RandomForestClassifier(30, random_state=0).fit(train, MULTI)
+    compiled = compile_model(model)
+    assert compiled.allow_nan
+
+    rows = X[:100].copy()
+    rows[RNG.random(rows.shape) < 0.3] = np.nan
+    rows[0] = np.nan
+    assert_same(compiled, model, rows)
@@ -0,0 +1,79 @@
+"""
+band_powers_exact() against the per-script bandpower() helper the band datasets were
+collected with, the exact mode of band_powers() / SlidingBandpower, and the "band_power"
+record datasets and bundles carry.
+"""
+import numpy as np
+import pytest
+from scipy.integrate import trapezoid
+from scipy.signal import butter, filtfilt, welch
+
+from app.dsp import EEG_BANDS, SlidingBandpower, band_powers, band_powers_exact
+
+
+def legacy_bandpower(sig, fs, f1, f2):
+    # The helper collect_data.py and the frontend scripts carried (np.trapz == trapezoid)
+    sig = np.ascontiguousarray(sig.astype(np.float64))
+    b, a = butter(4, [f1 / (fs / 2), f2 / (fs / 2)], btype="band")
+    filtered = filtfilt(b, a, sig)
+    freqs, psd = welch(filtered, fs=fs, nperseg=fs)
+    idx = np.logical_and(freqs >= f1, freqs <= f2)
+    return float(trapezoid(psd[idx], freqs[idx]))
+
+
+def block(n=768, seed=0):
+    return np.random.default_rng(seed).normal(0.0, 20.0, (4, n))
+
+
+def test_exact_matches_legacy_helper():
+    x = block()
+    expected = np.array([[legacy_bandpower(ch, 256, lo, hi) for lo, hi in EEG_BANDS.values()] for ch in x])
+    np.testing.assert_allclose(band_powers_exact(x, 256), expected, rtol=1e-12)
+    np.testing.assert_array_equal(band_powers(x, 256, exact=True), band_powers_exact(x, 256))
+
+
+def test_sliding_exact_matches_each_window():
+    x = block(1024, seed=1)
+    sliding = SlidingBandpower(256, 4, window=3.0, hop=0.5, exact=True)
+    emitted = sliding.push(x[:, :500]) + sliding.push(x[:, 500:])
+    assert len(emitted) == 3
+    for k, powers in enumerate(emitted):
+        end = 768 + k * 128
+        np.testing.assert_allclose(powers, band_powers_exact(x[:, end - 768:end], 256), rtol=1e-12)
+
+
+def test_exact_is_the_default():
+    x = block()
+    np.testing.assert_array_equal(band_powers(x, 256), band_powers_exact(x, 256))
+
+
+def test_band_power_method_is_recorded_and_enforced(tmp_path):
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+
+    from app.model_registry import ModelRegistry
+    from app.train import build_features
+    from app.window_store import WindowStore
+
+    fast, exact = str(tmp_path / "fast.musewin"), str(tmp_path / "exact.musewin")
+    for path, method in ((fast, "fast"), (exact, "exact")):
+        with WindowStore(path, band_power=method) as store:
+            for label in ("left", "right", "left", "right"):
+                store.begin_attempt(label)
+                store.add_windows(np.random.default_rng(0).uniform(1, 50, (5, 4)))
+                store.end_attempt()
+    with pytest.raises(ValueError):
+        WindowStore(fast, band_power="exact")  # appending other band powers
+    with pytest.raises(ValueError):
+        build_features([fast, exact], jobs=1)
+    assert build_features([exact], jobs=1)[3]["band_power"] == "exact"
+
+    X = np.random.default_rng(1).uniform(0, 50, (20, 4))
+    model = LogisticRegression().fit(X, np.where(X[:, 0] > 25, "left", "right"))
+    for method, served in (("fast", False), ("exact", True), (None, True)):
+        path = str(tmp_path / f"{method}.joblib")
+        bundle = {"model": model, "features": ["alpha", "beta", "theta", "gamma"], "version": "t"}
+        if method:
+            bundle["band_power"] = method
+        joblib.dump(bundle, path)
+        assert ModelRegistry(path).load() is served
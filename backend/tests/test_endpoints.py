@@ -0,0 +1,76 @@
+"""
+/frame, /frames and /ws end to end through FastAPI's TestClient, for bundles with and
+without a feature list, and binary frame records answered like their JSON equivalent.
+"""
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LogisticRegression
+
+from app import main
+from app.dsp import band_columns
+from app.frame_codec import encode_record
+
+FRAME = {c: 10.0 + i for i, c in enumerate(band_columns())}
+
+
+@pytest.fixture
+def serve(tmp_path, monkeypatch):
+    """Serve `model_obj` (an estimator or a bundle dict) from a temp path; returns a TestClient."""
+    def _serve(model_obj):
+        path = str(tmp_path / "bigboy.joblib")
+        joblib.dump(model_obj, path)
+        monkeypatch.setattr(main.registry, "path", path)
+        monkeypatch.setattr(main.registry, "active", None)
+        return TestClient(main.app)
+    return _serve
+
+
+def bare_estimator():
+    # Fitted on a plain array: no feature_names_in_, so the registry has no feature list
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 50, (40, 4))
+    return LogisticRegression().fit(X, np.where(X[:, 0] > 25, "left", "right"))
+
+
+def test_featureless_model_is_served(serve):
+    client = serve(bare_estimator())
+
+    assert client.post("/frame", json=FRAME).json()["result"] in ("left", "right")
+    results = client.post("/frames", json={"frames": [FRAME, FRAME]}).json()["results"]
+    assert [r["result"] in ("left", "right") for r in results] == [True, True]
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json(FRAME)
+        assert ws.receive_json()["result"] in ("left", "right")
+
+
+def test_frames_use_channel_columns(serve):
+    rng = np.random.default_rng(1)
+    columns = band_columns()
+    X = rng.uniform(0, 50, (60, len(columns)))
+    model = LogisticRegression().fit(X, np.where(X[:, -1] > 25, "up", "down"))  # decided by gamma_TP10
+    client = serve({"model": model, "features": columns, "version": "t"})
+
+    frames = [dict(FRAME, gamma_TP10=v) for v in (1.0, 49.0)]
+    assert [r["result"] for r in client.post("/frames", json={"frames": frames}).json()["results"]] == ["down", "up"]
+    assert [client.post("/frame", json=f).json()["result"] for f in frames] == ["down", "up"]
+
+
+def test_binary_frames_match_json(serve):
+    rng = np.random.default_rng(2)
+    columns = band_columns()
+    X = rng.uniform(0, 50, (60, len(columns)))
+    model = LogisticRegression(max_iter=1000).fit(X, np.where(X[:, 0] + X[:, -1] > 50, "up", "down"))
+    client = serve({"model": model, "features": columns, "version": "t"})
+
+    rows = rng.uniform(0, 50, (6, len(columns))).astype(np.float32)
+    frames = [dict(zip(columns, map(float, r))) for r in rows]
+    body = encode_record(rows[:4], session_id=1) + encode_record(rows[4:], session_id=2)
+    binary = client.post("/frames", content=body, headers={"Content-Type": "application/octet-stream"}).json()
+    json_ = client.post("/frames", json={"frames": frames}).json()
+    assert [(r["result"], r["confidence"]) for r in binary["results"]] == \
+        [(r["result"], r["confidence"]) for r in json_["results"]]
+
+    single = client.post("/frame", content=encode_record(rows[0]), headers={"Content-Type": "application/octet-stream"})
+    assert single.json()["result"] == json_["results"][0]["result"]
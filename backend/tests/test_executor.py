@@ -0,0 +1,60 @@
+"""
+ClassifyExecutor: a process-pool job is scored by the ActiveModel it was submitted with,
+never by a bundle that replaced it on disk, and failed jobs are not counted as completed.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from app.bundle_store import save_bundle
+from app.executor import ClassifyExecutor, ModelChanged, classify_one
+from app.model_registry import ActiveModel, file_sha256
+
+ROW = np.zeros((1, 4))
+
+
+def saying(label):
+    """A fitted model that answers `label` for ROW."""
+    X = np.vstack([np.zeros(4), np.full(4, 10.0)])
+    return LogisticRegression().fit(X, [label, "other"])
+
+
+def install(path, model):
+    save_bundle({"model": model, "features": ["alpha", "beta", "theta", "gamma"]}, path)  # atomic, like installs
+    return ActiveModel(model, None, "v", file_sha256(path), 0.0)
+
+
+def test_process_jobs_use_their_paired_model(tmp_path):
+    path = str(tmp_path / "bigboy.joblib")
+    first = install(path, saying("left"))
+    registry = SimpleNamespace(path=path, active=first)
+    executor = ClassifyExecutor(registry, backend="process", workers=1)
+
+    async def scenario():
+        assert (await executor.submit(classify_one, ROW, first))["label"] == "left"
+        second = install(path, saying("right"))  # replaced on disk, registry not reloaded yet
+        assert (await executor.submit(classify_one, ROW, first))["label"] == "left"  # still loaded
+        assert (await executor.submit(classify_one, ROW, second))["label"] == "right"
+        with pytest.raises(ModelChanged):  # its bundle is gone: not scored by another model
+            await executor.submit(classify_one, ROW, first)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert (executor.completed, executor.failed) == (3, 1)
+
+
+def test_failures_are_counted_separately():
+    def broken(model, arg):
+        raise RuntimeError("boom")
+
+    executor = ClassifyExecutor(SimpleNamespace(path=None, active=None), backend="inline")
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.submit(broken, ROW))
+    assert asyncio.run(executor.submit(lambda model, arg: arg, 1)) == 1
+    assert {k: executor.stats()[k] for k in ("completed", "failed", "queue_depth")} == \
+        {"completed": 1, "failed": 1, "queue_depth": 0}
@@ -0,0 +1,87 @@
+"""
+FeatureCache in app.train: a retrain featurizes only new or changed attempts, cached
+rows equal freshly computed ones, and a new preprocessing config starts a fresh
+directory while removing only stale cache directories.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import train
+from app.train import CACHE_MANIFEST, FeatureCache, build_features
+from app.window_store import WindowStore
+
+RNG = np.random.default_rng(0)
+
+
+def dataset(path, attempts):
+    with WindowStore(path) as store:
+        for label, values in attempts:
+            store.begin_attempt(label)
+            store.add_windows(values)
+            store.end_attempt()
+    return path
+
+
+@pytest.fixture
+def featurized(monkeypatch):
+    """Counts featurize_attempt() calls (jobs=1 keeps them in this process)."""
+    calls = []
+    original = train.featurize_attempt
+
+    def counting(attempt, *args):
+        calls.append(int(attempt["attempt_id"].iloc[0]))
+        return original(attempt, *args)
+
+    monkeypatch.setattr(train, "featurize_attempt", counting)
+    return calls
+
+
+def test_only_new_attempts_are_featurized(tmp_path, featurized):
+    attempts = [(label, RNG.uniform(1, 50, (6, 4))) for label in ("left", "right", "left")]
+    path = dataset(str(tmp_path / "data.musewin"), attempts)
+    root = str(tmp_path / "cache")
+
+    X, y, groups, _ = build_features([path], jobs=1, cache=FeatureCache(root))
+    assert featurized == [1, 2, 3]
+    X_fresh, *_ = build_features([path], jobs=1)
+    pd.testing.assert_frame_equal(X, X_fresh)
+
+    featurized.clear()
+    X_cached, y_cached, *_ = build_features([path], jobs=1, cache=FeatureCache(root))
+    assert featurized == []
+    pd.testing.assert_frame_equal(X_cached, X)
+    assert list(y_cached) == list(y)
+
+    # A new attempt, and the same windows under another sample unit, are misses
+    dataset(path, [("right", RNG.uniform(1, 50, (6, 4)))])
+    build_features([path], jobs=1, cache=FeatureCache(root))
+    assert featurized == [4]
+    featurized.clear()
+    build_features([path], frame=2, jobs=1, cache=FeatureCache(root))
+    assert featurized == [1, 2, 3, 4]
+
+
+def test_renumbered_attempts_still_hit(tmp_path, featurized):
+    attempts = [("left", RNG.uniform(1, 50, (6, 4))), ("right", RNG.uniform(1, 50, (6, 4)))]
+    root = str(tmp_path / "cache")
+    build_features([dataset(str(tmp_path / "a.musewin"), attempts)], jobs=1, cache=FeatureCache(root))
+    featurized.clear()
+    build_features([dataset(str(tmp_path / "b.musewin"), attempts[::-1])], jobs=1, cache=FeatureCache(root))
+    assert featurized == []
+
+
+def test_config_change_invalidates_and_prunes(tmp_path, monkeypatch):
+    root = str(tmp_path / "cache")
+    old = FeatureCache(root)
+    old.put("k", pd.DataFrame({"alpha": [1.0]}))
+    os.makedirs(os.path.join(root, "notes"))  # not a cache directory: left alone
+
+    monkeypatch.setattr(train, "CACHE_VERSION", train.CACHE_VERSION + 1)
+    new = FeatureCache(root)
+    assert new.key != old.key and new.removed == 1
+    assert sorted(os.listdir(root)) == sorted([new.key, "notes"])
+    assert os.path.exists(os.path.join(new.path, CACHE_MANIFEST))
+    assert new.get("k") is None
@@ -0,0 +1,47 @@
+"""
+Binary frame records: encode/decode round trip, per-row session ids and timestamps,
+raw Muse blocks turned into band rows, and malformed payloads rejected.
+"""
+import numpy as np
+import pytest
+
+from app.dsp import EEG_BANDS, band_powers, band_table
+from app.frame_codec import (HEADER, KIND_RAW, ROW_COLUMNS, FrameFormatError, decode_records, encode_record,
+                             pad_channels, stack_records)
+
+RNG = np.random.default_rng(0)
+
+
+def test_round_trip_and_stacking():
+    bands = RNG.uniform(0, 50, (3, 4)).astype(np.float32)
+    wide = RNG.uniform(0, 50, (2, len(ROW_COLUMNS))).astype(np.float32)
+    buf = encode_record(bands, session_id=7, timestamp=1.5) + encode_record(wide, session_id=9, timestamp=2.5)
+
+    records = decode_records(buf)
+    assert [(r.session_id, r.timestamp, r.values.shape) for r in records] == [(7, 1.5, (3, 4)), (9, 2.5, (2, 20))]
+    np.testing.assert_array_equal(records[0].values, bands)
+    assert not records[0].values.flags.writeable  # a view into the request body
+
+    frames = stack_records(records)
+    assert frames.session_ids == [7, 7, 7, 9, 9]
+    assert frames.timestamps == [1.5] * 3 + [2.5] * 2
+    np.testing.assert_array_equal(frames.bands, np.vstack([pad_channels(bands), wide]))
+
+
+def test_raw_muse_block_becomes_band_rows():
+    samples = RNG.normal(0, 10, (512, 4))
+    (record,) = decode_records(encode_record(samples, kind=KIND_RAW, fs=256.0))
+    expected = band_table(band_powers(record.values.T, 256.0, EEG_BANDS)[None])
+    np.testing.assert_allclose(stack_records([record]).bands, expected)
+
+
+@pytest.mark.parametrize("buf", [
+    encode_record(np.zeros((2, 4)))[:HEADER.size - 1],                  # truncated header
+    encode_record(np.zeros((2, 4)))[:-1],                               # truncated payload
+    b"XX" + encode_record(np.zeros((1, 4)))[2:],                        # bad magic
+    encode_record(np.zeros((1, 5))),                                    # 5 band columns
+    encode_record(np.zeros((4, 4)), kind=KIND_RAW, fs=0.0),             # raw without fs
+])
+def test_malformed_payloads_are_rejected(buf):
+    with pytest.raises(FrameFormatError):
+        stack_records(decode_records(buf))
@@ -0,0 +1,8 @@
+"""Prometheus text rendering of label values."""
+from app.metrics import _labels
+
+
+def test_label_values_are_escaped():
+    rendered = _labels(("version", "le"), ('v1 "rc"\\2\nx', "+Inf"))
+    assert rendered == '{version="v1 \\"rc\\"\\\\2\\nx",le="+Inf"}'
+    assert "\n" not in rendered
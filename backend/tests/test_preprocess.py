@@ -0,0 +1,68 @@
+"""
+Equivalence of the fast feature paths with preprocess(aggregate=True, add_features=True):
+FrameFeatures for single /frame payloads and preprocess_windows for /frames and /ws.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.preprocess import BAND_FEATURES, CHANNEL_FEATURES, FrameFeatures, preprocess, preprocess_windows
+
+
+def reference(frame_or_window, columns):
+    df = pd.DataFrame(frame_or_window)
+    return preprocess(df, aggregate=True, add_features=True).reindex(columns=columns, fill_value=0.0)
+
+
+FRAMES = [
+    {"alpha": 12.5, "beta": 7.25, "theta": 30.0, "gamma": 1.5},
+    {"alpha": 0.0, "beta": -3.0, "theta": 149.9, "gamma": 2.0},
+    {"alpha": 12.5, "beta": 7.25, "theta": 160.0, "gamma": 1.5},        # blink spike
+    {"alpha": np.inf, "beta": 7.25, "theta": 30.0, "gamma": 1.5},
+    {"alpha": np.nan, "beta": np.nan, "theta": np.nan, "gamma": np.nan},
+]
+
+
+@pytest.mark.parametrize("frame", FRAMES)
+def test_frame_features_match_preprocess(frame):
+    expected = reference([frame], BAND_FEATURES).to_numpy()
+    np.testing.assert_array_equal(FrameFeatures()(frame), expected)
+
+
+@pytest.mark.parametrize("frame", FRAMES[:3])
+def test_frame_features_in_model_order(frame):
+    # A model's feature list: shuffled bands, channel columns, columns one frame cannot produce
+    rng = np.random.default_rng(0)
+    frame = dict(frame, **{c: float(v) for c, v in zip(CHANNEL_FEATURES, rng.uniform(0, 200, len(CHANNEL_FEATURES)))})
+    columns = ["gamma", "alpha_TP9", "alpha_beta_power", "theta", "beta", "gamma_TP10", "alpha", "pca_0"]
+    features = FrameFeatures(columns)
+    expected = reference([frame], columns).to_numpy()
+    np.testing.assert_array_equal(features(frame), expected)
+    values = [frame[c] for c in BAND_FEATURES + CHANNEL_FEATURES]
+    np.testing.assert_array_equal(features.from_values(values), expected)
+
+
+def test_frame_features_absent_channels_are_zero():
+    columns = BAND_FEATURES + CHANNEL_FEATURES
+    frame = FRAMES[0]
+    np.testing.assert_array_equal(FrameFeatures(columns)(frame), reference([frame], columns).to_numpy())
+
+
+def test_frame_features_reuses_buffer():
+    features = FrameFeatures()
+    out = np.full((1, 4), 7.0)
+    assert features(FRAMES[0], out) is out
+    np.testing.assert_array_equal(out, reference([FRAMES[0]], BAND_FEATURES).to_numpy())
+
+
+@pytest.mark.parametrize("n_samples", [1, 7, 8, 12, 64, 256])
+def test_preprocess_windows_match_preprocess(n_samples):
+    rng = np.random.default_rng(n_samples)
+    columns = BAND_FEATURES + CHANNEL_FEATURES
+    windows = rng.uniform(0, 120, (5, n_samples, len(columns)))
+    windows[1, 0, 2] = 180.0  # blink spike inside one window
+    got = preprocess_windows(windows, channel_columns=CHANNEL_FEATURES)
+    for i, window in enumerate(windows):
+        expected = preprocess(pd.DataFrame(window, columns=columns), aggregate=True, add_features=True)
+        assert list(got.columns) == list(expected.columns)
+        np.testing.assert_allclose(got.iloc[i].to_numpy(), expected.iloc[0].to_numpy(), rtol=1e-9, atol=1e-9)
@@ -0,0 +1,106 @@
+"""
+Raw recordings: RecordingWriter → Recording round trip, continuing a recording after a
+torn append, time-range slices, CSV convert/export, and StreamRecorder's background
+writes, drops and gap accounting.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.recording_store import SAMPLES_FILE, Recording, RecordingWriter, StreamRecorder, convert_csv
+
+FS = 256.0
+RNG = np.random.default_rng(0)
+
+
+def blocks(n, sizes=(12, 30, 7)):
+    return [RNG.normal(0, 50, (size, 4)).astype(np.float32) for size in sizes[:n]]
+
+
+def test_round_trip_and_reopen(tmp_path):
+    path = str(tmp_path / "session.museraw")
+    first, second, third = blocks(3)
+    with RecordingWriter(path, fs=FS) as writer:
+        writer.append(first, 100.0 + np.arange(12) / FS)
+        writer.append(second)  # continues the clock
+    with open(os.path.join(path, SAMPLES_FILE), "ab") as f:
+        f.write(b"\0" * 10)  # torn append: ignored, then truncated by the next writer
+
+    assert len(Recording(path)) == 42
+    with RecordingWriter(path, fs=FS) as writer:
+        writer.append(third)
+    with pytest.raises(ValueError):
+        RecordingWriter(path, fs=128.0)
+
+    rec = Recording(path)
+    np.testing.assert_array_equal(rec.samples, np.vstack([first, second, third]))
+    np.testing.assert_allclose(rec.timestamps, 100.0 + np.arange(49) / FS)
+    assert rec.chunks().tolist() == [[0, 12], [12, 30], [42, 7]]
+
+    samples, timestamps = rec.slice(10 / FS, 20 / FS)
+    np.testing.assert_array_equal(samples, rec.samples[10:20])
+    assert isinstance(samples, np.memmap)
+
+
+def test_csv_convert_and_export(tmp_path):
+    raw = pd.DataFrame(RNG.normal(0, 50, (300, 4)).astype(np.float32), columns=["TP9", "AF7", "AF8", "TP10"])
+    csv_path, out = tmp_path / "raw_muse_data.csv", str(tmp_path / "raw.museraw")
+    raw.to_csv(csv_path, index=False)
+
+    assert convert_csv(str(csv_path), out, fs=FS, start_time=5.0, chunk_rows=128) == 300
+    rec = Recording(out)
+    assert rec.channels == list(raw.columns)
+    assert rec.chunks()[:, 1].tolist() == [128, 128, 44]
+    with pytest.raises(FileExistsError):
+        convert_csv(str(csv_path), out)
+
+    # Seconds 0.5–1.0 of the recording: samples 128..255
+    exported = rec.to_dataframe(0.5, 1.0)
+    np.testing.assert_allclose(exported["timestamp"], 5.0 + np.arange(128, 256) / FS)
+    np.testing.assert_array_equal(exported[raw.columns].to_numpy(dtype=np.float32), raw.to_numpy()[128:256])
+
+
+def test_stream_recorder_round_trip(tmp_path):
+    path = str(tmp_path / "live.museraw")
+    data = RNG.normal(0, 50, (100, 4)).astype(np.float32)
+    times = np.arange(100) / FS
+    times[60:] += 10 / FS  # 10 samples lost upstream before sample 60
+
+    with StreamRecorder(RecordingWriter(path, fs=FS), max_blocks=8) as recorder:
+        for i in range(0, 100, 20):
+            assert recorder.put(data[i:i + 20], times[i:i + 20])
+    assert recorder.stats() == {"written": 100, "queued": 0, "dropped_blocks": 0, "dropped_samples": 0,
+                                "gap_samples": 10}
+    rec = Recording(path)
+    np.testing.assert_array_equal(rec.samples, data)
+    np.testing.assert_array_equal(rec.timestamps, times)
+
+
+def test_stream_recorder_drops_when_full(tmp_path):
+    recorder = StreamRecorder(RecordingWriter(str(tmp_path / "live.museraw"), fs=FS), max_blocks=1)
+    data = RNG.normal(0, 50, (30, 4)).astype(np.float32)
+    times = np.arange(30) / FS
+    assert recorder.put(data[:10], times[:10])
+    assert not recorder.put(data[10:20], times[10:20])  # writer thread not started: queue full
+    recorder.start()
+    while recorder.queue.qsize():
+        pass
+    assert recorder.put(data[20:], times[20:])
+    recorder.stop()
+
+    # The jump over the dropped block is counted once, as dropped, not again as a gap
+    stats = recorder.stats()
+    assert (stats["written"], stats["dropped_blocks"], stats["dropped_samples"], stats["gap_samples"]) == (20, 1, 10, 0)
+    np.testing.assert_array_equal(Recording(str(tmp_path / "live.museraw")).samples, np.vstack([data[:10], data[20:]]))
+
+
+def test_stream_recorder_surfaces_writer_errors(tmp_path):
+    writer = RecordingWriter(str(tmp_path / "live.museraw"), fs=FS)
+    recorder = StreamRecorder(writer).start()
+    recorder.put(np.zeros((5, 3)))  # wrong channel count: the writer thread fails
+    recorder._thread.join(timeout=5)
+    with pytest.raises(RuntimeError, match="recording writer failed"):
+        recorder.put(np.zeros((5, 4)))
+    recorder.stop()
@@ -0,0 +1,127 @@
+"""
+ModelSync against a local stub of the model endpoint: conditional 304s and already
+installed payloads skip the install, a checksum mismatch is refused, and a check that
+times out is retried by run().
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app import sagemaker_sync
+from app.sagemaker_sync import ModelSync
+
+PAYLOAD = b"\x80 bundle bytes"
+
+
+class Endpoint(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with an ETag; `delays` holds per-request sleeps (a timeout on the first)."""
+
+    etag = '"v1"'
+    sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+    delays = []
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("X-Model-Sha256", self.sha256)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    monkeypatch.setattr(Endpoint, "delays", [])
+    monkeypatch.setattr(Endpoint, "requests", [])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Endpoint)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/model"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sync(endpoint, tmp_path):
+    model_path = tmp_path / "bigboy.joblib"
+    installed = []
+
+    def install(path):
+        # Installing rewrites the bundle, like install_bundle() compiling a model
+        with open(path, "rb") as src:
+            model_path.write_bytes(b"installed " + src.read())
+        installed.append(path)
+        return True
+
+    s = ModelSync(endpoint, str(tmp_path / "sync_state.json"), install, timeout=(1, 0.2),
+                  model_path=str(model_path))
+    s.installed = installed
+    return s
+
+
+def test_update_then_unchanged(sync, tmp_path, monkeypatch):
+    assert sync.check_once() == "updated"
+    installed_sha = hashlib.sha256((tmp_path / "bigboy.joblib").read_bytes()).hexdigest()
+    assert sync.state["sha256"] == Endpoint.sha256
+    assert sync.state["installed_sha256"] == installed_sha
+
+    # 304 on the stored ETag
+    assert sync.check_once() == "unchanged"
+    assert Endpoint.requests[-1]["If-None-Match"] == Endpoint.etag
+
+    # New ETag, same payload: matched by its hash, not reinstalled, even after a restart
+    restarted = ModelSync(sync.endpoint, sync.state_path, sync.install, model_path=sync.model_path)
+    monkeypatch.setattr(Endpoint, "etag", '"v2"')
+    assert restarted.check_once() == "unchanged"
+    assert len(sync.installed) == 1
+
+
+def test_existing_bundle_is_not_refetched(sync, tmp_path):
+    # No sync history, but the payload is what is already installed
+    (tmp_path / "bigboy.joblib").write_bytes(PAYLOAD)
+    assert sync.check_once() == "unchanged"
+    assert sync.installed == []
+
+
+def test_checksum_mismatch_is_refused(sync, monkeypatch):
+    monkeypatch.setattr(Endpoint, "sha256", "0" * 64)
+    with pytest.raises(ValueError, match="checksum mismatch"):
+        sync.check_once()
+    assert sync.installed == []
+    assert "etag" not in sync.state
+
+
+def test_timeout_is_retried(sync, monkeypatch):
+    monkeypatch.setattr(sagemaker_sync, "RETRY_BASE", 0.01)
+    Endpoint.delays[:] = [0.4]  # first check exceeds the 0.2 s read timeout
+    with pytest.raises(requests.exceptions.Timeout):
+        sync.check_once()
+
+    Endpoint.delays[:] = [0.4]
+
+    async def until_installed():
+        task = asyncio.create_task(sync.run())
+        while not sync.installed:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(until_installed(), 10))
+    assert len(Endpoint.requests) >= 3
+    assert sync.state["sha256"] == Endpoint.sha256
@@ -0,0 +1,47 @@
+"""
+SpatialModel against the training path: the model sees SpatialFilter.transform() rows
+reindexed to the bundle's features, whatever order those features are in.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.spatial import SpatialFilter, SpatialModel, spatial_params
+
+
+def fitted_params(seed=0):
+    # Stand-ins for a fitted mne ICA and sklearn PCA (only their attributes are read)
+    rng = np.random.default_rng(seed)
+    unmixing = np.eye(4) + 0.1 * rng.normal(size=(4, 4))
+    ica = SimpleNamespace(pre_whitener_=np.full(4, 2.0), pca_mean_=rng.normal(size=4),
+                          pca_components_=np.linalg.qr(rng.normal(size=(4, 4)))[0],
+                          unmixing_matrix_=unmixing, mixing_matrix_=np.linalg.inv(unmixing), exclude=[0])
+    pca = SimpleNamespace(components_=rng.normal(size=(2, 4)), mean_=rng.normal(size=4))
+    return spatial_params(ica, pca)
+
+
+class Echo:
+    classes_ = np.array(["a"])
+
+    def predict(self, X):
+        return np.asarray(X)
+
+
+def test_spatial_model_matches_transform():
+    spatial = SpatialFilter.from_params(fitted_params())
+    features = ["alpha_TP9", "pca_1", "gamma", "beta", "alpha_beta_power", "theta", "alpha", "pca_0"]
+    rng = np.random.default_rng(1)
+    rows = pd.DataFrame(rng.uniform(1, 50, (5, 6)),
+                        columns=["alpha", "beta", "theta", "gamma", "alpha_TP9", "alpha_beta_power"])
+
+    expected = spatial.transform(rows).reindex(columns=features, fill_value=0.0).to_numpy()
+    raw = rows.reindex(columns=features, fill_value=0.0).to_numpy()
+    np.testing.assert_allclose(SpatialModel(Echo(), spatial, features).predict(raw), expected, rtol=1e-12)
+
+
+def test_spatial_model_needs_its_channels():
+    spatial = SpatialFilter.from_params(fitted_params())
+    with pytest.raises(ValueError):
+        SpatialModel(Echo(), spatial, ["alpha", "beta", "theta", "pca_0"])
@@ -0,0 +1,92 @@
+"""
+StreamSession (/ws) against the offline path: features are built in the served model's
+column order, and stream bundles see each connection's own causally filtered history.
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.model_registry import ActiveModel
+from app.preprocess import BAND_FEATURES, StreamingFilter, preprocess
+from app.websocket_server import StreamSession
+
+COLUMNS = ["gamma", "theta_alpha_ratio", "alpha", "beta", "theta", "alpha_beta_power"]
+
+
+class Recorder:
+    """Stands in for a fitted classifier and keeps every feature matrix it is given."""
+
+    classes_ = np.array(["rest"])
+
+    def __init__(self):
+        self.seen = []
+
+    def predict_proba(self, X):
+        self.seen.append(np.asarray(X, dtype=float))
+        return np.ones((len(X), 1))
+
+
+def active(model, filter="window"):
+    return ActiveModel(model, COLUMNS, "v", "sha", 0.0, filter=filter)
+
+
+def frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(20.0, 3.0, (n, len(BAND_FEATURES)))
+
+
+def run(session, rows):
+    return asyncio.run(session.push_rows(rows))
+
+
+def reference(rows, window, stream=None):
+    out = []
+    for end in range(window, len(rows) + 1):
+        df = pd.DataFrame(rows[end - window:end], columns=BAND_FEATURES)
+        out.append(preprocess(df, aggregate=True, add_features=True, stream=stream)
+                   .reindex(columns=COLUMNS, fill_value=0.0).to_numpy()[0])
+    return np.array(out)
+
+
+def test_window_features_in_model_order():
+    model = Recorder()
+    rows = frames(12)
+    replies = run(StreamSession(active(model), window=8), rows)
+    assert [r.get("status") for r in replies[:7]] == ["buffering"] * 7
+    np.testing.assert_allclose(np.vstack(model.seen), reference(rows, 8), rtol=1e-9)
+
+
+def test_stream_bundle_uses_the_session_filter():
+    model = Recorder()
+    rows = frames(12)
+    session = StreamSession(active(model, "stream"), window=1)
+    for chunk in np.array_split(rows, 4):
+        run(session, chunk)
+
+    # Same as preprocess(stream=...) over consecutive frames with one filter
+    np.testing.assert_allclose(np.vstack(model.seen), reference(rows, 1, StreamingFilter()), rtol=1e-9)
+
+
+def test_sessions_do_not_share_filter_state():
+    a, b = StreamSession(active(Recorder(), "stream")), StreamSession(active(Recorder(), "stream"))
+    run(a, frames(50, seed=1))
+    run(b, frames(1, seed=2))
+    fresh = StreamSession(active(Recorder(), "stream"))
+    run(fresh, frames(1, seed=2))
+    np.testing.assert_array_equal(b.model.seen[0], fresh.model.seen[0])
+
+
+def test_channel_columns_reach_the_model():
+    columns = COLUMNS + ["alpha_TP9", "gamma_TP10"]
+    model = Recorder()
+    rows = np.hstack([frames(10), frames(10, seed=3)[:, :1] * 4, np.zeros((10, 1))])  # alpha_TP9 set, AF7.. absent
+    session = StreamSession(ActiveModel(model, columns, "v", "sha", 0.0), window=4)
+    payload = [dict(zip(BAND_FEATURES + ["alpha_TP9"], r[:5])) for r in rows]
+    asyncio.run(session.push(payload))
+
+    expected = []
+    for end in range(4, 11):
+        df = pd.DataFrame(rows[end - 4:end], columns=BAND_FEATURES + ["alpha_TP9", "gamma_TP10"])
+        expected.append(preprocess(df, aggregate=True, add_features=True).reindex(columns=columns, fill_value=0.0).to_numpy()[0])
+    np.testing.assert_allclose(np.vstack(model.seen), np.array(expected), rtol=1e-9)
@@ -0,0 +1,81 @@
+"""
+WindowStore: append, tombstone and reopen round trip, attempts left open by a crashed
+collector, compaction, and the collection CSV import/export.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.window_store import BANDS_FILE, WindowStore, import_csv
+
+RNG = np.random.default_rng(0)
+
+
+def record(store, label, n):
+    attempt_id = store.begin_attempt(label)
+    values = RNG.uniform(0, 50, (n, 4))
+    store.add_windows(values)
+    store.end_attempt()
+    return attempt_id, values
+
+
+def test_append_tombstone_reopen(tmp_path):
+    path = str(tmp_path / "data.musewin")
+    with WindowStore(path) as store:
+        a, va = record(store, "left", 3)
+        b, _ = record(store, "right", 2)
+        c, vc = record(store, "left", 4)
+        assert (a, b, c) == (1, 2, 3)
+        assert store.delete_attempt(b) == 2
+
+    store = WindowStore(path)
+    assert store.n_windows == 7 and store.n_rows == 9
+    assert store.attempts().to_dict("list") == {"attempt_id": [1, 3], "label": ["left", "left"], "n_windows": [3, 4]}
+    cols = store.read()
+    np.testing.assert_array_equal(cols["bands"], np.vstack([va, vc]))
+    assert cols["window_idx"].tolist() == [0, 1, 2, 0, 1, 2, 3]
+    assert store.read(labels="right")["bands"].shape == (0, 4)
+    np.testing.assert_array_equal(store.read(attempts=[c])["bands"], vc)
+
+    # Compaction keeps the live windows and drops the tombstoned ones from disk
+    assert store.compact() == 2
+    assert store.n_rows == 7
+    np.testing.assert_array_equal(WindowStore(path).read()["bands"], np.vstack([va, vc]))
+    store.close()
+
+
+def test_unended_attempt_and_torn_tail(tmp_path):
+    path = str(tmp_path / "data.musewin")
+    store = WindowStore(path)
+    record(store, "left", 2)
+    store.begin_attempt("right")
+    store.add_windows(RNG.uniform(0, 50, (3, 4)))
+    store.flush()  # collector crashes here: no end_attempt(), no close()
+    with open(os.path.join(path, BANDS_FILE), "ab") as f:
+        f.write(b"\0" * 12)  # half-written window
+
+    reopened = WindowStore(path)
+    assert reopened.attempts().to_dict("list") == {"attempt_id": [1, 2], "label": ["left", "right"],
+                                                   "n_windows": [2, 3]}
+    assert reopened.begin_attempt("left") == 3
+
+
+def test_csv_import_export(tmp_path):
+    path, out = str(tmp_path / "data.musewin"), tmp_path / "out.csv"
+    legacy = pd.DataFrame({"attempt_id": [4, 4, 5], "label": ["left", "left", "rest"], "window_idx": [0, 1, 0],
+                           "alpha": [1.0, 2.0, 3.0], "beta": [4.0, 5.0, 6.0], "theta": [7.0, 8.0, 9.0],
+                           "gamma": [0.5, 0.25, 0.125]})
+    legacy.to_csv(tmp_path / "legacy.csv", index=False)
+    unlabeled = legacy[["alpha", "beta", "theta", "gamma"]]
+    unlabeled.to_csv(tmp_path / "old.csv", index=False)
+
+    assert import_csv(str(tmp_path / "legacy.csv"), path, chunk_rows=2) == 3
+    assert import_csv(str(tmp_path / "old.csv"), path, label="right") == 3
+
+    with WindowStore(path) as store:
+        store.to_dataframe().to_csv(out, index=False)
+    exported = pd.read_csv(out)
+    pd.testing.assert_frame_equal(exported.iloc[:3], legacy)
+    assert exported["attempt_id"].iloc[3:].tolist() == [6, 6, 6]
+    assert exported["label"].iloc[3:].tolist() == ["right"] * 3
@@ -1,11 +1,15 @@
 import fetch from 'node-fetch'
 import { parseMuseFrame } from './frameParser.js'
+import { encodeFrame } from './frameCodec.js'
 
 
 class DataStreamer {
 constructor() {
 // Backend container hostname from Docker Compose (service name)
 this.backendUrl = process.env.VITE_BACKEND_URL || 'http://backend:5000/frame'
+// BACKEND_BINARY=1 sends compact float32 records instead of JSON
+this.binary = process.env.BACKEND_BINARY === '1'
+this.sessionId = Number(process.env.MUSE_SESSION_ID || 0)
 }
 
 
@@ -15,7 +19,11 @@ if (!frame) return
 
 
 try {
-const response = await fetch(this.backendUrl, {
+const response = await fetch(this.backendUrl, this.binary ? {
+method: 'POST',
+headers: { 'Content-Type': 'application/octet-stream' },
+body: encodeFrame(frame, { sessionId: this.sessionId })
+} : {
 method: 'POST',
 headers: { 'Content-Type': 'application/json' },
 body: JSON.stringify(frame)
@@ -0,0 +1,41 @@
+// Binary frame records understood by the backend (see backend/app/frame_codec.py).
+// Little-endian: magic "MF", version, kind, session id, rows, cols, fs, timestamp, float32 values.
+
+export const KIND_BANDS = 0
+export const KIND_RAW = 1
+export const BAND_FEATURES = ['alpha', 'beta', 'theta', 'gamma']
+
+const HEADER_BYTES = 24
+
+
+export function encodeRecord(rows, { kind = KIND_BANDS, sessionId = 0, timestamp = Date.now(), fs = 0 } = {}) {
+    const nRows = rows.length
+    const nCols = nRows ? rows[0].length : 0
+    const buffer = new ArrayBuffer(HEADER_BYTES + 4 * nRows * nCols)
+    const view = new DataView(buffer)
+
+    view.setUint8(0, 0x4d)  // 'M'
+    view.setUint8(1, 0x46)  // 'F'
+    view.setUint8(2, 1)
+    view.setUint8(3, kind)
+    view.setUint32(4, sessionId, true)
+    view.setUint16(8, nRows, true)
+    view.setUint16(10, nCols, true)
+    view.setFloat32(12, fs, true)
+    view.setFloat64(16, timestamp, true)
+
+    const values = new Float32Array(buffer, HEADER_BYTES)
+    rows.forEach((row, i) => values.set(row, i * nCols))
+    return new Uint8Array(buffer)
+}
+
+
+// Band frame {alpha, beta, theta, gamma} or raw {samples: [...] | [[ch...], ...]} → record
+export function encodeFrame(frame, { sessionId = 0, fs = 256 } = {}) {
+    const timestamp = frame.timestamp ?? Date.now()
+    if (BAND_FEATURES.every((band) => band in frame)) {
+        return encodeRecord([BAND_FEATURES.map((band) => Number(frame[band]))], { sessionId, timestamp })
+    }
+    const rows = frame.samples.map((s) => (Array.isArray(s) ? s : [s]))
+    return encodeRecord(rows, { kind: KIND_RAW, sessionId, timestamp, fs })
+}
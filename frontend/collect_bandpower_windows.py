@@ -1,38 +1,31 @@
+import os
+import sys
 import time
 import csv
 import numpy as np
-from scipy.signal import butter, filtfilt, welch
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from app.dsp import band_powers
+
 FS = 256             # Hz
 WIN_SECS = 4         # seconds per window
 CONTEXT_SIZE = FS * WIN_SECS
 CSV_PATH = "bandpower_windows.csv"
 
-def bandpower(sig, fs, f1, f2):
-    """Compute absolute bandpower over [f1, f2]."""
-    sig = np.ascontiguousarray(sig.astype(np.float64))
-    b, a = butter(4, [f1 / (fs / 2), f2 / (fs / 2)], btype="band")
-    filtered = filtfilt(b, a, sig)
-    freqs, psd = welch(filtered, fs=fs, nperseg=fs)
-    idx = (freqs >= f1) & (freqs <= f2)
-    return float(np.trapezoid(psd[idx], freqs[idx]))
+BANDS = {
+    "theta": (4, 8),
+    "alpha": (8, 13),
+    "beta": (13, 30),
+    "gamma": (30, 40),
+}
 
 def compute_bands(frame):
     """Compute mean bandpowers (theta, alpha, beta, gamma) averaged across channels."""
     frame = np.nan_to_num(frame)
     frame = (frame - frame.mean(axis=0)) / (frame.std(axis=0) + 1e-8)
-    bands = {
-        "theta": (4, 8),
-        "alpha": (8, 13),
-        "beta": (13, 30),
-        "gamma": (30, 40),
-    }
-    powers = {}
-    for name, (lo, hi) in bands.items():
-        ch_powers = [bandpower(frame[:, ch], FS, lo, hi) for ch in range(frame.shape[1])]
-        powers[name] = np.mean(ch_powers)
-    return powers
+    powers = band_powers(frame.T, FS, BANDS).mean(axis=0)  # (channels, bands) → bands
+    return dict(zip(BANDS, powers.tolist()))
 
 def main():
     params = BrainFlowInputParams()
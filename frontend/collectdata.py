@@ -1,17 +1,11 @@
-import csv, time, os
+import time, os, sys
 import numpy as np
-from collections import deque
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
-from scipy.signal import butter, filtfilt, welch
 
-# Compute bandpower for specific frequency ranges
-def bandpower(sig, fs, f1, f2):
-    sig = np.ascontiguousarray(sig.astype(np.float64))
-    b, a = butter(4, [f1/(fs/2), f2/(fs/2)], btype='band')
-    filtered = filtfilt(b, a, sig)
-    freqs, psd = welch(filtered, fs=fs, nperseg=fs)
-    idx = np.logical_and(freqs >= f1, freqs <= f2)
-    return float(np.trapz(psd[idx], freqs[idx]))
+# Shared band-power engine (one PSD per window for all bands and channels)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from app.dsp import BAND_POWER_METHOD, BlockWindower, band_columns, band_powers, band_table
+from app.window_store import WindowStore
 
 # --- Connect to Muse 2 ---
 params = BrainFlowInputParams()
@@ -24,26 +18,21 @@ board.prepare_session()
 board.start_stream()
 time.sleep(5)  # Allow buffer to fill before acquisition
 fs = BoardShim.get_sampling_rate(board_id)
-eeg_ch = BoardShim.get_eeg_channels(board_id)[0]
+eeg_ch = BoardShim.get_eeg_channels(board_id)[:4]  # TP9, AF7, AF8, TP10
 print("✅ Muse connected and streaming!\n")
 
-# --- CSV Setup ---
-filename = "eeg_training_data_temporal.csv"
-file_is_new = not os.path.exists(filename) or os.path.getsize(filename) == 0
+# --- Dataset Setup (shared with collect_data.py) ---
+dataset_path = "eeg_training_data.musewin"
 
-with open(filename, "a", newline="") as f:
-    writer = csv.writer(f)
-
-    if file_is_new:
-        writer.writerow(["attempt_id","label","window_idx","alpha","beta","theta","gamma"])
+with WindowStore(dataset_path, bands=band_columns(), band_power=BAND_POWER_METHOD) as store:
 
     # Parameters for windowing and attempts
     directions = ["left", "right", "up", "down"]
     window_duration = 3
     samples_per_window = int(window_duration * fs)
     record_time = 6  # seconds per attempt
-    buffer = deque(maxlen=samples_per_window)
-    attempt_id = 0
+    windower = BlockWindower(len(eeg_ch), samples_per_window, hop=1)  # every window, as before
+    attempt_id = store.max_attempt_id  # continue numbering across sessions
 
     while True:
         print("\nAvailable directions:", directions)
@@ -55,7 +44,7 @@ with open(filename, "a", newline="") as f:
             print("❌ Invalid input.")
             continue
 
-        attempt_id += 1
+        attempt_id = store.begin_attempt(choice)
         window_idx = 0
         print(f"\n🎯 ATTEMPT {attempt_id}: Think {choice.upper()} for {record_time} seconds")
 
@@ -68,32 +57,22 @@ with open(filename, "a", newline="") as f:
                     break
                 continue
 
-            channel_data = data[eeg_ch, :]
-            for sample in channel_data:
-
-                # ✅ Stop cleanly inside loop
-                if time.time() - start >= record_time:
-                    break
-
-                buffer.append(sample)
-
-                if len(buffer) == samples_per_window:
-                    sig = np.array(buffer).astype(float)
-                    alpha = bandpower(sig, fs, 8, 12)
-                    beta  = bandpower(sig, fs, 13, 30)
-                    theta = bandpower(sig, fs, 4, 7)
-                    gamma = bandpower(sig, fs, 31, 45)
-
-                    writer.writerow([attempt_id, choice, window_idx,
-                                     alpha, beta, theta, gamma])
-
-                    print(f"{choice}[{attempt_id}-{window_idx}] → α={alpha:.2f} β={beta:.2f} θ={theta:.2f} γ={gamma:.2f}")
-                    window_idx += 1
+            # All channels, all complete windows of this block at once
+            windows = windower.push(data[eeg_ch, :])
+            if len(windows):
+                rows = band_table(band_powers(windows, fs))  # (n_windows, bands + per-channel bands)
+                store.add_windows(rows, np.arange(window_idx, window_idx + len(rows)), columns=band_columns())
+                alpha, beta, theta, gamma = rows[-1, :4]
+                print(f"{choice}[{attempt_id}-{window_idx}..{window_idx + len(rows) - 1}] → "
+                      f"α={alpha:.2f} β={beta:.2f} θ={theta:.2f} γ={gamma:.2f}")
+                window_idx += len(rows)
 
             if time.time() - start >= record_time:
                 break
 
+        store.end_attempt()
+
 print("\n🛑 Stopping stream...")
 board.stop_stream()
 board.release_session()
-print(f"✅ Data saved to {filename}\n")
\ No newline at end of file
+print(f"✅ Data saved to {dataset_path}\n")
\ No newline at end of file
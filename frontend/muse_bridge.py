@@ -2,12 +2,12 @@ import os
 import sys
 import csv
 import time
+import threading
 import numpy as np
 import pandas as pd
 import joblib
 import importlib.util
 from collections import deque
-from scipy.signal import butter, filtfilt, welch
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds, BrainFlowError
 
 # Ensure live console output
@@ -17,7 +17,16 @@ sys.stdout.reconfigure(line_buffering=True)
 TEMP_CSV = "live_frame.csv"
 FS = 128
 WINDOW_SECS = 3
-SAMPLES_PER_WINDOW = int(FS * WINDOW_SECS)
+HOP_SECS = 0.25      # emit a decision every hop over the last WINDOW_SECS
+POLL_SECS = 0.02     # acquisition drains the board on this clock (Muse packets arrive ~every 47 ms)
+RAW_ALARM_BLOCKS = 250   # ~5 s of raw blocks queued for DSP; the raw queue grows past it (never drops) and alarms
+FRAME_QUEUE = 1          # band frames waiting for inference; older ones are stale and dropped
+REPORT_SECS = 10.0
+
+# --- Shared band-power engine ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from app.dsp import MUSE_CHANNELS, SlidingBandpower, band_columns, band_frame, check_band_power
+from app.spatial import SpatialFilter
 
 # --- Locate and load preprocess.py ---
 candidate_paths = [
@@ -51,28 +60,15 @@ if isinstance(bundle, dict):
 else:
     model = bundle
     feature_cols = getattr(model, "feature_names_in_", [])
-print(f"✅ Loaded model with {len(feature_cols)} expected features.")
-
-# --- DSP HELPERS ---
-def bandpower(sig, fs, f1, f2):
-    """Compute bandpower between f1 and f2 Hz."""
-    sig = np.ascontiguousarray(sig.astype(np.float64))
-    b, a = butter(4, [f1 / (fs / 2), f2 / (fs / 2)], btype="band")
-    filtered = filtfilt(b, a, sig)
-    freqs, psd = welch(filtered, fs=fs, nperseg=fs)
-    idx = (freqs >= f1) & (freqs <= f2)
-    return float(np.trapz(psd[idx], freqs[idx]))
-
-def compute_bandpowers(sig):
-    """Compute power in canonical EEG bands."""
-    sig = np.nan_to_num(sig)
-    bands = {
-        "alpha": (8, 12),
-        "beta": (13, 30),
-        "theta": (4, 7),
-        "gamma": (31, 45),
-    }
-    return {band: bandpower(sig, FS, lo, hi) for band, (lo, hi) in bands.items()}
+# Live band powers must come from the method the model was trained on
+check_band_power(bundle.get("band_power") if isinstance(bundle, dict) else None, MODEL_PATH)
+spatial = SpatialFilter.from_bundle(bundle)  # fitted ICA/PCA, applied as one matmul
+# Bundles trained with --filter stream expect one causal filter carried across frames
+stream_filter = preprocess_mod.StreamingFilter() if isinstance(bundle, dict) and bundle.get("filter") == "stream" else None
+if isinstance(bundle, dict) and bundle.get("frame", 1) != 1:
+    print(f"⚠️ Model was trained on {bundle['frame']}-frame windows; the bridge classifies single frames.")
+print(f"✅ Loaded model with {len(feature_cols)} expected features"
+      f"{' and a spatial filter' if spatial else ''}.")
 
 # --- CONNECTION ---
 def start_muse(serial="Muse-2919"):
@@ -85,6 +81,162 @@ def start_muse(serial="Muse-2919"):
     print(f"✅ Muse {serial} connected and streaming...\n")
     return board
 
+# --- PIPELINE ---
+class LosslessQueue:
+    """
+    Unbounded FIFO between two stages: nothing is dropped and the producer never blocks.
+    A consumer that falls behind shows up as a growing len(), which the producer alarms on.
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Append `item`; returns the number of items now queued."""
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify()
+            return len(self._items)
+
+    def get(self, timeout=None):
+        """Oldest item, or None if nothing arrived within `timeout`."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DropOldestQueue(LosslessQueue):
+    """
+    Bounded FIFO between two stages. A full queue evicts its oldest item, so a slow
+    consumer sees the freshest work and the producer never blocks or builds up lag.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self._maxsize = maxsize
+
+    def put(self, item):
+        """Append `item`; returns the evicted item when the queue was full, else None."""
+        with self._cond:
+            evicted = self._items.popleft() if len(self._items) >= self._maxsize else None
+            self._items.append(item)
+            self._cond.notify()
+        return evicted
+
+
+class StageStats:
+    """Busy time, calls, items out and drops of one stage; read by the reporter without locking."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.items = 0
+        self.busy = 0.0
+        self.max = 0.0
+        self.dropped = 0
+
+    def record(self, seconds, items=1):
+        self.count += 1
+        self.items += items
+        self.busy += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        mean = self.busy / self.count * 1000.0 if self.count else 0.0
+        return f"{self.name} {self.count} ({mean:.2f}/{self.max * 1000.0:.2f} ms mean/max, {self.dropped} dropped)"
+
+
+def acquire(board, eeg_ch, raw_queue, stats, stop):
+    """
+    Acquisition stage: drain the board on a fixed clock, whatever the later stages are doing.
+    Raw samples are never dropped (the logged bands must be contiguous): if DSP falls
+    RAW_ALARM_BLOCKS behind, the queue keeps growing and an alarm is printed, then a
+    notice once it has drained below half of that.
+    """
+    next_poll = time.monotonic()
+    alarmed = False
+    while not stop.is_set():
+        next_poll += POLL_SECS
+        delay = next_poll - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_poll = time.monotonic()  # fell behind (GIL, suspend): resync instead of bursting
+
+        t0 = time.perf_counter()
+        data = board.get_board_data()
+        if data.size == 0:
+            continue
+        block = np.nan_to_num(data[eeg_ch, :])
+        backlog = raw_queue.put((time.monotonic(), block))
+        if not alarmed and backlog >= RAW_ALARM_BLOCKS:
+            alarmed = True
+            print(f"🚨 DSP is {backlog} raw blocks (~{backlog * POLL_SECS:.0f} s) behind acquisition; "
+                  f"queueing without dropping samples, lag is growing")
+        elif alarmed and backlog < RAW_ALARM_BLOCKS // 2:
+            alarmed = False
+            print(f"✅ DSP caught up ({backlog} raw blocks queued)")
+        stats.record(time.perf_counter() - t0, block.shape[1])
+
+
+def dsp(raw_queue, frame_queue, estimator, writer, f, stats, inference_stats, stop):
+    """DSP stage: band powers for every completed window, logged to TEMP_CSV."""
+    window_idx = 0
+    while not stop.is_set():
+        item = raw_queue.get(timeout=0.1)
+        if item is None:
+            continue
+        acquired_at, block = item
+        t0 = time.perf_counter()
+        emitted = estimator.push(block)
+        for powers in emitted:
+            bands = band_frame(powers)  # alpha..gamma (TP9) plus alpha_TP9..gamma_TP10
+            writer.writerow([window_idx] + list(bands.values()))
+            if frame_queue.put((window_idx, acquired_at, bands)) is not None:
+                inference_stats.dropped += 1  # stale frame inference never got to
+            window_idx += 1
+        f.flush()
+        stats.record(time.perf_counter() - t0, len(emitted))
+
+
+def classify(window_idx, acquired_at, bands, stats):
+    """Inference stage for one band frame."""
+    t0 = time.perf_counter()
+    print(
+        f"🧩 Frame {window_idx} → "
+        f"α={bands['alpha']:.2f} β={bands['beta']:.2f} "
+        f"θ={bands['theta']:.2f} γ={bands['gamma']:.2f}"
+    )
+
+    # --- Local preprocess + classify ---
+    df = pd.DataFrame([bands])
+    processed = preprocess(df, aggregate=True, add_features=True, stream=stream_filter)
+    if spatial is not None:
+        processed = spatial.transform(processed)
+    processed = processed.reindex(columns=feature_cols, fill_value=0.0)
+
+    try:
+        probs = model.predict_proba(processed)[0]
+        labels = model.classes_
+        pred_idx = int(np.argmax(probs))
+        pred_label = labels[pred_idx]
+        conf = probs[pred_idx]
+        print(f"🧠 Classified locally: {pred_label} (Confidence: {conf:.3f}, "
+              f"lag {(time.monotonic() - acquired_at) * 1000.0:.0f} ms)")
+    except Exception as e:
+        print(f"💀 Local classification error: {e}")
+    stats.record(time.perf_counter() - t0)
+
+
+def report(stages, raw_queue, frame_queue):
+    print(f"📊 {' | '.join(s.summary() for s in stages)} | queued raw {len(raw_queue)}, frames {len(frame_queue)}")
+
+
 # --- MAIN LOOP ---
 def main():
     print("🔌 Initializing Muse stream...")
@@ -95,76 +247,51 @@ def main():
         return
 
     eeg_ch = BoardShim.get_eeg_channels(BoardIds.MUSE_2_BOARD.value)[:4]
-    buffer = deque(maxlen=SAMPLES_PER_WINDOW)
-    window_idx = 0
+    estimator = SlidingBandpower(FS, len(MUSE_CHANNELS), window=WINDOW_SECS, hop=HOP_SECS)
+    raw_queue = LosslessQueue()
+    frame_queue = DropOldestQueue(FRAME_QUEUE)
+    acq_stats, dsp_stats, inf_stats = StageStats("acquire"), StageStats("dsp"), StageStats("inference")
+    stop = threading.Event()
+    classified = 0
 
     with open(TEMP_CSV, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["window_idx", "alpha", "beta", "theta", "gamma"])
+        writer.writerow(["window_idx"] + band_columns())
 
         print("🎧 Collecting EEG frames in real-time...")
         time.sleep(5)
 
+        # acquisition → raw queue (lossless) → DSP → frame queue (drop-oldest) → inference on this thread
+        threads = [
+            threading.Thread(target=acquire, args=(board, eeg_ch, raw_queue, acq_stats, stop),
+                             name="acquire", daemon=True),
+            threading.Thread(target=dsp, args=(raw_queue, frame_queue, estimator, writer, f, dsp_stats, inf_stats, stop),
+                             name="dsp", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
         try:
+            next_report = time.monotonic() + REPORT_SECS
             while True:
-                data = board.get_board_data()
-                if data.size == 0:
-                    time.sleep(0.05)
-                    continue
-
-                channel_data = data[eeg_ch[0], :]
-                for sample in channel_data:
-                    buffer.append(sample)
-                    if len(buffer) == SAMPLES_PER_WINDOW:
-                        sig = np.array(buffer).astype(float)
-                        bands = compute_bandpowers(sig)
-
-                        writer.writerow([
-                            window_idx,
-                            bands["alpha"],
-                            bands["beta"],
-                            bands["theta"],
-                            bands["gamma"],
-                        ])
-                        f.flush()
-
-                        payload = {
-                            "alpha": bands["alpha"],
-                            "beta": bands["beta"],
-                            "theta": bands["theta"],
-                            "gamma": bands["gamma"],
-                        }
-
-                        print(
-                            f"🧩 Frame {window_idx} → "
-                            f"α={bands['alpha']:.2f} β={bands['beta']:.2f} "
-                            f"θ={bands['theta']:.2f} γ={bands['gamma']:.2f}"
-                        )
-
-                        # --- Local preprocess + classify ---
-                        df = pd.DataFrame([payload])
-                        processed = preprocess(df, aggregate=True, add_features=True)
-                        processed = processed.reindex(columns=feature_cols, fill_value=0.0)
-
-                        try:
-                            probs = model.predict_proba(processed)[0]
-                            labels = model.classes_
-                            pred_idx = int(np.argmax(probs))
-                            pred_label = labels[pred_idx]
-                            conf = probs[pred_idx]
-                            print(f"🧠 Classified locally: {pred_label} (Confidence: {conf:.3f})")
-                        except Exception as e:
-                            print(f"💀 Local classification error: {e}")
-
-                        window_idx += 1
-                        buffer.clear()
+                item = frame_queue.get(timeout=0.5)
+                if item is not None:
+                    classify(*item, inf_stats)
+                    classified += 1
+                if time.monotonic() >= next_report:
+                    report((acq_stats, dsp_stats, inf_stats), raw_queue, frame_queue)
+                    next_report += REPORT_SECS
 
         except KeyboardInterrupt:
             print("\n🛑 Stopping stream...")
         finally:
+            stop.set()
+            for t in threads:
+                t.join(timeout=2.0)
             board.stop_stream()
             board.release_session()
-            print(f"✅ Muse session closed. Saved {window_idx} frames to {TEMP_CSV}")
+            report((acq_stats, dsp_stats, inf_stats), raw_queue, frame_queue)
+            print(f"✅ Muse session closed. Saved {dsp_stats.items} frames to {TEMP_CSV}, classified {classified}")
 
 # --- ENTRY ---
 if __name__ == "__main__":
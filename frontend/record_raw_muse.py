@@ -1,46 +1,80 @@
+import os
+import sys
 import time
-import csv
-import numpy as np
+import argparse
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds, BrainFlowError
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+from app.recording_store import RecordingWriter, StreamRecorder
 
 FS = 256               # Muse 2 sampling rate
-DURATION = 10          # seconds to record
-OUTPUT_FILE = "raw_muse_data.csv"
+DURATION = 10          # seconds to record; 0 streams until Ctrl+C
+POLL_SECONDS = 0.25    # drain the board buffer this often
+RING_SECONDS = 60      # BrainFlow ring buffer; a drain that returns it full has lost samples
+QUEUE_BLOCKS = 240     # blocks waiting for the writer thread (~60 s at POLL_SECONDS)
+FSYNC_SECONDS = 5.0
+REPORT_SECONDS = 10.0
+CHANNELS = ["TP9", "AF7", "AF8", "TP10"]
+OUTPUT_FILE = "raw_muse_data.museraw"  # binary recording; `python -m app.recording_store export` for CSV
+
+def report(recorder, started, overflowed):
+    s = recorder.stats()
+    print(f"⏺️ {time.time() - started:7.0f}s | {s['written']} samples written, {s['queued']} blocks queued | "
+          f"dropped {s['dropped_samples']} (queue full), overflowed {overflowed} drains, "
+          f"{s['gap_samples']} samples missing from timestamps")
 
 def main():
+    parser = argparse.ArgumentParser(description="Record raw Muse 2 EEG into a binary recording.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds to record (0 = until Ctrl+C).")
+    parser.add_argument("--out", type=str, default=OUTPUT_FILE, help="Recording directory (appended to if it exists).")
+    args = parser.parse_args()
+
     print("🔌 Connecting to Muse 2 via BrainFlow...")
     params = BrainFlowInputParams()
     params.serial_number = "Muse-2919"  # adjust if yours differs
     board_id = BoardIds.MUSE_2_BOARD.value
     board = BoardShim(board_id, params)
+    eeg_channels = BoardShim.get_eeg_channels(board_id)[:4]  # TP9, AF7, AF8, TP10
+    ts_channel = BoardShim.get_timestamp_channel(board_id)
+    ring_size = RING_SECONDS * FS
+    recorder = None
+    overflowed = 0
 
     try:
         board.prepare_session()
-        board.start_stream()
-        print(f"✅ Muse connected. Recording {DURATION} seconds of data...")
-
-        time.sleep(DURATION)
-
-        print("🧠 Fetching data from buffer...")
-        data = board.get_board_data()  # shape = (num_channels, num_samples)
-        eeg_channels = BoardShim.get_eeg_channels(board_id)[:4]  # TP9, AF7, AF8, TP10
-        eeg_data = data[eeg_channels, :].T  # shape (samples, 4)
-
-        print(f"📈 Collected {eeg_data.shape[0]} samples at {FS} Hz")
-
-        # Save to CSV
-        np.savetxt(OUTPUT_FILE, eeg_data, delimiter=",", header="TP9,AF7,AF8,TP10", comments="")
-        print(f"💾 Saved EEG data to {OUTPUT_FILE}")
+        board.start_stream(ring_size)
+        recorder = StreamRecorder(RecordingWriter(args.out, CHANNELS, FS, source="brainflow:muse2"),
+                                  max_blocks=QUEUE_BLOCKS, fsync_interval=FSYNC_SECONDS).start()
+        forever = args.duration <= 0
+        print(f"✅ Muse connected. Recording {'until Ctrl+C' if forever else f'{args.duration:g} seconds'}...")
 
-        # Optional: preview some rows
-        print("\nFirst 5 samples:")
-        print(eeg_data[:5])
+        # Poll on a fixed clock; the writer thread owns the disk, so a slow write never
+        # holds samples in the board buffer and memory stays flat for hour-long sessions
+        started = time.time()
+        next_poll = next_report = time.monotonic()
+        while forever or time.time() - started < args.duration:
+            next_poll += POLL_SECONDS
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+            data = board.get_board_data()  # shape = (num_channels, num_samples), clears the buffer
+            if data.shape[1] >= ring_size:
+                overflowed += 1
+                print(f"⚠️ BrainFlow ring buffer was full ({ring_size} samples): older samples were overwritten")
+            recorder.put(data[eeg_channels, :].T, data[ts_channel, :])
+            if time.monotonic() >= next_report:
+                report(recorder, started, overflowed)
+                next_report += REPORT_SECONDS
 
     except BrainFlowError as e:
         print(f"❌ BrainFlow error: {e}")
+    except RuntimeError as e:
+        print(f"❌ Recording failed: {e.__cause__ or e}")
     except KeyboardInterrupt:
         print("🛑 Recording stopped by user.")
     finally:
+        if recorder is not None:
+            recorder.stop()
+            report(recorder, started, overflowed)
+            print(f"📈 Collected {recorder.written} samples at {FS} Hz")
+            print(f"💾 Saved EEG data to {args.out}")
         try:
             board.stop_stream()
             board.release_session()
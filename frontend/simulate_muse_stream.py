@@ -1,11 +1,14 @@
 import os
 import sys
+import time
 import joblib
 import argparse
 import pandas as pd
 import numpy as np
 import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+from app.spatial import SpatialFilter
 
 candidate_paths = [
     os.path.abspath(os.path.join(os.path.dirname(__file__), "preprocess.py")),
@@ -19,7 +22,9 @@ for p in candidate_paths:
         preprocess_mod = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(preprocess_mod)
         preprocess = preprocess_mod.preprocess
-        print(f"✅ Loaded preprocess.py from {p}")
+        CHANNEL_FEATURES = preprocess_mod.CHANNEL_FEATURES
+        if __name__ == "__main__":
+            print(f"✅ Loaded preprocess.py from {p}")
         break
 else:
     raise ImportError("❌ Could not locate preprocess.py anywhere.")
@@ -27,65 +32,210 @@ else:
 # --- CONFIG ---
 DEFAULT_FRAME_SIZE = 1000
 MODEL_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend", "data", "cache", "bigboy.joblib"))
-
-
-# --- CLI OPTIONS ---
-parser = argparse.ArgumentParser(description="Simulate and inspect EEG model predictions.")
-parser.add_argument("--file", type=str, required=True, help="Path to EEG CSV file.")
-parser.add_argument("--frame", type=int, default=DEFAULT_FRAME_SIZE, help="Frame size per window.")
-parser.add_argument("--model", type=str, default=MODEL_PATH, help="Path to bigboy.joblib.")
-args = parser.parse_args()
-
-# --- LOAD MODEL ---
-if not os.path.exists(args.model):
-    raise FileNotFoundError(f"❌ Could not find model file: {args.model}")
-
-bundle = joblib.load(args.model)
-model = bundle["model"]
-feature_cols = bundle["features"]
-
-print(f"✅ Model loaded from {args.model}")
-print(f"📊 Expected features: {len(feature_cols)} → {feature_cols[:10]}...")
-
-# --- LOAD DATA ---
-df = pd.read_csv(args.file)
 base_cols = ["alpha", "beta", "theta", "gamma"]
-for c in base_cols:
-    if c not in df.columns:
-        raise ValueError(f"Missing required column: {c}")
+PARALLEL_MIN_ROWS = 200_000  # below this, worker start-up costs more than it saves
+
+
+# --- BATCH EVALUATION ---
+def _preprocess_chunk(windows, channel_columns=(), filtered=False):
+    # Imported by package path so process-pool workers can unpickle the call
+    from app.preprocess import preprocess_windows
+    return preprocess_windows(windows, add_features=True, channel_columns=channel_columns, filtered=filtered)
+
+
+def window_columns(df):
+    """Band columns, then the per-channel band columns newer recordings carry."""
+    return base_cols + [c for c in CHANNEL_FEATURES if c in df.columns]
+
+
+def build_windows(df, frame, hop, stream=False):
+    """
+    All (n_windows, frame, n_columns) windows at once, plus their start rows and majority labels.
+    With `stream` the bands are first filtered causally over the whole file, as a live session does.
+    """
+    values = df[window_columns(df)].to_numpy(dtype=np.float64, copy=True)
+    if stream:
+        values[:, :len(base_cols)] = preprocess_mod.StreamingFilter().process(values[:, :len(base_cols)])
+    if len(values) < frame:
+        return np.empty((0, frame, values.shape[1])), np.empty(0, dtype=int), None
+    windows = np.lib.stride_tricks.sliding_window_view(values, frame, axis=0)[::hop].transpose(0, 2, 1)
+    starts = np.arange(0, len(values) - frame + 1, hop)
+
+    labels = None
+    if "label" in df.columns:
+        codes, names = pd.factorize(df["label"].astype(str))
+        label_windows = np.lib.stride_tricks.sliding_window_view(codes, frame)[::hop]
+        counts = np.apply_along_axis(np.bincount, 1, label_windows, minlength=len(names))
+        labels = np.asarray(names)[np.argmax(counts, axis=1)]
+    return windows, starts, labels
+
+
+def preprocess_batch(windows, workers, channel_columns=(), filtered=False):
+    """preprocess() for every window in one vectorized pass, split across processes for long files."""
+    if workers <= 1 or windows.shape[0] * windows.shape[1] < PARALLEL_MIN_ROWS:
+        return _preprocess_chunk(windows, channel_columns, filtered)
+    chunks = np.array_split(windows, workers)
+    with ProcessPoolExecutor(workers) as pool:
+        return pd.concat(pool.map(_preprocess_chunk, chunks, [channel_columns] * workers, [filtered] * workers),
+                         ignore_index=True)
+
+
+def evaluate(args, model, feature_cols, spatial=None):
+    rows = []
+    X_parts = []
+    start = time.perf_counter()
+    for path in args.file:
+        df = pd.read_csv(path)
+        windows, starts, labels = build_windows(df, args.frame, args.hop, args.stream)
+        if args.label:
+            labels = np.full(len(windows), args.label)
+        if not len(windows):
+            print(f"⚠️ {path}: shorter than one window ({len(df)} < {args.frame} rows), skipped")
+            continue
+        X_parts.append(preprocess_batch(windows, args.workers, window_columns(df)[len(base_cols):], args.stream))
+        rows.append(pd.DataFrame({
+            "file": os.path.basename(path),
+            "window": np.arange(len(windows)),
+            "start_row": starts,
+            "label": labels if labels is not None else None,
+        }))
+    if not X_parts:
+        raise SystemExit("❌ No complete windows to evaluate.")
+    t_pre = time.perf_counter()
+
+    # One prediction call over every window of every file
+    X = pd.concat(X_parts, ignore_index=True)
+    if spatial is not None:
+        X = spatial.transform(X)
+    X = X.reindex(columns=feature_cols, fill_value=0)
+    valid = X.notna().all(axis=1).to_numpy()  # blink-masked windows cannot be scored
+    probs = np.full((len(X), len(model.classes_)), np.nan)
+    if valid.any():
+        probs[valid] = model.predict_proba(X[valid])
+    t_pred = time.perf_counter()
+
+    results = pd.concat(rows, ignore_index=True)
+    best = np.argmax(np.nan_to_num(probs, nan=-1.0), axis=1)
+    results["predicted"] = np.where(valid, np.asarray(model.classes_, dtype=object)[best], "invalid")
+    results["confidence"] = np.where(valid, probs[np.arange(len(probs)), best], np.nan)
+    for j, cls in enumerate(model.classes_):
+        results[f"p_{cls}"] = probs[:, j]
+
+    print(f"✅ Scored {len(results)} windows from {len(args.file)} file(s): "
+          f"preprocess {t_pre - start:.2f}s, predict {t_pred - t_pre:.2f}s")
+    if (~valid).any():
+        print(f"⚠️ {int((~valid).sum())} window(s) had NaN features and were marked 'invalid'")
+
+    if results["label"].notna().any():
+        scored = results[results["label"].notna()]
+        confusion = pd.crosstab(scored["label"], scored["predicted"], rownames=["actual"], colnames=["predicted"])
+        print("\nConfusion matrix:")
+        print(confusion.to_string())
+        per_label = scored.assign(correct=scored["label"] == scored["predicted"]).groupby("label")["correct"]
+        print("\nAccuracy per label:")
+        for lbl, acc in per_label.mean().items():
+            print(f"   {lbl:<10}: {acc:.3f}  ({per_label.size()[lbl]} windows)")
+        print(f"\n🏷️ Overall accuracy: {(scored['label'] == scored['predicted']).mean():.3f}")
+    else:
+        print("\nPredicted label counts (no 'label' column; pass --label to score):")
+        print(results["predicted"].value_counts().to_string())
+
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"💾 Per-window predictions written to {args.out}")
 
-print(f"✅ Loaded {len(df)} samples from {args.file}")
 
 # --- SIMULATED STREAMING LOOP ---
-for i in range(0, len(df), args.frame):
-    frame = df.iloc[i:i + args.frame]
-    if len(frame) < args.frame:
-        break
-
-    # Apply the *exact same* preprocessing pipeline as training
-    processed = preprocess(frame, aggregate=True, add_features=True)
-    processed = processed.reindex(columns=feature_cols, fill_value=0)
-
-    try:
-        probs = model.predict_proba(processed)[0]
-        labels = model.classes_
-        pred_idx = int(np.argmax(probs))
-        pred_label = labels[pred_idx]
-        conf = probs[pred_idx]
-
-        print(f"\n🧩 Frame {i // args.frame}")
-        print("---------------------------")
+def stream(args, model, feature_cols, spatial=None):
+    for path in args.file:
+        df = pd.read_csv(path)
+        print(f"✅ Loaded {len(df)} samples from {path}")
+        # One filter per recording: stream bundles carry filter state from frame to frame
+        stream_filter = preprocess_mod.StreamingFilter() if args.stream else None
+
+        for i in range(0, len(df), args.frame):
+            frame = df.iloc[i:i + args.frame]
+            if len(frame) < args.frame:
+                break
+
+            # Apply the *exact same* preprocessing pipeline as training
+            processed = preprocess(frame, aggregate=True, add_features=True, stream=stream_filter)
+            if spatial is not None:
+                processed = spatial.transform(processed)
+            processed = processed.reindex(columns=feature_cols, fill_value=0)
+
+            try:
+                probs = model.predict_proba(processed)[0]
+                labels = model.classes_
+                pred_idx = int(np.argmax(probs))
+                pred_label = labels[pred_idx]
+                conf = probs[pred_idx]
+
+                print(f"\n🧩 Frame {i // args.frame}")
+                print("---------------------------")
+                for c in base_cols:
+                    val = float(frame[c].mean())
+                    print(f"{c:>6}: {val:.6f}")
+
+                print("\nRaw model probabilities:")
+                for lbl, p in zip(labels, probs):
+                    bar = "█" * int(p * 40)
+                    print(f"   {lbl:<10}: {p:.4f} {bar}")
+
+                print(f"\n🏷️ Predicted: {pred_label}  (Confidence: {conf:.3f})")
+
+            except Exception as e:
+                print(f"❌ Prediction error at frame {i // args.frame}: {e}")
+                sys.exit(1)
+
+
+def main():
+    # --- CLI OPTIONS ---
+    parser = argparse.ArgumentParser(description="Simulate and inspect EEG model predictions.")
+    parser.add_argument("--file", type=str, nargs="+", required=True, help="Path(s) to EEG CSV file(s).")
+    parser.add_argument("--frame", type=int, default=None,
+                        help="Frame size per window (default: the bundle's training frame).")
+    parser.add_argument("--model", type=str, default=MODEL_PATH, help="Path to bigboy.joblib.")
+    parser.add_argument("--eval", action="store_true",
+                        help="Batch mode: score every window at once and print a confusion matrix.")
+    parser.add_argument("--hop", type=int, default=None, help="Rows between window starts in --eval (default: --frame).")
+    parser.add_argument("--label", type=str, default=None, help="Ground-truth label for files without a 'label' column.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for --eval preprocessing.")
+    parser.add_argument("--out", type=str, default=None, help="Write per-window --eval predictions to this CSV.")
+    args = parser.parse_args()
+
+    # --- LOAD MODEL ---
+    if not os.path.exists(args.model):
+        raise FileNotFoundError(f"❌ Could not find model file: {args.model}")
+
+    bundle = joblib.load(args.model)
+    model = bundle["model"]
+    feature_cols = bundle["features"]
+    spatial = SpatialFilter.from_bundle(bundle)
+    trained_frame = bundle.get("frame")
+    if args.frame is None:
+        args.frame = trained_frame or DEFAULT_FRAME_SIZE
+    elif trained_frame and args.frame != trained_frame:
+        print(f"⚠️ Model was trained on {trained_frame}-row frames; --frame {args.frame} gives it other features")
+    args.hop = args.hop or args.frame
+    args.stream = bundle.get("filter") == "stream"
+
+    print(f"✅ Model loaded from {args.model}{' (with spatial filter)' if spatial else ''}"
+          f"{' (stream-filtered)' if args.stream else ''}")
+    print(f"📊 Expected features: {len(feature_cols)} → {feature_cols[:10]}...")
+
+    # --- LOAD DATA ---
+    for path in args.file:
+        columns = pd.read_csv(path, nrows=0).columns
         for c in base_cols:
-            val = float(frame[c].mean())
-            print(f"{c:>6}: {val:.6f}")
+            if c not in columns:
+                raise ValueError(f"Missing required column in {path}: {c}")
 
-        print("\nRaw model probabilities:")
-        for lbl, p in zip(labels, probs):
-            bar = "█" * int(p * 40)
-            print(f"   {lbl:<10}: {p:.4f} {bar}")
+    if args.eval:
+        evaluate(args, model, feature_cols, spatial)
+    else:
+        stream(args, model, feature_cols, spatial)
 
-        print(f"\n🏷️ Predicted: {pred_label}  (Confidence: {conf:.3f})")
 
-    except Exception as e:
-        print(f"❌ Prediction error at frame {i // args.frame}: {e}")
-        sys.exit(1)
+if __name__ == "__main__":
+    main()